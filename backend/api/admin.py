@@ -1,6 +1,31 @@
 from django.contrib import admin
 from .models import *  # Import all models
 from django.contrib.admin.sites import AlreadyRegistered
+from . import llm
+
+TOP_USERS = 20
+
+
+@admin.register(LLMUsageRollup)
+class LLMUsageRollupAdmin(admin.ModelAdmin):
+    """Hourly LLM usage rows, with totals per model and the heaviest users above the list."""
+    list_display = ("period_start", "user", "model", "calls", "errors", "cache_hits",
+                    "prompt_tokens", "completion_tokens", "max_latency_ms", "cost")
+    list_filter = ("model",)
+    date_hierarchy = "period_start"
+    search_fields = ("user__username", "user__email")
+    list_select_related = ("user",)
+    change_list_template = "admin/api/llmusagerollup/change_list.html"
+
+    def changelist_view(self, request, extra_context=None):
+        response = super().changelist_view(request, extra_context)
+        changelist = getattr(response, "context_data", {}).get("cl")
+        if changelist is not None:
+            response.context_data["usage_by_model"] = llm.usage_report(changelist.queryset, "model")
+            response.context_data["usage_by_user"] = llm.usage_report(
+                changelist.queryset.filter(user__isnull=False), "user__username")[:TOP_USERS]
+        return response
+
 
 # Register all models
 def register_all_models():
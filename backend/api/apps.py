@@ -1,6 +1,26 @@
+import os
+import sys
+
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        # Revokes a user's tokens when they are deactivated or change password.
+        from . import authentication  # noqa: F401
+
+        # Only start the in-process prefetch worker for servers, not for
+        # management commands, and only in the reloader child under runserver.
+        if not getattr(settings, "PREFETCH_IN_PROCESS", False):
+            return
+        command = sys.argv[1] if len(sys.argv) > 1 else ""
+        if command == "runserver" and os.environ.get("RUN_MAIN") != "true":
+            return
+        if command and command != "runserver" and os.path.basename(sys.argv[0]) == "manage.py":
+            return
+        from .prefetch import start_worker
+        start_worker()
@@ -0,0 +1,152 @@
+"""
+Stateless JWT authentication.
+
+Access tokens carry the user's id, username and staff flags, so an
+authenticated request is resolved from the token alone instead of loading
+the User row on every call. Views that need the full user can use
+`request.user.user`; any attribute that is not a claim is also looked up on
+the full user, which is then loaded once per request.
+
+Tokens can be revoked before they expire through a denylist kept in the
+shared cache: a single token by jti, or every token a user was issued
+before a point in time. Since the User row is not checked per request, a
+user's tokens are revoked whenever the user is deactivated, deleted or
+changes password (re-hashing the same password on login is not a change).
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+DENYLIST_JTI_KEY = "jwt:denylist:jti:{jti}"
+DENYLIST_USER_KEY = "jwt:denylist:user:{user_id}"
+
+# Claims copied into every token so ClaimsUser can answer without a query.
+USER_CLAIMS = ("username", "is_staff", "is_superuser")
+
+
+class ClaimsRefreshToken(RefreshToken):
+    """Refresh token whose claims (and those of its access tokens) describe the user."""
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for claim in USER_CLAIMS:
+            token[claim] = getattr(user, claim)
+        return token
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = ClaimsRefreshToken
+
+
+class DenylistTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refuses to mint access tokens from a revoked refresh token."""
+    def validate(self, attrs):
+        if is_revoked(self.token_class(attrs["refresh"])):
+            raise InvalidToken({"detail": "Token has been revoked.", "code": "token_revoked"})
+        return super().validate(attrs)
+
+
+class ClaimsUser(TokenUser):
+    """
+    Lightweight user built from token claims. `user` loads the full User row
+    on first use; unknown attributes fall through to it.
+    """
+    @cached_property
+    def user(self):
+        return get_user_model()._default_manager.get(**{api_settings.USER_ID_FIELD: self.id})
+
+    @cached_property
+    def username(self):
+        return self.token.get("username") or self.user.get_username()
+
+    def __getattr__(self, attr):
+        if attr.startswith("_"):
+            raise AttributeError(attr)
+        if attr in self.token:
+            return self.token[attr]
+        return getattr(self.user, attr)
+
+
+def _remaining_lifetime(token):
+    return max(1, int(token.get("exp", time.time()) - time.time()))
+
+
+def revoke_token(token):
+    """Deny a single token (access or refresh) until it would have expired."""
+    jti = token.get(api_settings.JTI_CLAIM)
+    if jti:
+        cache.set(DENYLIST_JTI_KEY.format(jti=jti), True, _remaining_lifetime(token))
+
+
+def revoke_user_tokens(user_id):
+    """Deny every token issued to a user up to now, e.g. after a password change."""
+    lifetime = int(max(api_settings.ACCESS_TOKEN_LIFETIME, api_settings.REFRESH_TOKEN_LIFETIME).total_seconds())
+    # Whole seconds, like "iat": tokens issued in the second of the change stay valid.
+    cache.set(DENYLIST_USER_KEY.format(user_id=user_id), int(time.time()), lifetime)
+
+
+# Changes to these fields end every session the user has open.
+CREDENTIAL_FIELDS = ("password", "is_active")
+
+
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL)
+def remember_credentials(instance, raw=False, **kwargs):
+    previous = None
+    if instance.pk and not raw:
+        previous = type(instance)._default_manager.filter(pk=instance.pk).values_list(*CREDENTIAL_FIELDS).first()
+    instance._previous_credentials = previous
+
+
+def is_hash_upgrade(instance, update_fields):
+    """
+    The save made by check_password() when it re-hashes the same password
+    with the current policy: it saves only the password and, unlike
+    set_password(), leaves no raw password pending.
+    """
+    return update_fields is not None and set(update_fields) == {"password"} and instance._password is None
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def revoke_on_credential_change(instance, raw=False, created=False, update_fields=None, **kwargs):
+    previous = getattr(instance, "_previous_credentials", None)
+    if raw or created or previous is None or is_hash_upgrade(instance, update_fields):
+        return
+    if previous != tuple(getattr(instance, field) for field in CREDENTIAL_FIELDS):
+        revoke_user_tokens(instance.pk)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def revoke_on_delete(instance, **kwargs):
+    revoke_user_tokens(instance.pk)
+
+
+def is_revoked(token):
+    keys = [
+        DENYLIST_JTI_KEY.format(jti=token.get(api_settings.JTI_CLAIM)),
+        DENYLIST_USER_KEY.format(user_id=token.get(api_settings.USER_ID_CLAIM)),
+    ]
+    denied = cache.get_many(keys)
+    if denied.get(keys[0]):
+        return True
+    revoked_before = denied.get(keys[1])
+    return revoked_before is not None and token.get("iat", 0) < revoked_before
+
+
+class StatelessJWTAuthentication(JWTStatelessUserAuthentication):
+    """JWT authentication that never touches the database and honours the cached denylist."""
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        if is_revoked(validated_token):
+            raise InvalidToken({"detail": "Token has been revoked.", "code": "token_revoked"})
+        return validated_token
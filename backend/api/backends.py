@@ -0,0 +1,25 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+UserModel = get_user_model()
+
+
+class EmailBackend(ModelBackend):
+    """
+    Authenticate with email and password in a single indexed query.
+    Usernames keep working through Django's ModelBackend (e.g. for the admin).
+    """
+    def authenticate(self, request, email=None, password=None, **kwargs):
+        if email is None or password is None:
+            return None
+        # Registration enforces unique emails, but older rows may share one;
+        # like the previous login flow, the oldest account wins.
+        user = UserModel._default_manager.filter(email=email).order_by("pk").first()
+        if user is None:
+            # Run the default password hasher once to reduce the timing
+            # difference between an existing and a nonexistent user.
+            UserModel().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,180 @@
+"""
+Batch trip-plan generation.
+
+Partners submit many trip specs at once (e.g. one per group-tour party).
+Plans are generated on a bounded thread pool and yielded as they complete,
+and attraction/weather/catalogue lookups are shared across the batch so
+each destination is fetched at most once, however many specs mention it.
+"""
+import json
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import connections
+
+from .chatbot import Chatbot
+from .prefetch import normalize_destination
+from .trip_parser import parse_trip_request
+
+logger = logging.getLogger(__name__)
+
+TRIP_BATCH_MAX_WORKERS = getattr(settings, "TRIP_BATCH_MAX_WORKERS", 8)
+TRIP_BATCH_MAX_SIZE = getattr(settings, "TRIP_BATCH_MAX_SIZE", 500)
+
+
+class BatchLookups:
+    """
+    Per-batch memo of upstream lookups keyed by (kind, destination). The first
+    caller for a key performs the fetch; concurrent callers for the same key
+    wait on its Future instead of issuing a duplicate request.
+    """
+    def __init__(self):
+        self._futures = {}
+        self._lock = threading.Lock()
+        self.upstream_calls = 0
+
+    def get(self, kind, destination, fetch, *args):
+        key = (kind, normalize_destination(destination))
+        with self._lock:
+            future = self._futures.get(key)
+            owner = future is None
+            if owner:
+                future = self._futures[key] = Future()
+                self.upstream_calls += 1
+        if owner:
+            try:
+                future.set_result(fetch(*args))
+            except Exception as e:
+                future.set_exception(e)
+        return future.result()
+
+
+class BatchChatbot(Chatbot):
+    """Chatbot whose attraction and weather lookups go through a shared BatchLookups."""
+    def __init__(self, lookups, data=None, user_id=None):
+        super().__init__(data=data, user_id=user_id)
+        self.lookups = lookups
+
+    def fetch_attractions(self, destination):
+        return self.lookups.get("attractions", destination, super().fetch_attractions, destination)
+
+    def fetch_weather(self, destination):
+        return self.lookups.get("weather", destination, super().fetch_weather, destination)
+
+    def fetch_catalog(self, destination):
+        return self.lookups.get("catalog", destination, super().fetch_catalog, destination)
+
+
+def normalize_spec(spec):
+    """
+    Turn one submitted trip spec into chatbot slot data. A spec is either a
+    dict of slots or a free-form request ("message" key, or a bare string);
+    explicit slots win over parsed ones.
+    """
+    if isinstance(spec, Exception):
+        raise spec
+    if isinstance(spec, str):
+        spec = {"message": spec}
+    if not isinstance(spec, dict):
+        raise ValueError("Each trip must be an object or a string.")
+    data = {k: v for k, v in spec.items() if k not in ("id", "message")}
+    if isinstance(spec.get("message"), str):
+        data = {**parse_trip_request(spec["message"]), **data}
+    if not data.get("destination"):
+        raise ValueError("A destination is required.")
+    try:
+        Chatbot.trip_data(data)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid trip details: {e}") from None
+    return data
+
+
+def generate_plan(data, lookups, user_id=None):
+    bot = BatchChatbot(lookups, data=data, user_id=user_id)
+    try:
+        return bot.generate_trip_plan(bot.data)
+    finally:
+        # Catalogue lookups open a connection on this worker thread; don't leak it.
+        connections.close_all()
+
+
+def generate_plans(specs, max_workers=TRIP_BATCH_MAX_WORKERS, lookups=None, user_id=None):
+    """
+    Generate a trip plan for every spec in the iterable `specs` and yield one
+    result dict per spec, in completion order:
+      {"index": i, "id": <spec id or None>, "recommendation": "..."}
+      {"index": i, "id": <spec id or None>, "error": "..."}
+    At most `max_workers` plans run at once and at most twice that many specs
+    are read ahead, so a long JSONL stream is never loaded into memory.
+    Specs are parsed on the calling thread; workers only generate plans.
+    LLM usage is accounted to `user_id` (api/llm.py).
+    """
+    lookups = lookups or BatchLookups()
+    pending = {}
+
+    def result(future):
+        index, spec_id = pending.pop(future)
+        try:
+            return {"index": index, "id": spec_id, "recommendation": future.result()}
+        except Exception as e:
+            logger.exception("Error generating batch trip plan %s: %s", index, e)
+            return {"index": index, "id": spec_id, "error": "An error occurred while generating the trip plan."}
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="trip-batch") as executor:
+        for index, spec in enumerate(specs):
+            spec_id = spec.get("id") if isinstance(spec, dict) else None
+            try:
+                data = normalize_spec(spec)
+            except ValueError as e:
+                yield {"index": index, "id": spec_id, "error": str(e)}
+                continue
+            pending[executor.submit(generate_plan, data, lookups, user_id)] = (index, spec_id)
+            if len(pending) >= 2 * max_workers:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield result(future)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield result(future)
+
+
+JSONL_CONTENT_TYPES = ("application/x-ndjson", "application/jsonl", "application/x-jsonlines")
+
+
+def read_jsonl(lines):
+    """Yield one decoded spec per non-blank line; an undecodable line yields a ValueError in its place."""
+    for number, line in enumerate(lines, start=1):
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield ValueError(f"Line {number} is not valid JSON.")
+
+
+def read_batch_request(request):
+    """
+    Return the list of trip specs in a batch request: a JSON list, a JSON
+    object with a "trips" list, or a JSONL body. Parsed once per request, so
+    the throttle can charge per trip before the view runs.
+    """
+    if hasattr(request, "trip_batch"):
+        return request.trip_batch
+    if request.content_type.split(";")[0].strip() in JSONL_CONTENT_TYPES:
+        specs = list(read_jsonl(request.body.splitlines()))
+    else:
+        specs = request.data
+        if isinstance(specs, dict):
+            specs = specs.get("trips")
+    if not isinstance(specs, list) or not specs:
+        raise ValueError("Expected a non-empty list of trips.")
+    if len(specs) > TRIP_BATCH_MAX_SIZE:
+        raise ValueError(f"A batch may contain at most {TRIP_BATCH_MAX_SIZE} trips.")
+    request.trip_batch = specs
+    return specs
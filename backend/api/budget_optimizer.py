@@ -0,0 +1,259 @@
+"""
+Budget-constrained selection of bookable options from the catalogue.
+
+Given a destination's hotels, activities and (optionally) flights from an
+origin, pick the combination with the highest score that fits the budget:
+
+    score = hotel rating x HOTEL_RATING_WEIGHTS[hotel preference]
+          + ACTIVITY_VALUE per activity (PREFERRED_ACTIVITY_VALUE when it
+            matches one of the traveller's activity preferences)
+
+Flights carry no rating, so the cheapest flight with enough seats is taken
+and the rest of the budget goes to the hotel and activities. Activities
+are a 0/1 knapsack with at most ACTIVITIES_PER_DAY per day, solved by
+dynamic programming over budget steps of `budget / MAX_BUDGET_STEPS` INR
+(prices are rounded up, so a selection never exceeds the budget). The DP
+table gives the best activity score for every remaining budget at once,
+so every hotel is then scored against it in one vectorized pass.
+
+Options are loaded per destination as price-sorted numpy arrays and kept
+for CATALOG_TTL seconds (`load_catalog`); `optimize` itself does no
+database access. Before the
+DP, an activity is dropped when enough cheaper activities are worth at
+least as much to fill every activity slot. See `manage.py bench_budget`.
+"""
+import bisect
+import math
+import threading
+import time
+
+import numpy as np
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Activity, Destination, Flight, Hotel
+
+ACTIVITIES_PER_DAY = 2
+ACTIVITY_VALUE = 0.5
+PREFERRED_ACTIVITY_VALUE = 1.5
+HOTEL_RATING_WEIGHTS = {"luxury": 2.0, "boutique": 1.5, "budget": 0.5}
+GUESTS_PER_ROOM = 2
+MAX_BUDGET_STEPS = 2000
+CATALOG_TTL = 60
+CATALOG_CACHE_SIZE = 256
+
+
+class Catalog:
+    """A destination's hotels, activities and flights as price-sorted arrays."""
+
+    def __init__(self, destination, hotels=(), activities=(), flights=()):
+        self.destination = destination
+        hotels, activities, flights = list(hotels), list(activities), list(flights)
+        self.hotel_ids = np.array([row[0] for row in hotels], dtype=np.int64)
+        self.hotel_names = [row[1] for row in hotels]
+        self.hotel_prices = np.array([row[2] for row in hotels], dtype=np.float64)
+        self.hotel_ratings = np.array([row[3] for row in hotels], dtype=np.float64)
+        self.activity_ids = np.array([row[0] for row in activities], dtype=np.int64)
+        self.activity_names = [row[1] for row in activities]
+        self.activity_texts = [f"{row[1]} {row[2]}".lower() for row in activities]
+        self.activity_prices = np.array([row[3] for row in activities], dtype=np.float64)
+        self.activity_slots = np.array([row[4] for row in activities], dtype=np.int64)
+        self.flights = flights
+        self.flight_prices = np.array([row[4] for row in flights], dtype=np.float64)
+        self.flight_seats = np.array([row[5] for row in flights], dtype=np.int64)
+        self.flight_departures = [row[3] for row in flights]
+
+    def __bool__(self):
+        return bool(len(self.hotel_ids) or len(self.activity_ids) or self.flights)
+
+
+def _query_catalog(destination, origin):
+    place = Destination.objects.filter(name__iexact=destination).first()
+    hotels = activities = flights = ()
+    if place is not None:
+        hotels = Hotel.objects.filter(destination=place).order_by("price_per_night", "id").values_list(
+            "id", "name", Cast("price_per_night", FloatField()), Cast("rating", FloatField())
+        )
+        activities = Activity.objects.filter(destination=place, available_slots__gt=0).order_by("price", "id").values_list(
+            "id", "name", "description", Cast("price", FloatField()), "available_slots"
+        )
+    if origin:
+        flights = Flight.objects.filter(
+            source__iexact=origin, destination__iexact=destination, available_seats__gt=0,
+        ).order_by("price", "id").values_list(
+            "id", "flight_number", "airline", "departure_time", Cast("price", FloatField()), "available_seats"
+        )
+    return Catalog(destination, hotels, activities, flights)
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def load_catalog(destination, origin=None):
+    """
+    Catalog for a destination name; flights are only loaded when an origin
+    is given. Catalogs are cached per process for CATALOG_TTL seconds and
+    dropped when a hotel, activity, flight or destination is saved here.
+    """
+    key = (destination.lower(), (origin or "").lower())
+    cached = _catalogs.get(key)
+    if cached is None or time.monotonic() - cached[0] > CATALOG_TTL:
+        cached = (time.monotonic(), _query_catalog(destination, origin))
+        with _catalogs_lock:
+            if len(_catalogs) >= CATALOG_CACHE_SIZE:
+                _catalogs.clear()
+            _catalogs[key] = cached
+    return cached[1]
+
+
+@receiver([post_save, post_delete], sender=Destination)
+@receiver([post_save, post_delete], sender=Hotel)
+@receiver([post_save, post_delete], sender=Activity)
+@receiver([post_save, post_delete], sender=Flight)
+def invalidate_catalogs(**kwargs):
+    with _catalogs_lock:
+        _catalogs.clear()
+
+
+def undominated(weights, values, limit):
+    """
+    Indices of the items worth keeping when at most `limit` can be chosen:
+    an item is dropped if `limit` other items cost no more and are worth
+    no less, since it can always be swapped for one of them.
+    """
+    order = np.lexsort((-values, weights))
+    seen = []  # values of the items kept so far, sorted (negated, so bisect finds "worth at least")
+    keep = []
+    for i in order.tolist():
+        if bisect.bisect_right(seen, -values[i]) >= limit:
+            continue
+        bisect.insort(seen, -values[i])
+        keep.append(i)
+    return np.array(keep, dtype=np.int64)
+
+
+def knapsack(weights, values, capacity, limit):
+    """
+    0/1 knapsack with at most `limit` items. Returns (best, take): best[c]
+    is the highest total value of at most `limit` items weighing at most c,
+    and `take` is what `pick` needs to recover the items.
+    """
+    # dp[j, c]: best value using at most j items within weight c.
+    dp = np.zeros((limit + 1, capacity + 1))
+    take = []
+    for weight, value in zip(weights.tolist(), values.tolist()):
+        if weight > capacity:
+            take.append(None)
+            continue
+        candidate = dp[:-1, :capacity + 1 - weight] + value
+        improved = candidate > dp[1:, weight:] + 1e-12
+        dp[1:, weight:][improved] = candidate[improved]
+        take.append(improved)
+    return dp[limit], (weights, take, limit)
+
+
+def pick(take, capacity):
+    """Indices (into the knapsack's items) of an optimal choice within `capacity`."""
+    weights, take, j = take
+    chosen = []
+    for i in range(len(take) - 1, -1, -1):
+        weight = int(weights[i])
+        if j and take[i] is not None and capacity >= weight and take[i][j - 1, capacity - weight]:
+            chosen.append(i)
+            j -= 1
+            capacity -= weight
+    return chosen[::-1]
+
+
+def activity_values(catalog, preferences):
+    preferences = [preference.lower() for preference in preferences if preference]
+    return np.array([
+        PREFERRED_ACTIVITY_VALUE if any(preference in text for preference in preferences) else ACTIVITY_VALUE
+        for text in catalog.activity_texts
+    ], dtype=np.float64)
+
+
+def optimize(catalog, budget, days, travellers=1, activities=(), hotel_preference="any", reserved=0.0):
+    """
+    Best-scoring flight/hotel/activities selection from `catalog` costing at
+    most `budget - reserved` INR (`reserved` is set aside for what the
+    catalogue does not price, such as food). Returns a dict with the chosen
+    options, their exact costs and `feasible`, which is False when a flight
+    or hotel exists in the catalogue but none fits the budget.
+    """
+    nights = max(days - 1, 1)
+    rooms = math.ceil(travellers / GUESTS_PER_ROOM)
+    available = budget - reserved
+    result = {"flight": None, "hotel": None, "activities": [], "nights": nights, "travellers": travellers,
+              "costs": {"flight": 0.0, "hotel": 0.0, "activities": 0.0, "total": 0.0}, "score": 0.0, "feasible": True}
+
+    if catalog.flights:
+        now = timezone.now()
+        upcoming = np.array([departure >= now for departure in catalog.flight_departures], dtype=bool)
+        seated = np.flatnonzero((catalog.flight_seats >= travellers) & upcoming)
+        if len(seated) and catalog.flight_prices[seated[0]] * travellers <= available:
+            row = catalog.flights[seated[0]]
+            cost = float(row[4]) * travellers
+            result["flight"] = {"id": row[0], "flight_number": row[1], "airline": row[2],
+                                "departure_time": row[3], "price": float(row[4]), "cost": cost}
+            result["costs"]["flight"] = result["costs"]["total"] = cost
+            available -= cost
+        else:
+            result["feasible"] = False
+            return result
+    if available < 0:
+        result["feasible"] = False
+        return result
+
+    # Work in whole budget steps; prices round up so the plan never overspends.
+    step = max(1.0, available / MAX_BUDGET_STEPS)
+    capacity = int(available // step)
+    limit = ACTIVITIES_PER_DAY * days
+
+    items = np.flatnonzero(catalog.activity_slots >= travellers)
+    weights = np.ceil(catalog.activity_prices[items] * travellers / step).astype(np.int64)
+    values = activity_values(catalog, activities)[items] if len(items) else np.zeros(0)
+    affordable = weights <= capacity
+    items, weights, values = items[affordable], weights[affordable], values[affordable]
+    kept = undominated(weights, values, limit) if len(items) else np.zeros(0, dtype=np.int64)
+    items, weights, values = items[kept], weights[kept], values[kept]
+    best, take = knapsack(weights, values, capacity, limit)
+    # Cheapest budget that reaches each best[c], to prefer cheaper plans on ties.
+    steps = np.arange(capacity + 1)
+    first = np.maximum.accumulate(np.where(np.r_[True, best[1:] > best[:-1] + 1e-12], steps, 0))
+
+    remaining = capacity
+    if len(catalog.hotel_ids):
+        hotel_weights = np.ceil(catalog.hotel_prices * nights * rooms / step).astype(np.int64)
+        fits = np.flatnonzero(hotel_weights <= capacity)
+        if not len(fits):
+            result["feasible"] = False
+            return result
+        left = capacity - hotel_weights[fits]
+        weight = HOTEL_RATING_WEIGHTS.get(hotel_preference.lower(), 1.0)
+        scores = catalog.hotel_ratings[fits] * weight + best[left]
+        spent = hotel_weights[fits] + first[left]
+        choice = fits[np.lexsort((spent, -scores))[0]]
+        cost = float(catalog.hotel_prices[choice]) * nights * rooms
+        result["hotel"] = {"id": int(catalog.hotel_ids[choice]), "name": catalog.hotel_names[choice],
+                           "rating": float(catalog.hotel_ratings[choice]),
+                           "price_per_night": float(catalog.hotel_prices[choice]), "rooms": rooms, "cost": cost}
+        result["costs"]["hotel"] = cost
+        result["costs"]["total"] += cost
+        result["score"] += float(catalog.hotel_ratings[choice]) * weight
+        remaining = int(capacity - hotel_weights[choice])
+
+    for i in pick(take, int(first[remaining])):
+        index = items[i]
+        cost = float(catalog.activity_prices[index]) * travellers
+        result["activities"].append({"id": int(catalog.activity_ids[index]), "name": catalog.activity_names[index],
+                                     "price": float(catalog.activity_prices[index]), "cost": cost,
+                                     "preferred": bool(values[i] == PREFERRED_ACTIVITY_VALUE)})
+        result["costs"]["activities"] += cost
+        result["costs"]["total"] += cost
+        result["score"] += float(values[i])
+    return result
@@ -0,0 +1,108 @@
+"""
+Write-behind chat history.
+
+Chat turns are put on an in-process queue and inserted by a background
+thread with bulk_create, CHAT_HISTORY_BATCH_SIZE rows at a time, so the
+response to the user never waits on the history insert. The queue is
+flushed at least every CHAT_HISTORY_FLUSH_INTERVAL seconds and on
+interpreter exit; turns still queued when a process is killed are lost.
+If the queue is full (the database is down or far behind), the turn is
+written inline instead of being dropped.
+"""
+import atexit
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .models import ChatMessage
+
+logger = logging.getLogger(__name__)
+
+CHAT_HISTORY_BATCH_SIZE = getattr(settings, "CHAT_HISTORY_BATCH_SIZE", 100)
+CHAT_HISTORY_FLUSH_INTERVAL = getattr(settings, "CHAT_HISTORY_FLUSH_INTERVAL", 1.0)
+CHAT_HISTORY_QUEUE_SIZE = getattr(settings, "CHAT_HISTORY_QUEUE_SIZE", 10000)
+
+
+class ChatLogWriter(threading.Thread):
+    """Daemon thread that drains the chat turn queue in batches."""
+    def __init__(self, batch_size=CHAT_HISTORY_BATCH_SIZE, interval=CHAT_HISTORY_FLUSH_INTERVAL,
+                 maxsize=CHAT_HISTORY_QUEUE_SIZE):
+        super().__init__(name="chat-log-writer", daemon=True)
+        self.batch_size = batch_size
+        self.interval = interval
+        self.queue = queue.Queue(maxsize=maxsize)
+        self._flush_lock = threading.Lock()
+
+    def put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            logger.warning("Chat history queue is full; writing turn inline.")
+            self.write([message])
+
+    def run(self):
+        while True:
+            try:
+                first = self.queue.get(timeout=self.interval)
+            except queue.Empty:
+                continue
+            self.flush(first)
+
+    def flush(self, first=None):
+        """Insert everything queued so far, batch_size rows per INSERT. Returns the rows written."""
+        written = 0
+        with self._flush_lock:
+            batch = [first] if first is not None else []
+            while True:
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if not batch:
+                    break
+                written += self.write(batch)
+                batch = []
+        return written
+
+    def write(self, batch):
+        try:
+            ChatMessage.objects.bulk_create(batch, batch_size=self.batch_size)
+            return len(batch)
+        except Exception as e:
+            logger.exception("Error writing %s chat history rows: %s", len(batch), e)
+            return 0
+        finally:
+            if threading.current_thread() is self:
+                close_old_connections()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """Start the writer thread on first use in each process (after any fork)."""
+    global _writer
+    if _writer is None or not _writer.is_alive():
+        with _writer_lock:
+            if _writer is None or not _writer.is_alive():
+                _writer = ChatLogWriter()
+                _writer.start()
+    return _writer
+
+
+def record_turn(user_id, message, response):
+    """Queue one chat turn for the user's history."""
+    get_writer().put(ChatMessage(user_id=user_id, message=message, response=response))
+
+
+def flush():
+    """Synchronously write every queued turn, e.g. before reading history in a script."""
+    return _writer.flush() if _writer is not None else 0
+
+
+atexit.register(flush)
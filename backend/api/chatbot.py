@@ -1,237 +1,420 @@
-import json
+import copy
 import logging
+import re
+from typing import Callable, NamedTuple, Optional
+
 import requests
-from forex_python.converter import CurrencyRates
 from django.conf import settings
-from rest_framework.decorators import api_view
-from rest_framework.response import Response
+
+from . import budget_optimizer, itinerary, llm, prompting
+from .prefetch import cached_fetch, record_destination
+from .trip_parser import parse_trip_request
 
 # Configure logger
 logger = logging.getLogger(__name__)
 
-# Retrieve API keys securely from settings
-MAPPLES_API_KEY = settings.MAPPLES_API_KEY
-WEATHER_API_KEY = settings.WEATHER_API_KEY
-RAPIDAPI_KEY = settings.RAPIDAPI_KEY
-HOTEL_API_KEY = settings.HOTEL_API_KEY  # if used
-OPENAI_API_KEY = settings.OPENAI_API_KEY
-OPENAI_BASE_URL = settings.OPENAI_BASE_URL
+WEATHER_UNAVAILABLE = "Weather information is unavailable."
+TOKEN_BUDGET_EXCEEDED = "You have reached today's limit for AI-generated trip plans. Please try again tomorrow."
+
+
+def weather_available(weather_info):
+    """Only cache real weather summaries, not the unavailable placeholder."""
+    return bool(weather_info) and weather_info != WEATHER_UNAVAILABLE
+
+
+# -------------------------------
+# Dialog definition
+# -------------------------------
+# The conversation is a table of states. Each state names the slot it fills,
+# the parser that turns the user's reply into a slot value (or INVALID), the
+# prompt asked on entering the state and the state that follows. Parsers
+# and lookup sets are built once at import, and dispatch is a dict lookup.
+
+INVALID = object()
+
+BUDGET_CATEGORIES = {"low": 5000, "medium": 15000, "high": 30000}
+DEFAULT_BUDGET = 10000
+YES_ANSWERS = frozenset({"yes", "y"})
+TRANSPORT_OPTIONS = frozenset({"flight", "train", "car", "bus", "any"})
+DAYS_RE = re.compile(r"\d+")
+NUMBER_RE = re.compile(r"[+-]?(\d+(\.\d*)?|\.\d+)([eE][+-]?\d+)?")
+
+GREETING_STATE = "greeting"
+PLAN_STATE = "generating_plan"
+
+
+def parse_any(text):
+    return None
+
+
+def parse_yes(text):
+    return True if text.lower() in YES_ANSWERS else INVALID
+
+
+def budget_amount(value):
+    """`value` as an INR amount; raises ValueError unless it is positive and fits Trip.budget."""
+    budget = round(float(value), 2)
+    if not 0 < budget < itinerary.MAX_BUDGET:  # also false for NaN
+        raise ValueError(f"budget must be more than 0 and less than {itinerary.MAX_BUDGET:,} INR")
+    return budget
+
+
+def parse_budget(text):
+    if NUMBER_RE.fullmatch(text):
+        try:
+            return budget_amount(text)
+        except ValueError:
+            return INVALID
+    return BUDGET_CATEGORIES.get(text.lower(), DEFAULT_BUDGET)
+
+
+def parse_text(text):
+    return text
+
+
+def parse_lower(text):
+    return text.lower()
+
+
+def parse_days(text):
+    if DAYS_RE.fullmatch(text) and 1 <= int(text) <= itinerary.MAX_TRIP_DAYS:
+        return int(text)
+    return INVALID
+
+
+def parse_transportation(text):
+    option = text.lower()
+    return option if option in TRANSPORT_OPTIONS else INVALID
+
+
+def parse_activities(text):
+    if text.lower() == "none":
+        return []
+    return [act.strip() for act in text.split(",") if act.strip()]
+
+
+def activity_list(value):
+    """Activities given as a comma-separated string or a list of strings, as a list."""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return parse_activities(value)
+    if isinstance(value, (list, tuple)) and all(isinstance(act, str) for act in value):
+        return [act.strip() for act in value if act.strip()]
+    raise ValueError("activities must be a string or a list of strings")
+
+
+class DialogState(NamedTuple):
+    slot: Optional[str]
+    parse: Callable
+    prompt: str
+    next: str
+    invalid_reply: str = ""
+    reset_on_invalid: bool = False
+
+
+DIALOG = {
+    "greeting": DialogState(
+        slot=None, parse=parse_any, next="confirm_trip",
+        prompt="",
+    ),
+    "confirm_trip": DialogState(
+        slot=None, parse=parse_yes, next="get_budget",
+        prompt="Hello! I'm your AI-powered tour planner. Would you like to plan a trip? (Yes/No)",
+        invalid_reply="Alright, feel free to ask me anytime when you want to plan a trip!",
+        reset_on_invalid=True,
+    ),
+    "get_budget": DialogState(
+        slot="budget", parse=parse_budget, next="get_destination",
+        prompt="Great! Please tell me your budget. Enter a numeric value (in INR) or type a category (low/medium/high).",
+        invalid_reply="Please enter a positive budget in INR, or a category (low/medium/high).",
+    ),
+    "get_destination": DialogState(
+        slot="destination", parse=parse_text, next="get_days",
+        prompt="Which destination (city/place) in India would you like to visit? (e.g., Goa, Delhi, Jaipur)",
+    ),
+    "get_days": DialogState(
+        slot="days", parse=parse_days, next="get_transportation",
+        prompt="For how many days would you like the trip? (Enter a number)",
+        invalid_reply=f"Please enter a number of days from 1 to {itinerary.MAX_TRIP_DAYS} for the trip duration.",
+    ),
+    "get_transportation": DialogState(
+        slot="transportation", parse=parse_transportation, next="get_hotel_preference",
+        prompt="What mode of transportation do you prefer? Options: flight, train, car, bus or type 'any'.",
+        invalid_reply="Please choose a valid transportation option: flight, train, car, bus, or 'any'.",
+    ),
+    "get_hotel_preference": DialogState(
+        slot="hotel_preference", parse=parse_lower, next="get_food_preference",
+        prompt="Do you have any hotel preferences? (e.g., luxury, budget, boutique, any)",
+    ),
+    "get_food_preference": DialogState(
+        slot="food_preference", parse=parse_lower, next="get_activities",
+        prompt="Any particular food preference or cuisine? (e.g., North Indian, South Indian, continental, any)",
+    ),
+    "get_activities": DialogState(
+        slot="activities", parse=parse_activities, next=PLAN_STATE,
+        prompt="Lastly, do you have any specific activity interests? For example: adventure, sightseeing, culture, shopping, or type 'none'.",
+    ),
+}
+
+PLAN_INTRO = "Thanks! Generating your personalized trip plan..."
+PARSED_INTRO = "Got it: {details}."
+NOT_UNDERSTOOD = "I'm sorry, I didn't understand that. Could you please repeat?"
+
+# A free-form message is taken as a trip request when it fills this many
+# slots. Inside the dialog one slot is just the answer to the question asked.
+OPENING_STATES = frozenset({GREETING_STATE, "confirm_trip"})
+MIN_PARSED_SLOTS = 2
 
-CURRENCY_CONVERTER = CurrencyRates()
 
 class Chatbot:
     """
     Advanced stateful chatbot that collects user inputs step-by-step,
-    integrates with multiple external APIs in real time, and generates
-    a personalized trip plan. Falls back to OpenAI if primary sources fail.
+    integrates with external APIs in real time, and generates a personalized trip plan.
+    Falls back to OpenAI if primary sources fail.
+
+    The same class serves the HTTP endpoints, the WebSocket channel and batch
+    plan generation; the dialog itself is driven by the DIALOG table.
     """
-    def __init__(self, state="greeting", data=None):
+    def __init__(self, state=GREETING_STATE, data=None, user_id=None):
         self.state = state
         self.data = data or {}
+        self.user_id = user_id  # LLM usage is accounted and budgeted per user (api/llm.py)
 
     def to_dict(self):
+        """Serialize chatbot state for session storage."""
         return {"state": self.state, "data": self.data}
 
     @classmethod
     def from_dict(cls, data_dict):
-        return cls(state=data_dict.get("state", "greeting"), data=data_dict.get("data", {}))
+        """Reconstruct Chatbot instance from session data."""
+        return cls(state=data_dict.get("state", GREETING_STATE), data=data_dict.get("data", {}))
 
     def reset(self):
-        self.state = "greeting"
+        self.state = GREETING_STATE
         self.data = {}
 
     def handle_input(self, user_input):
-        logger.info("State: %s | User Input: %s", self.state, user_input)
-        user_input = user_input.strip()
-        response = ""
+        logger.info("Handling input. Current state: %s, User input: %s", self.state, user_input)
         try:
-            if self.state == "greeting":
-                response = ("Hello! I'm your AI-powered tour planner. Would you like to plan a trip? (Yes/No)")
-                self.state = "confirm_trip"
-
-            elif self.state == "confirm_trip":
-                if user_input.lower() in ["yes", "y"]:
-                    response = ("Great! Please tell me your budget. Enter a numeric value (in INR) or type a category (low/medium/high).")
-                    self.state = "get_budget"
-                else:
-                    response = "Alright, feel free to ask me anytime when you want to plan a trip!"
-                    self.reset()
-
-            elif self.state == "get_budget":
-                try:
-                    budget = float(user_input)
-                    self.data["budget"] = budget
-                except ValueError:
-                    budget_categories = {"low": 5000, "medium": 15000, "high": 30000}
-                    self.data["budget"] = budget_categories.get(user_input.lower(), 10000)
-                response = "Which destination (city/place) in India would you like to visit? (e.g., Goa, Delhi, Jaipur)"
-                self.state = "get_destination"
-
-            elif self.state == "get_destination":
-                self.data["destination"] = user_input
-                response = "For how many days would you like the trip? (Enter a number)"
-                self.state = "get_days"
-
-            elif self.state == "get_days":
-                if user_input.isdigit():
-                    self.data["days"] = int(user_input)
-                    response = ("What mode of transportation do you prefer? Options: flight, train, car, bus or type 'any'.")
-                    self.state = "get_transportation"
-                else:
-                    response = "Please enter a valid number for the trip duration."
-
-            elif self.state == "get_transportation":
-                valid_options = ["flight", "train", "car", "bus", "any"]
-                if user_input.lower() in valid_options:
-                    self.data["transportation"] = user_input.lower()
-                    response = "Do you have any hotel preferences? (e.g., luxury, budget, boutique, any)"
-                    self.state = "get_hotel_preference"
-                else:
-                    response = "Please choose a valid transportation option: flight, train, car, bus, or 'any'."
-
-            elif self.state == "get_hotel_preference":
-                self.data["hotel_preference"] = user_input.lower()
-                response = "Any particular food preference or cuisine? (e.g., North Indian, South Indian, continental, any)"
-                self.state = "get_food_preference"
-
-            elif self.state == "get_food_preference":
-                self.data["food_preference"] = user_input.lower()
-                response = ("Lastly, do you have any specific activity interests? For example: adventure, sightseeing, culture, shopping, or type 'none'.")
-                self.state = "get_activities"
-
-            elif self.state == "get_activities":
-                if user_input.lower() == "none":
-                    self.data["activities"] = []
-                else:
-                    activities = [act.strip() for act in user_input.split(",") if act.strip()]
-                    self.data["activities"] = activities
-                response = "Thanks! Generating your personalized trip plan..."
-                self.state = "generating_plan"
-                trip_plan = self.generate_trip_plan(self.data)
-                response += "\n\n" + trip_plan
-                self.reset()
-
-            else:
-                response = "I'm sorry, I didn't understand that. Could you please repeat?"
+            reply = self.advance(user_input.strip())
+            return self.finish() if reply is None else reply
         except Exception as e:
             logger.exception("Error in handle_input: %s", e)
-            response = "An error occurred while processing your input. Please try again later."
-        return response
+            return "An error occurred while processing your input. Please try again later."
 
-    def generate_trip_plan(self, data):
+    def advance(self, user_input):
         """
-        Generate a detailed day-wise trip plan including suggestions for morning attractions,
-        lunch at recommended restaurants, and hotel check-in with dinner & leisure in the evening.
-        Uses real-time data from multiple APIs.
+        Apply one message to the dialog. Returns the reply, or None once
+        every slot is filled and the trip plan is due.
         """
+        step = DIALOG.get(self.state)
+        if step is None:
+            return NOT_UNDERSTOOD
+
+        slots = parse_trip_request(user_input)
+        # A day count out of range is left for its question to ask again.
+        if not 1 <= slots.get("days", 1) <= itinerary.MAX_TRIP_DAYS:
+            del slots["days"]
+        if len(slots) >= (1 if self.state in OPENING_STATES else MIN_PARSED_SLOTS):
+            return self.apply_slots(slots)
+
+        value = step.parse(user_input)
+        if value is INVALID:
+            if step.reset_on_invalid:
+                self.reset()
+            return step.invalid_reply
+        if step.slot:
+            self.data[step.slot] = value
+
+        self.state = self.next_state(step)
+        if self.state == PLAN_STATE:
+            return None
+        return DIALOG[self.state].prompt
+
+    def completes_trip(self, user_input):
+        """Whether this message would finish the dialog and generate a plan; the bot itself is unchanged."""
+        trial = Chatbot(self.state, copy.deepcopy(self.data))
+        try:
+            return trial.advance(user_input.strip()) is None
+        except Exception:
+            return False
+
+    def missing_state(self):
+        """The first question whose slot is still unanswered, or PLAN_STATE."""
+        return next((name for name, step in DIALOG.items() if step.slot and step.slot not in self.data), PLAN_STATE)
+
+    def next_state(self, step):
+        # Questions answered earlier (e.g. from a free-form request) are skipped.
+        if step.next in DIALOG and DIALOG[step.next].slot is None:
+            return step.next
+        return self.missing_state()
+
+    def apply_slots(self, slots):
+        """
+        Fill the slots parsed from a free-form request and jump to the first
+        question that is still unanswered; returns None if none is left.
+        """
+        if isinstance(slots.get("budget"), str):
+            slots["budget"] = BUDGET_CATEGORIES.get(slots["budget"], DEFAULT_BUDGET)
+        self.data.update(slots)
+        details = ", ".join(f"{slot.replace('_', ' ')} {self.describe_slot(slot)}" for slot in slots)
+
+        self.state = self.missing_state()
+        if self.state == PLAN_STATE:
+            return None
+        return PARSED_INTRO.format(details=details) + " " + DIALOG[self.state].prompt
+
+    def describe_slot(self, slot):
+        value = self.data[slot]
+        if slot == "budget":
+            return f"INR {value:.0f}"
+        if isinstance(value, list):
+            return ", ".join(value)
+        return str(value)
+
+    def finish(self):
+        trip_plan = self.generate_trip_plan(self.data)
+        self.reset()
+        return PLAN_INTRO + "\n\n" + trip_plan
+
+    @staticmethod
+    def trip_data(data):
+        """
+        Normalize collected slots (or API input) into the values a plan is
+        built from. Raises ValueError (or TypeError) for values of the wrong type.
+        """
+        try:
+            budget = float(data.get("budget"))
+        except (ValueError, TypeError):
+            budget = BUDGET_CATEGORIES.get(str(data.get("budget", "")).lower(), DEFAULT_BUDGET)
+        budget = budget_amount(budget)
         try:
-            destination = data.get("destination", "Unknown").title()
-            budget = float(data.get("budget", 10000))
             days = int(data.get("days", 3))
-            transportation = data.get("transportation", "any")
-            hotel_pref = data.get("hotel_preference", "any")
-            food_pref = data.get("food_preference", "any")
-            user_activities = data.get("activities", [])
-            
-            # Fetch dynamic recommendations
-            attractions = self.fetch_attractions(destination)       # e.g. returns list of attraction names
-            weather_info = self.fetch_weather(destination)           # e.g. returns string summary like "28°C, Clear sky"
-            hotels = self.fetch_hotels(destination, hotel_pref)      # e.g. list of hotel names
-            restaurants = self.fetch_restaurants(destination, food_pref)  # e.g. list of restaurant names
-            cost_breakdown = self.calculate_costs(budget, days, transportation, hotel_pref)
-            
-            # Build a detailed day-wise itinerary
-            itinerary_lines = []
-            for day in range(1, days + 1):
-                itinerary_lines.append(f"Day {day}:")
-                # Morning: Suggest an attraction or activity
-                if attractions:
-                    morning_plan = attractions[(day - 1) % len(attractions)]
-                else:
-                    morning_plan = f"Explore popular landmarks in {destination}"
-                itinerary_lines.append(f"  Morning: Visit {morning_plan}.")
-                
-                # Afternoon: Suggest lunch at a recommended restaurant and an activity (or user-specified activity)
-                if restaurants:
-                    lunch_spot = restaurants[(day - 1) % len(restaurants)]
-                else:
-                    lunch_spot = f"Local cuisine spot in {destination}"
-                # Optionally, include user activities if provided
-                if user_activities:
-                    extra = ", ".join(user_activities)
-                    afternoon_plan = f"Enjoy lunch at {lunch_spot} and then experience: {extra}."
-                else:
-                    afternoon_plan = f"Enjoy lunch at {lunch_spot} and visit a local market or museum."
-                itinerary_lines.append(f"  Afternoon: {afternoon_plan}")
-                
-                # Evening: Recommend hotel check-in and leisure/dinner
-                if hotels:
-                    hotel_choice = hotels[0]
-                else:
-                    hotel_choice = f"your chosen hotel in {destination}"
-                itinerary_lines.append(f"  Evening: Check in at {hotel_choice}, have dinner at a nearby restaurant, and relax.")
-                itinerary_lines.append("")  # Blank line for spacing
-            
-            itinerary_str = "\n".join(itinerary_lines)
-            
-            trip_plan = (
-                f"Trip Plan for {destination} (Duration: {days} days, Budget: INR {budget:.0f}):\n\n"
-                f"Weather Info: {weather_info}\n\n"
-                f"Transportation: {transportation.capitalize()}\n"
-                f"Estimated Cost Breakdown:\n{cost_breakdown}\n\n"
-                f"Detailed Itinerary:\n{itinerary_str}\n"
-                f"Recommended Hotels: {', '.join(hotels[:3]) if hotels else 'No hotel data available'}\n"
-                f"Recommended Restaurants: {', '.join(restaurants[:3]) if restaurants else 'No restaurant data available'}\n\n"
-                "Enjoy your trip!"
-            )
-            return trip_plan
+        except (TypeError, ValueError):
+            raise ValueError("days must be a whole number") from None
+        if not 1 <= days <= itinerary.MAX_TRIP_DAYS:
+            raise ValueError(f"days must be between 1 and {itinerary.MAX_TRIP_DAYS}")
+        return {
+            "destination": str(data.get("destination") or "Unknown").title(),
+            "budget": budget,
+            "days": days,
+            "transportation": str(data.get("transportation", "any")),
+            "hotel_preference": str(data.get("hotel_preference", "any")),
+            "food_preference": str(data.get("food_preference", "any")),
+            "activities": activity_list(data.get("activities")),
+        }
+
+    def build_trip_plan(self, data):
+        """
+        Structured trip plan (see api/itinerary.py) from real-time API data.
+        """
+        trip = self.trip_data(data)
+        destination = trip["destination"]
+        # Call external API methods (cached and kept warm by the prefetch worker)
+        record_destination(destination)
+        attractions = cached_fetch("chatbot:places", destination, self.fetch_attractions, destination)
+        weather_info = cached_fetch("chatbot:weather", destination, self.fetch_weather, destination, cache_if=weather_available)
+        hotels = self.fetch_hotels(destination, trip["hotel_preference"])
+        restaurants = self.fetch_restaurants(destination, trip["food_preference"])
+        catalog = self.fetch_catalog(destination)
+        return itinerary.build_plan(trip, weather_info, attractions, hotels, restaurants, catalog)
+
+    def replan_trip(self, plan, changes):
+        """
+        Apply `changes` (any of the trip details) to a structured plan.
+        Only the parts that depend on a changed detail are recomputed; a
+        new destination rebuilds the whole plan. Returns (plan, summary).
+        """
+        trip = self.trip_data({**{name: plan[name] for name in itinerary.TRIP_DETAILS}, **changes})
+        if trip["destination"] != plan["destination"]:
+            return self.build_trip_plan(trip), {"changed": ["destination"], "full": True}
+        return itinerary.replan(plan, trip, self.fetch_hotels, self.fetch_restaurants, self.fetch_catalog)
+
+    def generate_trip_plan(self, data):
+        """
+        Production-level trip plan generation using real-time API data.
+        Falls back to GPT-4 if external API calls fail or return insufficient data.
+        """
+        try:
+            plan = self.build_trip_plan(data)
+            # If critical data is missing, trigger fallback
+            if not plan["attractions"] or not plan["hotels"] or not plan["restaurants"]:
+                raise Exception("Insufficient data from external APIs.")
+            return itinerary.render_plan(plan)
         except Exception as e:
-            logger.exception("Error generating trip plan: %s", e)
-            return "An error occurred while generating the trip plan."
+            logger.exception("Error generating trip plan using external APIs: %s", e)
+            return self.fallback_generate_trip_plan(data)
 
-    def fallback_openai_trip_plan(self, data):
+    def fallback_generate_trip_plan(self, data):
+        """
+        Fallback mechanism using OpenAI's GPT-4 to generate a day-wise itinerary.
+        This method is used if external API calls fail or return insufficient data.
+        The prompt lists the destination's own hotels and activities and asks for
+        a JSON plan that refers to them (see api/prompting.py).
+        """
         try:
-            # Using OpenAI as a fallback to generate itinerary
-            from openai import OpenAI
-            client = OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL)
-            prompt = (
-                f"Plan a detailed trip itinerary for a traveler with these details:\n"
-                f"Destination: {data.get('destination', 'Unknown')}\n"
-                f"Budget (INR): {data.get('budget', 10000)}\n"
-                f"Days: {data.get('days', 3)}\n"
-                f"Transportation: {data.get('transportation', 'any')}\n"
-                f"Hotel Preference: {data.get('hotel_preference', 'any')}\n"
-                f"Food Preference: {data.get('food_preference', 'any')}\n"
-                f"Activities: {', '.join(data.get('activities', [])) if data.get('activities') else 'none'}\n\n"
-                f"Return a well-structured itinerary including daily schedule, estimated costs, weather, "
-                f"and recommendations for hotels and restaurants."
-            )
-            completion = client.chat.completions.create(
-                model="gpt-4o-2024-05-13",
-                messages=[{"role": "user", "content": prompt}]
+            trip = self.trip_data(data)
+            messages, offered, max_tokens = prompting.build_prompt(trip)
+            response = llm.chat(
+                messages,
+                model=prompting.PLAN_MODEL,
+                user_id=self.user_id,
+                temperature=0.7,
+                max_tokens=max_tokens,
+                response_format={"type": "json_object"},
             )
-            answer = completion.choices[0].message.content
-            return answer
-        except Exception as e:
-            logger.exception("OpenAI fallback failed: %s", e)
-            return "An error occurred while generating a fallback trip plan."
+
+            content = response.choices[0].message.content.strip()
+            try:
+                return prompting.render_plan(trip, prompting.parse_plan(content, offered))
+            except ValueError as e:
+                logger.warning("Unstructured trip plan reply: %s", e)
+                return content
+
+        except llm.TokenBudgetExceeded as e:
+            logger.warning("Trip plan refused: %s", e)
+            return TOKEN_BUDGET_EXCEEDED
+        except Exception as fallback_exception:
+            logger.exception("Fallback generate trip plan error: %s", fallback_exception)
+            return "An error occurred while generating the trip plan."
 
     def fetch_attractions(self, destination):
+        """
+        Fetch attractions (name, lat, lon) using the Mapples API. Falls back to a default if the call fails.
+        """
         try:
+            MAPPLES_API_KEY = getattr(settings, "MAPPLES_API_KEY", None)
+            if not MAPPLES_API_KEY:
+                raise Exception("Mapples API key not configured.")
             url = f"https://api.mapples.com/v1/places/search?query={destination}&apikey={MAPPLES_API_KEY}"
             response = requests.get(url, timeout=5)
             response.raise_for_status()
             data = response.json()
-            attractions = [place.get("name") for place in data.get("results", []) if place.get("name")]
+            # Keep coordinates so the itinerary can group nearby attractions by day.
+            attractions = [
+                {
+                    "name": place.get("name"),
+                    "lat": place.get("latitude", place.get("lat")),
+                    "lon": place.get("longitude", place.get("lng", place.get("lon"))),
+                }
+                for place in data.get("results", []) if place.get("name")
+            ]
             if not attractions:
-                attractions = [f"Popular attraction in {destination}"]
-        except Exception:
-            logger.exception("Error fetching attractions from Mapples API")
-            attractions = [f"Famous landmark in {destination}"]
-        return attractions
+                attractions = [{"name": f"Famous landmark in {destination}"}]
+            return attractions
+        except Exception as e:
+            logger.exception("Error fetching attractions: %s", e)
+            return []
 
     def fetch_weather(self, destination):
+        """
+        Fetch current weather information for the destination from OpenWeather.
+        """
         try:
+            WEATHER_API_KEY = getattr(settings, "WEATHER_API_KEY", None)
+            if not WEATHER_API_KEY:
+                raise Exception("Weather API key not configured.")
             url = f"http://api.openweathermap.org/data/2.5/weather?q={destination}&appid={WEATHER_API_KEY}&units=metric"
             response = requests.get(url, timeout=5)
             response.raise_for_status()
@@ -241,65 +424,48 @@ class Chatbot:
                 description = data["weather"][0]["description"].capitalize()
                 return f"Current weather in {destination}: {temp}°C, {description}."
             else:
-                return "Weather information is unavailable."
-        except Exception:
-            logger.exception("Error fetching weather information")
-            return "Weather information is unavailable."
+                return WEATHER_UNAVAILABLE
+        except Exception as e:
+            logger.exception("Error fetching weather: %s", e)
+            return WEATHER_UNAVAILABLE
+
+    def fetch_catalog(self, destination):
+        """
+        Bookable hotels and activities for the destination from our own
+        catalogue, used to price the plan. Returns None when there are none.
+        """
+        try:
+            return budget_optimizer.load_catalog(destination) or None
+        except Exception as e:
+            logger.exception("Error loading catalogue for %s: %s", destination, e)
+            return None
 
     def fetch_hotels(self, destination, hotel_pref):
+        """
+        Fetch hotel recommendations based on destination and preference.
+        In production, replace simulated data with a real API call.
+        """
         try:
-            if hotel_pref in ["luxury", "boutique"]:
-                hotels = [f"{destination} Grand Palace", f"{destination} Royal Residency", f"{destination} Elite Suites"]
-            elif hotel_pref == "budget":
-                hotels = [f"{destination} Comfort Inn", f"{destination} Budget Stay", f"{destination} City Lodge"]
+            if hotel_pref.lower() in ["luxury", "boutique"]:
+                return [f"{destination} Grand Palace", f"{destination} Royal Residency", f"{destination} Elite Suites"]
+            elif hotel_pref.lower() == "budget":
+                return [f"{destination} Comfort Inn", f"{destination} Budget Stay", f"{destination} City Lodge"]
             else:
-                hotels = [f"{destination} Central Hotel", f"{destination} Heritage Inn", f"{destination} Traveller's Rest"]
-        except Exception:
-            logger.exception("Error fetching hotel information")
-            hotels = [f"Standard hotel in {destination}"]
-        return hotels
+                return [f"{destination} Central Hotel", f"{destination} Heritage Inn", f"{destination} Traveller's Rest"]
+        except Exception as e:
+            logger.exception("Error fetching hotels: %s", e)
+            return []
 
     def fetch_restaurants(self, destination, food_pref):
+        """
+        Fetch restaurant recommendations based on destination and cuisine preference.
+        In production, replace simulated data with a real API call.
+        """
         try:
-            if food_pref in ["north indian", "south indian", "continental"]:
-                restaurants = [
-                    f"{destination} {food_pref.title()} Delight",
-                    f"{destination} {food_pref.title()} Bistro",
-                    f"{destination} {food_pref.title()} Corner"
-                ]
+            if food_pref.lower() in ["north indian", "south indian", "continental"]:
+                return [f"{destination} {food_pref.title()} Delight", f"{destination} {food_pref.title()} Bistro", f"{destination} {food_pref.title()} Corner"]
             else:
-                restaurants = [f"{destination} Food Plaza", f"{destination} Diner", f"{destination} Culinary Hub"]
-        except Exception:
-            logger.exception("Error fetching restaurant information")
-            restaurants = [f"Popular restaurant in {destination}"]
-        return restaurants
-
-    def calculate_costs(self, budget, days, transportation, hotel_pref):
-        try:
-            trans_cost = 0.2 * budget if transportation != "any" else 0.15 * budget
-            hotel_cost = 0.5 * budget if hotel_pref in ["luxury", "boutique"] else 0.3 * budget
-            food_cost = 0.1 * budget
-            activity_cost = 0.1 * budget
-            total = trans_cost + hotel_cost + food_cost + activity_cost
-            breakdown = (
-                f"Transportation: INR {trans_cost:.0f}\n"
-                f"Accommodation: INR {hotel_cost:.0f}\n"
-                f"Food: INR {food_cost:.0f}\n"
-                f"Activities: INR {activity_cost:.0f}\n"
-                f"Total: INR {total:.0f}"
-            )
-        except Exception:
-            logger.exception("Error calculating cost breakdown")
-            breakdown = "Cost breakdown unavailable."
-        return breakdown
-
-    def create_itinerary(self, days, attractions, activities):
-        itinerary_lines = []
-        for day in range(1, days + 1):
-            attraction = attractions[(day - 1) % len(attractions)]
-            day_activities = f"Explore {attraction}"
-            if activities:
-                additional = ", ".join(activities)
-                day_activities += f"; also enjoy: {additional}"
-            itinerary_lines.append(f"Day {day}: {day_activities}.")
-        return "\n".join(itinerary_lines)
+                return [f"{destination} Food Plaza", f"{destination} Diner", f"{destination} Culinary Hub"]
+        except Exception as e:
+            logger.exception("Error fetching restaurants: %s", e)
+            return []
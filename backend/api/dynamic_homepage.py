@@ -5,6 +5,9 @@ import logging
 from django.conf import settings
 from django.urls import path
 import time
+from . import geo
+from .models import Activity, Destination, Hotel
+from .prefetch import cached_fetch, record_destination
 
 logger = logging.getLogger(__name__)
 
@@ -19,29 +22,40 @@ HEADERS = {
     "X-RapidAPI-Host": RAPIDAPI_HOST
 }
 
+# Hotels and activities in our own catalogue within this distance of the
+# homepage location are shown instead of remote/simulated results.
+LOCAL_RADIUS_KM = 25
+
 @api_view(["GET"])
 def fetch_homepage_data(request):
     """
     Fetch real-time trending destinations, recommended hotels, restaurants,
     flights, trains, weather, and simulated activities.
     If a "location" query parameter is provided, use that location; otherwise, use a default.
+    Hotels and activities from our own catalogue near the location (or near
+    ?lat=&lon=) are preferred over the remote and simulated ones.
     """
     try:
         # Get the user-specified location from query parameters; default to "new york" if not provided.
         user_location = request.GET.get("location", "").strip()
         base_query = user_location if user_location else "new york"
+        record_destination(base_query)
 
-        # Fetch data using the provided query.
-        trending_destinations = fetch_trending_destinations(query=base_query)
+        # Fetch data using the provided query. Upstream results are served from the
+        # shared cache, which the prefetch worker keeps warm for popular destinations.
+        trending_destinations = cached_fetch("homepage:trending", base_query, fetch_trending_destinations, base_query)
         # If trending data is empty, fallback to using the base query as destination.
         base_destination = trending_destinations[0]["destination"] if trending_destinations else base_query
 
-        weather_data = fetch_weather(base_destination)
-        hotels_data = fetch_hotels(query=base_query)
-        restaurants_data = fetch_restaurants(query=base_query)
+        weather_data = cached_fetch("homepage:weather", base_destination, fetch_weather, base_destination)
+        point = homepage_point(request.GET, trending_destinations, base_destination)
+        hotels_data = local_hotels(*point) if point else []
+        if not hotels_data:
+            hotels_data = cached_fetch("homepage:hotels", base_query, fetch_hotels, base_query)
+        restaurants_data = cached_fetch("homepage:restaurants", base_query, fetch_restaurants, base_query)
         flights_data = fetch_flights()      # (Static/demo data; replace if you have a dynamic API)
         trains_data = fetch_trains()          # (Static/demo data)
-        activities_data = fetch_activities(base_destination)
+        activities_data = (local_activities(*point) if point else []) or fetch_activities(base_destination)
 
         return Response({
             "trending_destinations": trending_destinations,
@@ -56,6 +70,62 @@ def fetch_homepage_data(request):
         logger.exception("Error fetching homepage data: %s", e)
         return Response({"error": "Failed to load homepage data."}, status=500)
 
+def homepage_point(params, trending_destinations, base_destination):
+    """
+    (lat, lon) for the homepage: explicit ?lat=&lon=, else the coordinates of
+    the top trending result, else those of a matching local Destination.
+    Returns None when none are known.
+    """
+    try:
+        lat, lon = float(params["lat"]), float(params["lon"])
+        geo.check_point(lat, lon)
+        return lat, lon
+    except (KeyError, ValueError):
+        pass
+    for item in trending_destinations[:1]:
+        try:
+            return float(item["latitude"]), float(item["longitude"])
+        except (KeyError, TypeError, ValueError):
+            pass
+    return (
+        Destination.objects.filter(name__iexact=base_destination, latitude__isnull=False, longitude__isnull=False)
+        .values_list("latitude", "longitude").first()
+    )
+
+def local_hotels(lat, lon, limit=5):
+    """Hotels from our catalogue near (lat, lon), in the same shape as fetch_hotels()."""
+    try:
+        places = geo.nearby(lat, lon, radius_km=LOCAL_RADIUS_KM, limit=limit, kinds=["hotel"])
+        hotels = Hotel.objects.select_related("destination").in_bulk([place["id"] for place in places])
+    except Exception as e:
+        logger.exception("Error loading local hotels: %s", e)
+        return []
+    return [{
+        "id": hotel.id,
+        "name": hotel.name,
+        "address": hotel.destination.location or hotel.destination.name,
+        "rating": float(hotel.rating),
+        "image": hotel.image.url if hotel.image else "",
+        "distance_km": place["distance_km"],
+    } for place in places if (hotel := hotels.get(place["id"]))]
+
+def local_activities(lat, lon, limit=5):
+    """Activities from our catalogue near (lat, lon), in the same shape as fetch_activities()."""
+    try:
+        places = geo.nearby(lat, lon, radius_km=LOCAL_RADIUS_KM, limit=limit, kinds=["activity"])
+        activities = Activity.objects.select_related("destination").in_bulk([place["id"] for place in places])
+    except Exception as e:
+        logger.exception("Error loading local activities: %s", e)
+        return []
+    return [{
+        "id": activity.id,
+        "name": activity.name,
+        "location": activity.destination.name,
+        "type": "Activity",
+        "price": float(activity.price),
+        "distance_km": place["distance_km"],
+    } for place in places if (activity := activities.get(place["id"]))]
+
 def parse_response(response):
     """
     Helper function to handle responses that might be either a list or a dict.
@@ -0,0 +1,134 @@
+"""
+Fare and availability calendar.
+
+FlightDailyFare holds, per route (lowercase source and destination) and
+departure day in the current time zone, the number of flights, how many
+have seats left, the total seats left and the cheapest fare among flights
+with seats. Saving or deleting a Flight re-aggregates only the day(s) it
+affects, with one indexed query, once the transaction commits; a calendar
+request is then one range query on the aggregate table instead of a
+`departure_time__date` scan per day.
+
+queryset.update() and bulk_create() send no signals: run
+`manage.py rebuild_fare_calendar` after bulk flight imports.
+"""
+import datetime
+
+from django.db import transaction
+from django.db.models import Count, Min, Q, Sum
+from django.db.models.functions import Lower, TruncDate
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Flight, FlightDailyFare
+
+CALENDAR_MAX_DAYS = 180
+CALENDAR_DEFAULT_DAYS = 30
+ROUTE_FIELDS = frozenset({"source", "destination", "departure_time"})
+FARE_FIELDS = ROUTE_FIELDS | {"price", "available_seats"}
+
+AGGREGATES = {
+    "flights": Count("id"),
+    "available_flights": Count("id", filter=Q(available_seats__gt=0)),
+    "seats_left": Sum("available_seats", filter=Q(available_seats__gt=0), default=0),
+    "min_price": Min("price", filter=Q(available_seats__gt=0)),
+}
+
+
+def route_key(name):
+    # Must match Lower() in SQL, which the aggregates and the index are keyed on.
+    return str(name).lower()
+
+
+def fare_key(source, destination, departure_time):
+    return route_key(source), route_key(destination), timezone.localdate(departure_time)
+
+
+def day_bounds(date):
+    start = timezone.make_aware(datetime.datetime.combine(date, datetime.time.min))
+    return start, start + datetime.timedelta(days=1)
+
+
+def refresh_day(source, destination, date):
+    """Recompute one route/day aggregate from its flights (uses api_flight_route_dep_idx)."""
+    start, end = day_bounds(date)
+    totals = Flight.objects.alias(route_source=Lower("source"), route_destination=Lower("destination")).filter(
+        route_source=source, route_destination=destination, departure_time__gte=start, departure_time__lt=end,
+    ).aggregate(**AGGREGATES)
+    if not totals["flights"]:
+        FlightDailyFare.objects.filter(source=source, destination=destination, date=date).delete()
+        return None
+    fare, _ = FlightDailyFare.objects.update_or_create(source=source, destination=destination, date=date,
+                                                       defaults=totals)
+    return fare
+
+
+def rebuild(since=None):
+    """Recompute every aggregate (or those from `since` on) in one grouped query. Returns the row count."""
+    flights = Flight.objects.all()
+    fares = FlightDailyFare.objects.all()
+    if since:
+        flights = flights.filter(departure_time__gte=day_bounds(since)[0])
+        fares = fares.filter(date__gte=since)
+    rows = flights.values(
+        route_source=Lower("source"), route_destination=Lower("destination"), day=TruncDate("departure_time"),
+    ).annotate(**AGGREGATES).order_by()
+    with transaction.atomic():
+        fares.delete()
+        created = FlightDailyFare.objects.bulk_create([
+            FlightDailyFare(source=row["route_source"], destination=row["route_destination"], date=row["day"],
+                            **{name: row[name] for name in AGGREGATES})
+            for row in rows.iterator(chunk_size=2000)
+        ], batch_size=1000)
+    return len(created)
+
+
+def calendar(source, destination, start, end):
+    """One entry per day from start to end (inclusive); days without flights have zero availability."""
+    if end < start:
+        raise ValueError("end must not be before start.")
+    if (end - start).days >= CALENDAR_MAX_DAYS:
+        raise ValueError(f"The date range is limited to {CALENDAR_MAX_DAYS} days.")
+    fares = {
+        fare.date: fare for fare in FlightDailyFare.objects.filter(
+            source=route_key(source.strip()), destination=route_key(destination.strip()), date__range=(start, end),
+        )
+    }
+    days = []
+    for offset in range((end - start).days + 1):
+        date = start + datetime.timedelta(days=offset)
+        fare = fares.get(date)
+        days.append({
+            "date": date,
+            "min_price": fare.min_price if fare else None,
+            "flights": fare.flights if fare else 0,
+            "available_flights": fare.available_flights if fare else 0,
+            "seats_left": fare.seats_left if fare else 0,
+        })
+    return days
+
+
+@receiver(pre_save, sender=Flight)
+def remember_fare_key(instance, raw=False, update_fields=None, **kwargs):
+    # The day a flight is moved away from needs re-aggregating too.
+    previous = None
+    if instance.pk and not raw and (update_fields is None or ROUTE_FIELDS.intersection(update_fields)):
+        previous = Flight.objects.filter(pk=instance.pk).values_list("source", "destination", "departure_time").first()
+    instance._previous_fare_key = fare_key(*previous) if previous else None
+
+
+@receiver(post_save, sender=Flight)
+def update_fares(instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not FARE_FIELDS.intersection(update_fields)):
+        return
+    keys = {fare_key(instance.source, instance.destination, instance.departure_time)}
+    if getattr(instance, "_previous_fare_key", None):
+        keys.add(instance._previous_fare_key)
+    transaction.on_commit(lambda: [refresh_day(*key) for key in keys])
+
+
+@receiver(post_delete, sender=Flight)
+def remove_fares(instance, **kwargs):
+    key = fare_key(instance.source, instance.destination, instance.departure_time)
+    transaction.on_commit(lambda: refresh_day(*key))
@@ -0,0 +1,127 @@
+"""
+Custom model fields.
+
+CompressedTextField stores large text compressed in a binary column. Values
+of at least COMPRESSED_TEXT_MIN_SIZE bytes are compressed with zlib (or
+zstd when COMPRESSED_TEXT_ALGORITHM = "zstd" and the `zstandard` package
+is installed); smaller values, and values that do not compress, are stored
+as plain UTF-8. The first byte of every stored value names its codec
+(plain, zlib or zstd), so the algorithm can be changed without rewriting
+existing rows, and text of any content reads back unchanged. Rows written
+before the column was converted (text, not bytes) also read back as they
+are; migration 0011 added the marker to plain values stored without one.
+
+Values are decompressed lazily on first attribute access, so listing rows
+without touching the field costs no decompression, and saving a row whose
+value was not read writes the stored bytes back as they are. Compressed
+columns cannot be searched with SQL lookups such as `icontains`.
+"""
+import zlib
+
+from django.conf import settings
+from django.db import models
+from django.db.models.query_utils import DeferredAttribute
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSED_TEXT_MIN_SIZE = getattr(settings, "COMPRESSED_TEXT_MIN_SIZE", 1024)
+COMPRESSED_TEXT_ALGORITHM = getattr(settings, "COMPRESSED_TEXT_ALGORITHM", "zlib")
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 10
+
+# Leading byte of every stored value.
+PLAIN_MARKER = b"\x00"
+ZLIB_MARKER = b"\x01"
+ZSTD_MARKER = b"\x02"
+
+
+def compress_text(text, algorithm=None, min_size=None):
+    """Encode text for storage: marker + plain UTF-8 below min_size, otherwise marker + compressed bytes."""
+    algorithm = algorithm or COMPRESSED_TEXT_ALGORITHM
+    min_size = COMPRESSED_TEXT_MIN_SIZE if min_size is None else min_size
+    data = PLAIN_MARKER + text.encode("utf-8")
+    if len(data) <= min_size:
+        return data
+    if algorithm == "zstd":
+        if zstandard is None:
+            raise ValueError("COMPRESSED_TEXT_ALGORITHM is 'zstd' but the zstandard package is not installed.")
+        compressed = ZSTD_MARKER + zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data[1:])
+    else:
+        compressed = ZLIB_MARKER + zlib.compress(data[1:], ZLIB_LEVEL)
+    return compressed if len(compressed) < len(data) else data
+
+
+def decompress_text(value):
+    """Decode a stored value (bytes, memoryview, or legacy text) back to text."""
+    if isinstance(value, str):
+        return value
+    value = bytes(value)
+    marker = value[:1]
+    if marker == PLAIN_MARKER:
+        return value[1:].decode("utf-8")
+    if marker == ZLIB_MARKER:
+        return zlib.decompress(value[1:]).decode("utf-8")
+    if marker == ZSTD_MARKER:
+        if zstandard is None:
+            raise ValueError("Found a zstd-compressed value but the zstandard package is not installed.")
+        return zstandard.ZstdDecompressor().decompress(value[1:]).decode("utf-8")
+    raise ValueError(f"Stored text has an unknown codec marker {marker!r}.")
+
+
+class StoredText(bytes):
+    """Stored (possibly compressed) bytes as loaded from the database, not yet decoded."""
+
+
+class CompressedTextDescriptor(DeferredAttribute):
+    """
+    Decompresses the stored value on first access. A deferred field is
+    loaded from the database first, as with any other field; __set__ makes
+    this a data descriptor, so reads go through __get__ even once loaded.
+    """
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self
+        value = super().__get__(instance, cls)
+        if isinstance(value, StoredText):
+            value = instance.__dict__[self.field.attname] = decompress_text(value)
+        return value
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.field.attname] = value
+
+
+class CompressedTextField(models.TextField):
+    """A TextField stored compressed in a binary column; see the module docstring."""
+    descriptor_class = CompressedTextDescriptor
+
+    def get_internal_type(self):
+        return "BinaryField"
+
+    def from_db_value(self, value, expression, connection):
+        if value is None or isinstance(value, str):
+            return value
+        return StoredText(value)
+
+    def to_python(self, value):
+        if isinstance(value, (bytes, memoryview)):
+            return decompress_text(value)
+        return super().to_python(value)
+
+    def get_prep_value(self, value):
+        if value is None:
+            return None
+        if isinstance(value, StoredText):
+            return bytes(value)
+        return compress_text(str(value))
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        value = super().get_db_prep_value(value, connection, prepared)
+        if value is not None:
+            return connection.Database.Binary(value)
+        return value
+
+    def value_to_string(self, obj):
+        return self.value_from_object(obj)
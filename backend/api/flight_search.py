@@ -0,0 +1,312 @@
+"""
+Multi-leg flight search.
+
+Flights are kept in memory as columnar numpy arrays, with each airport's
+departures sorted by time. A search is a dynamic program over the
+time-expanded graph in which flights are the nodes and a connection
+g -> h exists when h leaves g's arrival airport between min_layover and
+max_layover after g lands. Round k holds every flight reachable as leg k
+with the cheapest fare to get there: leg k+1 candidates are the
+departures within the layover window of some round-k arrival, and each
+picks its cheapest feasible predecessor with a range-minimum query over
+that airport's arrivals sorted by time. Up to MAX_STOPS + 1 rounds give,
+for every flight into the destination, its cheapest itinerary, its
+arrival time and its number of stops, which is all that sorting by
+earliest arrival, lowest price or fewest stops needs.
+
+The index is built once per process and updated in place when a Flight is
+saved or deleted in this process; changes made elsewhere (other
+processes, queryset.update() or bulk_create(), which send no signals)
+are picked up by a full rebuild after FLIGHT_INDEX_TTL seconds.
+"""
+import datetime
+import threading
+import time
+
+import numpy as np
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Flight
+
+FLIGHT_INDEX_TTL = 600
+MAX_STOPS = 2
+MIN_LAYOVER_MINUTES = 60
+MAX_LAYOVER_MINUTES = 24 * 60
+LONGEST_LAYOVER_MINUTES = 7 * 24 * 60  # upper bound for a requested max_layover
+MAX_RESULTS = 50
+SORTS = ("earliest", "cheapest", "fewest_stops")
+
+COLUMNS = ("id", "source", "destination", "departure", "arrival", "price", "seats", "alive")
+DTYPES = (np.int64, np.int32, np.int32, np.int64, np.int64, np.float64, np.int32, bool)
+
+
+def airport_key(name):
+    return " ".join(str(name).split()).lower()
+
+
+def epoch(value):
+    return int(value.timestamp())
+
+
+class FlightIndex:
+    """
+    Columnar flight table plus, per source airport, flight positions sorted
+    by departure. Updates append a new row and tombstone the old one, so
+    positions held by a running search stay valid.
+    """
+
+    def __init__(self, capacity=1024):
+        self.size = 0
+        for column, dtype in zip(COLUMNS, DTYPES):
+            setattr(self, column, np.zeros(capacity, dtype=dtype))
+        self.airports = {}  # key -> code
+        self.airport_names = []
+        self.positions = {}  # flight id -> current row
+        self.departures = {}  # airport code -> (row positions, departure times), sorted by time
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build from (id, source, destination, departure, arrival, price, seats) rows, times as datetimes."""
+        rows = list(rows)
+        index = cls(capacity=max(1024, len(rows)))
+        if rows:
+            index._append([(row[0], index.airport(row[1]), index.airport(row[2]), epoch(row[3]), epoch(row[4]),
+                            float(row[5]), row[6]) for row in rows])
+            index._sort_departures(range(len(index.airport_names)))
+        return index
+
+    def airport(self, name):
+        key = airport_key(name)
+        if key not in self.airports:
+            self.airports[key] = len(self.airport_names)
+            self.airport_names.append(" ".join(str(name).split()))
+        return self.airports[key]
+
+    def _append(self, rows):
+        needed = self.size + len(rows)
+        if needed > len(self.id):
+            capacity = max(needed, 2 * len(self.id))
+            for column in COLUMNS:
+                old = getattr(self, column)
+                grown = np.zeros(capacity, dtype=old.dtype)
+                grown[:self.size] = old[:self.size]
+                setattr(self, column, grown)
+        start = self.size
+        for column, values in zip(COLUMNS, zip(*rows)):
+            getattr(self, column)[start:needed] = values
+        self.alive[start:needed] = True
+        for offset, row in enumerate(rows):
+            self.positions[row[0]] = start + offset
+        self.size = needed
+        return range(start, needed)
+
+    def _sort_departures(self, codes):
+        alive = np.flatnonzero(self.alive[:self.size])
+        for code in codes:
+            rows = alive[self.source[alive] == code]
+            rows = rows[np.argsort(self.departure[rows], kind="stable")]
+            self.departures[code] = (rows, self.departure[rows])
+
+    def upsert(self, flight):
+        """Add or replace one flight (a Flight instance) in place."""
+        with self.lock:
+            old = self.positions.get(flight.pk)
+            row = (flight.pk, self.airport(flight.source), self.airport(flight.destination),
+                   epoch(flight.departure_time), epoch(flight.arrival_time), float(flight.price),
+                   flight.available_seats)
+            if old is not None:
+                self._remove_position(old)
+            (position,) = self._append([row])
+            rows, times = self.departures.get(row[1], (np.zeros(0, np.int64), np.zeros(0, np.int64)))
+            at = np.searchsorted(times, row[3], side="right")
+            self.departures[row[1]] = (np.insert(rows, at, position), np.insert(times, at, row[3]))
+
+    def remove(self, flight_id):
+        with self.lock:
+            position = self.positions.pop(flight_id, None)
+            if position is not None:
+                self._remove_position(position)
+
+    def _remove_position(self, position):
+        self.alive[position] = False
+        code = int(self.source[position])
+        rows, times = self.departures[code]
+        keep = rows != position
+        self.departures[code] = (rows[keep], times[keep])
+
+    def _leaving(self, code, earliest, latest):
+        """Row positions of flights leaving airport `code` with departure in [earliest, latest]."""
+        rows, times = self.departures.get(code, (np.zeros(0, np.int64), np.zeros(0, np.int64)))
+        return rows[np.searchsorted(times, earliest, side="left"):np.searchsorted(times, latest, side="right")]
+
+    def search(self, source, destination, earliest, latest, max_stops=MAX_STOPS,
+               min_layover=MIN_LAYOVER_MINUTES * 60, max_layover=MAX_LAYOVER_MINUTES * 60, passengers=1):
+        """
+        All itineraries from `source` to `destination` whose first leg leaves
+        in [earliest, latest] (epoch seconds), one per final flight and
+        number of legs, as (legs, total price) with legs as row positions.
+        """
+        if not 0 <= min_layover <= max_layover <= LONGEST_LAYOVER_MINUTES * 60:
+            raise ValueError(f"Layovers must be between 0 and {LONGEST_LAYOVER_MINUTES * 60} seconds.")
+        origin, target = self.airports.get(airport_key(source)), self.airports.get(airport_key(destination))
+        if origin is None or target is None or origin == target:
+            return []
+        rows = self._leaving(origin, earliest, latest)
+        rows = rows[(self.seats[rows] >= passengers) & self.alive[rows]]
+        rounds = [(rows, self.price[rows] * passengers, np.full(len(rows), -1))]
+        for _ in range(max_stops):
+            rounds.append(self._connect(rounds[-1], origin, target, min_layover, max_layover, passengers))
+
+        itineraries = []
+        for number, (rows, costs, _) in enumerate(rounds):
+            for i in np.flatnonzero(self.destination[rows] == target).tolist():
+                legs, k = [], i
+                for level in range(number, -1, -1):
+                    legs.append(int(rounds[level][0][k]))
+                    k = int(rounds[level][2][k])
+                itineraries.append((legs[::-1], float(costs[i])))
+        return itineraries
+
+    def _connect(self, previous, origin, target, min_layover, max_layover, passengers):
+        """The next round: every flight that can follow a flight of `previous`, with its cheapest predecessor."""
+        rows, costs, _ = previous
+        next_rows, next_costs, next_preds = [], [], []
+        arrivals_at = self.destination[rows]
+        for airport in np.unique(arrivals_at).tolist():
+            if airport in (target, origin):
+                continue
+            here = np.flatnonzero(arrivals_at == airport)
+            here = here[np.argsort(self.arrival[rows[here]], kind="stable")]
+            arrived = self.arrival[rows[here]]
+            leaving = self._leaving(airport, arrived[0] + min_layover, arrived[-1] + max_layover)
+            leaving = leaving[(self.seats[leaving] >= passengers) & self.alive[leaving]
+                              & (self.destination[leaving] != origin)]
+            if not len(leaving):
+                continue
+            departs = self.departure[leaving]
+            lo = np.searchsorted(arrived, departs - max_layover, side="left")
+            hi = np.searchsorted(arrived, departs - min_layover, side="right")
+            ok = hi > lo
+            leaving, lo, hi = leaving[ok], lo[ok], hi[ok]
+            best = range_argmin(costs[here], lo, hi)
+            next_rows.append(leaving)
+            next_costs.append(costs[here][best] + self.price[leaving] * passengers)
+            next_preds.append(here[best])
+        if not next_rows:
+            return np.zeros(0, np.int64), np.zeros(0), np.zeros(0, np.int64)
+        return np.concatenate(next_rows), np.concatenate(next_costs), np.concatenate(next_preds)
+
+    def describe(self, position):
+        return {
+            "id": int(self.id[position]),
+            "source": self.airport_names[self.source[position]],
+            "destination": self.airport_names[self.destination[position]],
+            "departure_time": datetime.datetime.fromtimestamp(int(self.departure[position]), datetime.timezone.utc),
+            "arrival_time": datetime.datetime.fromtimestamp(int(self.arrival[position]), datetime.timezone.utc),
+            "price": float(self.price[position]),
+        }
+
+
+def range_argmin(values, lo, hi):
+    """For each half-open window [lo[i], hi[i]) of `values`, the index of its minimum (sparse table)."""
+    n = len(values)
+    table = [np.arange(n)]
+    span = 1
+    while 2 * span <= n:
+        prev = table[-1]
+        left, right = prev[:-span], prev[span:]
+        table.append(np.where(values[right] < values[left], right, left))
+        span *= 2
+    length = hi - lo
+    level = np.floor(np.log2(length)).astype(np.int64)
+    left = np.empty(len(lo), dtype=np.int64)
+    right = np.empty(len(lo), dtype=np.int64)
+    for k in np.unique(level).tolist():
+        mask = level == k
+        left[mask] = table[k][lo[mask]]
+        right[mask] = table[k][hi[mask] - (1 << k)]
+    return np.where(values[right] < values[left], right, left)
+
+
+def build_index():
+    return FlightIndex.from_rows(Flight.objects.values_list(
+        "id", "source", "destination", "departure_time", "arrival_time", "price", "available_seats"
+    ).iterator(chunk_size=10000))
+
+
+_index = None
+_index_built_at = 0.0
+_index_lock = threading.Lock()
+
+
+def get_index():
+    global _index, _index_built_at
+    if _index is None or time.monotonic() - _index_built_at > FLIGHT_INDEX_TTL:
+        with _index_lock:
+            if _index is None or time.monotonic() - _index_built_at > FLIGHT_INDEX_TTL:
+                _index = build_index()
+                _index_built_at = time.monotonic()
+    return _index
+
+
+@receiver(post_save, sender=Flight)
+def update_index(instance, **kwargs):
+    if _index is not None:
+        _index.upsert(instance)
+
+
+@receiver(post_delete, sender=Flight)
+def remove_from_index(instance, **kwargs):
+    if _index is not None:
+        _index.remove(instance.pk)
+
+
+def itinerary(index, legs, total, details):
+    flights = [{**index.describe(position), **details[int(index.id[position])]} for position in legs]
+    departure, arrival = flights[0]["departure_time"], flights[-1]["arrival_time"]
+    return {
+        "legs": flights,
+        "stops": len(flights) - 1,
+        "total_price": round(total, 2),
+        "departure_time": departure,
+        "arrival_time": arrival,
+        "duration_minutes": int((arrival - departure).total_seconds() // 60),
+    }
+
+
+def search_routes(source, destination, date, sort="earliest", max_stops=MAX_STOPS, passengers=1,
+                  min_layover=MIN_LAYOVER_MINUTES, max_layover=MAX_LAYOVER_MINUTES, limit=10):
+    """
+    Itineraries from source to destination leaving on `date` (a date, in the
+    current time zone), sorted by earliest arrival, lowest total price or
+    fewest stops; ties are broken by the other two criteria.
+    """
+    if sort not in SORTS:
+        raise ValueError(f"sort must be one of {', '.join(SORTS)}.")
+    if not 0 <= max_stops <= MAX_STOPS:
+        raise ValueError(f"max_stops must be between 0 and {MAX_STOPS}.")
+    if not 0 <= min_layover <= max_layover:
+        raise ValueError("min_layover must be between 0 and max_layover.")
+    if max_layover > LONGEST_LAYOVER_MINUTES:
+        raise ValueError(f"max_layover must be at most {LONGEST_LAYOVER_MINUTES} minutes.")
+    start = timezone.make_aware(datetime.datetime.combine(date, datetime.time.min))
+    earliest = max(epoch(start), epoch(timezone.now()))
+    latest = epoch(start + datetime.timedelta(days=1)) - 1
+    index = get_index()
+    found = index.search(source, destination, earliest, latest, max_stops, min_layover * 60, max_layover * 60,
+                         passengers)
+    keys = {
+        "earliest": lambda option: (index.arrival[option[0][-1]], option[1], len(option[0])),
+        "cheapest": lambda option: (option[1], index.arrival[option[0][-1]], len(option[0])),
+        "fewest_stops": lambda option: (len(option[0]), index.arrival[option[0][-1]], option[1]),
+    }
+    found.sort(key=keys[sort])
+    found = found[:max(1, min(limit, MAX_RESULTS))]
+    ids = {int(index.id[position]) for legs, _ in found for position in legs}
+    details = {row["id"]: row for row in Flight.objects.filter(pk__in=ids).values("id", "flight_number", "airline")}
+    # Skip itineraries using a flight deleted by another process since the index was built.
+    return [itinerary(index, legs, total, details) for legs, total in found
+            if all(int(index.id[position]) in details for position in legs)]
@@ -0,0 +1,227 @@
+"""
+Local geospatial index over destinations, hotels and activities.
+
+Every place with coordinates (hotels and activities without their own fall
+back to their destination's) is kept in an in-memory grid: points are
+sorted by the key of the CELL_DEGREES x CELL_DEGREES cell they fall in, so
+the points of one row of cells are a contiguous slice found with two
+binary searches. A bounding-box query costs one pair of searches per row
+of cells it spans, and nearest-N grows a search radius from one cell until
+N places lie inside it. Either stays well under a millisecond at a million
+places (see `manage.py bench_geo`), without a spatial database extension.
+
+The grid is built once per process and rebuilt when a place's coordinates
+change in this process, or at the latest after GEO_INDEX_TTL seconds
+(changes made by other processes). Longitudes do not wrap around the
+antimeridian.
+"""
+import math
+import threading
+import time
+
+import numpy as np
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Activity, Destination, Hotel
+from .routing import EARTH_RADIUS_KM
+
+GEO_INDEX_TTL = 300
+CELL_DEGREES = 0.1
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+MAX_RADIUS_KM = 500
+MAX_RESULTS = 100
+
+PLACE_MODELS = {"destination": Destination, "hotel": Hotel, "activity": Activity}
+KINDS = tuple(PLACE_MODELS)
+COORDINATE_FIELDS = frozenset({"latitude", "longitude", "destination", "destination_id"})
+
+
+def haversine_km(lat, lon, lats, lons):
+    """Great-circle distances in km from one point to arrays of points (degrees)."""
+    lat, lon = math.radians(lat), math.radians(lon)
+    lats, lons = np.radians(lats), np.radians(lons)
+    a = np.sin((lats - lat) / 2) ** 2 + math.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def check_point(lat, lon):
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError("Latitude must be within [-90, 90] and longitude within [-180, 180].")
+
+
+class GridIndex:
+    """Points (kind code, id, lat, lon) bucketed by grid cell; see the module docstring."""
+
+    def __init__(self, kinds, ids, lat, lon, cell_degrees=CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        self.rows = int(math.ceil(180 / cell_degrees))
+        self.columns = int(math.ceil(360 / cell_degrees))
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        keys = self._row(lat) * self.columns + self._column(lon)
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.kinds = np.asarray(kinds, dtype=np.int8)[order]
+        self.ids = np.asarray(ids, dtype=np.int64)[order]
+        self.lat = lat[order]
+        self.lon = lon[order]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _row(self, lat):
+        return np.clip(((np.asarray(lat) + 90) // self.cell_degrees).astype(np.int64), 0, self.rows - 1)
+
+    def _column(self, lon):
+        return np.clip(((np.asarray(lon) + 180) // self.cell_degrees).astype(np.int64), 0, self.columns - 1)
+
+    def _candidates(self, min_lat, min_lon, max_lat, max_lon):
+        """Positions of every point in the cells overlapping the box."""
+        rows = np.arange(int(self._row(min_lat)), int(self._row(max_lat)) + 1, dtype=np.int64)
+        first, last = int(self._column(min_lon)), int(self._column(max_lon))
+        starts = np.searchsorted(self.keys, rows * self.columns + first, side="left")
+        ends = np.searchsorted(self.keys, rows * self.columns + last, side="right")
+        spans = [np.arange(start, end) for start, end in zip(starts, ends) if end > start]
+        return np.concatenate(spans) if spans else np.empty(0, dtype=np.int64)
+
+    def _filter_kinds(self, positions, kinds):
+        if kinds is None:
+            return positions
+        return positions[np.isin(self.kinds[positions], kinds)]
+
+    def within_bbox(self, min_lat, min_lon, max_lat, max_lon, kinds=None):
+        """Positions of the points inside the box (inclusive), optionally only of the given kind codes."""
+        positions = self._filter_kinds(self._candidates(min_lat, min_lon, max_lat, max_lon), kinds)
+        lat, lon = self.lat[positions], self.lon[positions]
+        return positions[(lat >= min_lat) & (lat <= max_lat) & (lon >= min_lon) & (lon <= max_lon)]
+
+    def nearest(self, lat, lon, n, max_km=MAX_RADIUS_KM, kinds=None):
+        """
+        Positions and distances (km) of the n points closest to (lat, lon)
+        within max_km, nearest first.
+        """
+        radius = min(self.cell_degrees * KM_PER_DEGREE, max_km)
+        while True:
+            dlat = radius / KM_PER_DEGREE
+            cos_lat = math.cos(math.radians(lat))
+            dlon = 180.0 if cos_lat < 1e-6 else min(dlat / cos_lat, 180.0)
+            positions = self._filter_kinds(self._candidates(lat - dlat, lon - dlon, lat + dlat, lon + dlon), kinds)
+            distances = haversine_km(lat, lon, self.lat[positions], self.lon[positions])
+            inside = distances <= radius
+            # Everything closer than `radius` is among the candidates, so once n
+            # of them are inside it they are the true n nearest.
+            if inside.sum() >= n or radius >= max_km:
+                positions, distances = positions[inside], distances[inside]
+                if len(positions) > n:
+                    top = np.argpartition(distances, n - 1)[:n]
+                    positions, distances = positions[top], distances[top]
+                order = np.argsort(distances, kind="stable")
+                return positions[order], distances[order]
+            radius = min(radius * 2, max_km)
+
+
+def _located(kind):
+    """(id, lat, lon) rows for every place of `kind` that has coordinates."""
+    queryset = PLACE_MODELS[kind].objects.all()
+    if kind == "destination":
+        return queryset.filter(latitude__isnull=False, longitude__isnull=False).values_list(
+            "id", "latitude", "longitude"
+        )
+    return queryset.annotate(
+        lat=Coalesce("latitude", "destination__latitude"),
+        lon=Coalesce("longitude", "destination__longitude"),
+    ).filter(lat__isnull=False, lon__isnull=False).values_list("id", "lat", "lon")
+
+
+def build_index():
+    kinds, ids, lat, lon = [], [], [], []
+    for code, kind in enumerate(KINDS):
+        rows = np.array(list(_located(kind)), dtype=np.float64).reshape(-1, 3)
+        kinds.append(np.full(len(rows), code, dtype=np.int8))
+        ids.append(rows[:, 0].astype(np.int64))
+        lat.append(rows[:, 1])
+        lon.append(rows[:, 2])
+    return GridIndex(np.concatenate(kinds), np.concatenate(ids), np.concatenate(lat), np.concatenate(lon))
+
+
+_index = None
+_index_built_at = 0.0
+_index_lock = threading.Lock()
+
+
+def get_index():
+    global _index, _index_built_at
+    if _index is None or time.monotonic() - _index_built_at > GEO_INDEX_TTL:
+        with _index_lock:
+            if _index is None or time.monotonic() - _index_built_at > GEO_INDEX_TTL:
+                _index = build_index()
+                _index_built_at = time.monotonic()
+    return _index
+
+
+@receiver([post_save, post_delete], sender=Destination)
+@receiver([post_save, post_delete], sender=Hotel)
+@receiver([post_save, post_delete], sender=Activity)
+def invalidate_index(update_fields=None, **kwargs):
+    global _index
+    # Saves that only touch other fields (room counts, slots) keep the index.
+    if update_fields and not COORDINATE_FIELDS.intersection(update_fields):
+        return
+    _index = None
+
+
+def kind_codes(kinds):
+    if not kinds:
+        return None
+    unknown = set(kinds) - set(KINDS)
+    if unknown:
+        raise ValueError(f"Unknown place kind(s): {', '.join(sorted(unknown))}. Expected {', '.join(KINDS)}.")
+    return [KINDS.index(kind) for kind in kinds]
+
+
+def describe(index, positions, distances=None):
+    """Result rows for index positions, with names loaded from the database."""
+    names = {}
+    for code, kind in enumerate(KINDS):
+        ids = index.ids[positions][index.kinds[positions] == code].tolist()
+        if ids:
+            names[kind] = dict(PLACE_MODELS[kind].objects.filter(pk__in=ids).values_list("id", "name"))
+    places = []
+    for i, position in enumerate(positions.tolist()):
+        kind, place_id = KINDS[index.kinds[position]], int(index.ids[position])
+        if place_id not in names.get(kind, {}):
+            continue  # deleted by another process since the index was built
+        place = {
+            "kind": kind,
+            "id": place_id,
+            "name": names[kind][place_id],
+            "latitude": float(index.lat[position]),
+            "longitude": float(index.lon[position]),
+        }
+        if distances is not None:
+            place["distance_km"] = round(float(distances[i]), 3)
+        places.append(place)
+    return places
+
+
+def nearby(lat, lon, radius_km=MAX_RADIUS_KM, limit=20, kinds=None):
+    """The `limit` places closest to (lat, lon) within radius_km, nearest first."""
+    check_point(lat, lon)
+    if not 0 < radius_km <= MAX_RADIUS_KM:
+        raise ValueError(f"radius_km must be within (0, {MAX_RADIUS_KM}].")
+    index = get_index()
+    positions, distances = index.nearest(lat, lon, max(1, min(limit, MAX_RESULTS)), radius_km, kind_codes(kinds))
+    return describe(index, positions, distances)
+
+
+def in_bbox(min_lat, min_lon, max_lat, max_lon, limit=20, kinds=None):
+    """(count, places): every place inside the box is counted, at most `limit` are returned."""
+    check_point(min_lat, min_lon)
+    check_point(max_lat, max_lon)
+    if min_lat > max_lat or min_lon > max_lon:
+        raise ValueError("bbox must be min_lat,min_lon,max_lat,max_lon.")
+    index = get_index()
+    positions = index.within_bbox(min_lat, min_lon, max_lat, max_lon, kind_codes(kinds))
+    return len(positions), describe(index, positions[:max(1, min(limit, MAX_RESULTS))])
@@ -0,0 +1,54 @@
+"""
+Password hashers whose cost is read from settings.PASSWORD_HASHING, so the
+hashing algorithm and work factor can be tuned per deployment.
+
+The preferred algorithm is the first entry of settings.PASSWORD_HASHERS.
+When a user logs in with a hash made by another algorithm or with different
+cost parameters, Django's check_password() re-hashes it with the current
+policy (must_update() compares the stored parameters with the ones below).
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher, PBKDF2PasswordHasher, ScryptPasswordHasher,
+)
+
+
+def hashing_policy(name, default):
+    value = getattr(settings, "PASSWORD_HASHING", {}).get(name)
+    return default if value is None else int(value)
+
+
+class PolicyPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return hashing_policy("PBKDF2_ITERATIONS", PBKDF2PasswordHasher.iterations)
+
+
+class PolicyScryptPasswordHasher(ScryptPasswordHasher):
+    @property
+    def work_factor(self):
+        return hashing_policy("SCRYPT_WORK_FACTOR", ScryptPasswordHasher.work_factor)
+
+    @property
+    def block_size(self):
+        return hashing_policy("SCRYPT_BLOCK_SIZE", ScryptPasswordHasher.block_size)
+
+    @property
+    def maxmem(self):
+        # scrypt needs about 128 * n * r bytes; leave headroom for larger work factors.
+        return max(ScryptPasswordHasher.maxmem, 256 * self.work_factor * self.block_size)
+
+
+class PolicyArgon2PasswordHasher(Argon2PasswordHasher):
+    """Requires the optional argon2-cffi package."""
+    @property
+    def time_cost(self):
+        return hashing_policy("ARGON2_TIME_COST", Argon2PasswordHasher.time_cost)
+
+    @property
+    def memory_cost(self):
+        return hashing_policy("ARGON2_MEMORY_COST", Argon2PasswordHasher.memory_cost)
+
+    @property
+    def parallelism(self):
+        return hashing_policy("ARGON2_PARALLELISM", Argon2PasswordHasher.parallelism)
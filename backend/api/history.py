@@ -0,0 +1,198 @@
+"""
+Retention and archival for per-user history (chat messages and bookings).
+
+Rows older than the retention window are moved out of the hot tables into
+gzip-compressed JSONL files, one per kind, user and month, indexed by
+HistoryArchive. Reads go through `merged_history`, which returns hot rows
+and archived rows as one list, so the API does not change when rows are
+archived. Archiving appends a new gzip member to an existing month file,
+so it can be re-run at any time; a run interrupted between writing the
+file and deleting the rows only produces duplicates, which the read path
+drops by id.
+"""
+import datetime
+import gzip
+import json
+import logging
+import os
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Booking, ChatMessage, HistoryArchive
+
+logger = logging.getLogger(__name__)
+
+HISTORY_ARCHIVE_ROOT = getattr(settings, "HISTORY_ARCHIVE_ROOT", os.path.join(settings.BASE_DIR, "archive"))
+CHAT_HISTORY_RETENTION_DAYS = getattr(settings, "CHAT_HISTORY_RETENTION_DAYS", 90)
+BOOKING_HISTORY_RETENTION_DAYS = getattr(settings, "BOOKING_HISTORY_RETENTION_DAYS", 365)
+
+
+def chat_row(message):
+    return {
+        "id": message.id,
+        "message": message.message,
+        "response": message.response,
+        "created_at": message.created_at,
+    }
+
+
+def booking_row(booking):
+    # Archived bookings keep the ids of what was booked; the nested
+    # hotel/flight/activity details are only served for hot rows.
+    return {
+        "id": booking.id,
+        "booking_type": booking.booking_type,
+        "hotel": booking.hotel_id,
+        "flight": booking.flight_id,
+        "activity": booking.activity_id,
+        "start_date": booking.start_date,
+        "end_date": booking.end_date,
+        "total_price": booking.total_price,
+        "status": booking.status,
+        "created_at": booking.created_at,
+    }
+
+
+class ArchiveKind:
+    def __init__(self, model, cutoff_field, retention_days, to_row):
+        self.model = model
+        self.cutoff_field = cutoff_field
+        self.retention_days = retention_days
+        self.to_row = to_row
+
+
+# Chat turns age out by when they were sent; bookings only once the trip has ended.
+ARCHIVE_KINDS = {
+    "chat": ArchiveKind(ChatMessage, "created_at", CHAT_HISTORY_RETENTION_DAYS, chat_row),
+    "booking": ArchiveKind(Booking, "end_date", BOOKING_HISTORY_RETENTION_DAYS, booking_row),
+}
+
+
+def archive_cutoff(kind, now=None):
+    now = now or timezone.now()
+    cutoff = now - datetime.timedelta(days=ARCHIVE_KINDS[kind].retention_days)
+    return cutoff.date() if ARCHIVE_KINDS[kind].cutoff_field == "end_date" else cutoff
+
+
+def month_of(value):
+    return datetime.date(value.year, value.month, 1)
+
+
+def archive_path(kind, user_id, month):
+    return os.path.join(kind, str(user_id), f"{month:%Y-%m}.jsonl.gz")
+
+
+def write_archive(relative_path, rows):
+    """Append rows to a gzip JSONL file as a new gzip member and fsync it."""
+    path = os.path.join(HISTORY_ARCHIVE_ROOT, relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    payload = "".join(json.dumps(row, cls=DjangoJSONEncoder) + "\n" for row in rows).encode("utf-8")
+    with open(path, "ab") as f:
+        f.write(gzip.compress(payload))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def read_archive(relative_path):
+    path = os.path.join(HISTORY_ARCHIVE_ROOT, relative_path)
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        logger.error("History archive %s is indexed but missing.", path)
+        return []
+
+
+def archive_kind(kind, before=None, batch_size=1000, dry_run=False):
+    """
+    Move rows of `kind` whose cutoff field is older than `before` (default:
+    the retention window) to the archive, `batch_size` rows at a time.
+    Returns the number of rows archived (or that would be, with dry_run).
+    """
+    spec = ARCHIVE_KINDS[kind]
+    before = before or archive_cutoff(kind)
+    queryset = spec.model.objects.filter(**{f"{spec.cutoff_field}__lt": before})
+    if dry_run:
+        return queryset.count()
+
+    archived = 0
+    while True:
+        batch = list(queryset.order_by("pk")[:batch_size])
+        if not batch:
+            return archived
+
+        groups = defaultdict(list)
+        for obj in batch:
+            groups[(obj.user_id, month_of(obj.created_at))].append(obj)
+
+        for (user_id, month), objs in groups.items():
+            relative_path = archive_path(kind, user_id, month)
+            objs.sort(key=lambda obj: (obj.created_at, obj.pk))
+            write_archive(relative_path, [spec.to_row(obj) for obj in objs])
+            with transaction.atomic():
+                entry, created = HistoryArchive.objects.get_or_create(
+                    kind=kind, user_id=user_id, month=month,
+                    defaults={"path": relative_path, "row_count": len(objs)},
+                )
+                if not created:
+                    HistoryArchive.objects.filter(pk=entry.pk).update(row_count=F("row_count") + len(objs))
+                spec.model.objects.filter(pk__in=[obj.pk for obj in objs]).delete()
+            archived += len(objs)
+
+
+def archived_history(kind, user_id, since=None, until=None):
+    """Archived rows for one user, optionally bounded by created_at (datetimes)."""
+    entries = HistoryArchive.objects.filter(kind=kind, user_id=user_id)
+    if since:
+        entries = entries.filter(month__gte=month_of(since))
+    if until:
+        entries = entries.filter(month__lte=month_of(until))
+
+    rows = []
+    for entry in entries.order_by("month"):
+        for row in read_archive(entry.path):
+            created_at = parse_datetime(row["created_at"])
+            if (since and created_at < since) or (until and created_at > until):
+                continue
+            row["archived"] = True
+            rows.append(row)
+    return rows
+
+
+def merged_history(kind, user_id, hot_rows, since=None, until=None):
+    """
+    Merge serialized hot rows with archived rows, newest first. Hot rows win
+    when an id appears in both (an interrupted archive run).
+    """
+    hot_ids = {row["id"] for row in hot_rows}
+    rows = list(hot_rows) + [
+        row for row in archived_history(kind, user_id, since, until) if row["id"] not in hot_ids
+    ]
+    rows.sort(key=lambda row: (parse_datetime(str(row["created_at"])), row["id"]), reverse=True)
+    return rows
+
+
+def history_bounds(params):
+    """Parse ?since=&until= (ISO dates or datetimes) into aware datetimes; until is inclusive."""
+    bounds = []
+    for name in ("since", "until"):
+        value = params.get(name)
+        if not value:
+            bounds.append(None)
+            continue
+        parsed = parse_datetime(value)
+        if parsed is None:
+            date = parse_date(value)
+            if date is None:
+                raise ValueError(f"Invalid {name} date: {value}")
+            parsed = datetime.datetime.combine(date, datetime.time.max if name == "until" else datetime.time.min)
+        if settings.USE_TZ and timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        bounds.append(parsed)
+    return tuple(bounds)
@@ -0,0 +1,133 @@
+"""
+Per-night hotel inventory and rates.
+
+HotelNight rows hold, per hotel and night, the rooms booked and optional
+overrides of the room count and rate; a night without a row has the
+hotel's available_rooms free at price_per_night. Rows are created the
+first time a night is booked (or given its own rate), so changing
+available_rooms or price_per_night still applies to every night without
+an override.
+
+`available_hotels` answers "which hotels have N rooms free on every night
+of [start, end)" and prices the stay in one grouped query: the stay's
+nights are joined through the (hotel, date) unique index and counted,
+instead of loading each hotel's calendar. `reserve` takes rooms with one
+conditional UPDATE, so two bookings can never both take the last room.
+See `manage.py bench_availability`.
+"""
+import datetime
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import (
+    Count, DecimalField, ExpressionWrapper, F, FilteredRelation, IntegerField, Min, Q, Sum, Value,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Hotel, HotelNight
+
+MAX_STAY_NIGHTS = 30
+INVENTORY_HORIZON_DAYS = 365
+
+PRICE = DecimalField(max_digits=12, decimal_places=2)
+
+
+def check_stay(start, end, rooms=1):
+    """Number of nights in [start, end); raises ValueError for stays we don't sell."""
+    nights = (end - start).days
+    if nights < 1:
+        raise ValueError("end_date must be after start_date.")
+    if nights > MAX_STAY_NIGHTS:
+        raise ValueError(f"Stays are limited to {MAX_STAY_NIGHTS} nights.")
+    if start < timezone.localdate():
+        raise ValueError("start_date is in the past.")
+    if end > timezone.localdate() + datetime.timedelta(days=INVENTORY_HORIZON_DAYS):
+        raise ValueError(f"Rooms can be booked up to {INVENTORY_HORIZON_DAYS} days ahead.")
+    if rooms < 1:
+        raise ValueError("rooms must be at least 1.")
+    return nights
+
+
+def stay_dates(start, end):
+    return [start + datetime.timedelta(days=offset) for offset in range((end - start).days)]
+
+
+def available_hotels(start, end, rooms=1, hotels=None):
+    """
+    Hotels (from `hotels`, default all) with at least `rooms` rooms free on
+    every night of [start, end), cheapest stay first, annotated with
+    `rooms_left` (fewest free on any night) and `total_price` (all nights,
+    per room).
+    """
+    nights = check_stay(start, end, rooms)
+    hotels = Hotel.objects.all() if hotels is None else hotels
+    capacity = Coalesce("stay__rooms", "available_rooms", output_field=IntegerField())
+    stored = Count("stay")
+    return hotels.annotate(
+        stay=FilteredRelation("nights", condition=Q(nights__date__gte=start, nights__date__lt=end)),
+    ).annotate(
+        stored_nights=stored,
+        short_nights=Count("stay", filter=Q(stay__booked__gt=capacity - rooms)),
+        stored_rooms_left=Min(capacity - F("stay__booked")),
+        total_price=ExpressionWrapper(
+            Coalesce(Sum(Coalesce("stay__price", "price_per_night"), filter=Q(stay__isnull=False)),
+                     Value(Decimal(0)), output_field=PRICE)
+            + F("price_per_night") * (nights - stored),
+            output_field=PRICE,
+        ),
+    ).filter(
+        # Nights with a row must have room; nights without one fall back to available_rooms.
+        Q(short_nights=0),
+        Q(stored_nights=nights) | Q(available_rooms__gte=rooms),
+    ).order_by("total_price", "id")
+
+
+def rooms_left(hotel, nights):
+    """Fewest rooms free on any night, for a hotel from available_hotels()."""
+    left = [hotel.stored_rooms_left] if hotel.stored_rooms_left is not None else []
+    if hotel.stored_nights < nights:
+        left.append(hotel.available_rooms)
+    return min(left)
+
+
+def reserve(hotel, start, end, rooms=1):
+    """
+    Take `rooms` rooms on every night of [start, end) and return the stay's
+    total price, or raise ValueError if any night is short. Runs in (and
+    rolls back with) the caller's transaction.
+    """
+    nights = check_stay(start, end, rooms)
+    with transaction.atomic():
+        HotelNight.objects.bulk_create(
+            [HotelNight(hotel=hotel, date=date) for date in stay_dates(start, end)], ignore_conflicts=True,
+        )
+        stay = HotelNight.objects.filter(hotel=hotel, date__gte=start, date__lt=end)
+        taken = stay.filter(
+            booked__lte=Coalesce("rooms", Value(hotel.available_rooms), output_field=IntegerField()) - rooms,
+        ).update(booked=F("booked") + rooms)
+        if taken != nights:
+            raise ValueError("Not enough rooms are free on every night of the stay.")
+        total = stay.aggregate(total=Sum(Coalesce("price", Value(hotel.price_per_night), output_field=PRICE)))
+    return total["total"] * rooms
+
+
+def release(booking):
+    """Give back the rooms held by an active hotel booking."""
+    if booking.booking_type != "hotel" or not booking.hotel_id or booking.status == "cancelled":
+        return
+    # Bookings made before per-night inventory existed may hold nothing.
+    HotelNight.objects.filter(
+        hotel_id=booking.hotel_id, date__gte=booking.start_date, date__lt=booking.end_date,
+        booked__gte=booking.rooms,
+    ).update(booked=F("booked") - booking.rooms)
+
+
+def set_nights(hotel, start, end, rooms=None, price=None):
+    """Override the room count and/or rate for the nights of [start, end)."""
+    dates = stay_dates(start, end)
+    with transaction.atomic():
+        HotelNight.objects.bulk_create([HotelNight(hotel=hotel, date=date) for date in dates], ignore_conflicts=True)
+        changes = {name: value for name, value in (("rooms", rooms), ("price", price)) if value is not None}
+        if changes:
+            HotelNight.objects.filter(hotel=hotel, date__in=dates).update(**changes)
@@ -0,0 +1,353 @@
+"""
+Structured trip plans.
+
+A plan is a plain dict (JSON-serializable, stored on Trip/TripDay) rather
+than one formatted string:
+
+    {
+      "destination": "Goa", "days": 5, "budget": 20000.0,
+      "transportation": "train", "hotel_preference": "budget",
+      "food_preference": "south indian", "activities": ["beaches"],
+      "weather": "...", "attractions": [{"name": ..., "lat": ..., "lon": ...}, ...],
+      "hotels": [...], "restaurants": [...],
+      "costs": {"transportation": 4000.0, "accommodation": 6000.0, "food": 2000.0,
+                "activities": 2000.0, "total": 14000.0},
+      "itinerary": [
+        {"day": 1, "slots": [
+          {"time": "morning", "kind": "attraction", "name": "Fort Aguada", "lat": 15.49, "lon": 73.77},
+          {"time": "morning", "kind": "attraction", "name": "Sinquerim Beach", "lat": 15.50, "lon": 73.76},
+          {"time": "afternoon", "kind": "restaurant", "name": "Goa Food Plaza", "activities": ["beaches"]},
+          {"time": "evening", "kind": "hotel", "name": "Goa Central Hotel"}]},
+        ...
+      ]
+    }
+
+Attractions with coordinates are grouped by day and ordered to minimise
+travel (api/routing.py); without coordinates there is nothing to optimise
+and each day gets one attraction in ranking order.
+
+`render_plan` turns a plan back into the text the chatbot replies with, so
+text is derived from stored data instead of being the only copy of it.
+"""
+from django.conf import settings
+from django.db import transaction
+
+from . import budget_optimizer, routing
+from .models import Trip, TripDay
+
+# Most attractions scheduled on one day when coordinates are known.
+ITINERARY_STOPS_PER_DAY = getattr(settings, "ITINERARY_STOPS_PER_DAY", 3)
+
+# Longest trip a plan is generated for (API input and batches alike).
+MAX_TRIP_DAYS = 60
+
+# Budgets must fit Trip.budget (12 digits, 2 of them decimals).
+MAX_BUDGET = 10 ** 10
+
+TRIP_FIELDS = (
+    "destination", "days", "budget", "transportation", "hotel_preference", "food_preference",
+    "activities", "weather", "attractions", "hotels", "restaurants", "costs",
+)
+
+COST_SHARES = ("transportation", "accommodation", "food", "activities")
+
+
+def cost_breakdown(budget, transportation, hotel_preference, days=None, activities=(), catalog=None):
+    """
+    Split a budget into estimated costs per category. Given a catalog of
+    bookable options (api/budget_optimizer.py), accommodation, activities
+    and flights are instead priced from the best selection that fits the
+    budget, which is recorded under "selection".
+    """
+    costs = {
+        "transportation": (0.2 if transportation.lower() != "any" else 0.15) * budget,
+        "accommodation": (0.5 if hotel_preference.lower() in ["luxury", "boutique"] else 0.3) * budget,
+        "food": 0.1 * budget,
+        "activities": 0.1 * budget,
+    }
+    if catalog:
+        # Food, and transport other than a catalogue flight, keep their estimates.
+        reserved = costs["food"] + (0 if catalog.flights else costs["transportation"])
+        selection = budget_optimizer.optimize(catalog, budget, days, activities=activities,
+                                              hotel_preference=hotel_preference, reserved=reserved)
+        if selection["feasible"]:
+            if selection["flight"]:
+                costs["transportation"] = selection["costs"]["flight"]
+            if selection["hotel"]:
+                costs["accommodation"] = selection["costs"]["hotel"]
+            if len(catalog.activity_ids):
+                costs["activities"] = selection["costs"]["activities"]
+            costs["selection"] = {
+                "flight": selection["flight"] and selection["flight"]["flight_number"],
+                "hotel": selection["hotel"] and selection["hotel"]["name"],
+                "nights": selection["nights"],
+                "activities": [activity["name"] for activity in selection["activities"]],
+            }
+    costs["total"] = sum(costs[name] for name in COST_SHARES)
+    return costs
+
+
+def as_place(attraction):
+    """Normalize an attraction (a name, or a dict with optional lat/lon) to a place dict."""
+    if isinstance(attraction, dict):
+        place = {"name": attraction.get("name")}
+        try:
+            place["lat"], place["lon"] = float(attraction["lat"]), float(attraction["lon"])
+        except (KeyError, TypeError, ValueError):
+            pass
+        return place
+    return {"name": str(attraction)}
+
+
+def schedule_stops(attractions, days, per_day=ITINERARY_STOPS_PER_DAY):
+    """
+    Choose each day's attractions, in visiting order. Returns `days` lists of
+    place dicts. Located attractions are taken in ranking order up to
+    `days * per_day`, clustered by day and routed; unlocated ones fill any
+    remaining capacity, and days left empty (fewer attractions than days)
+    reuse attractions round-robin.
+    """
+    places = [as_place(attraction) for attraction in attractions]
+    located = [place for place in places if "lat" in place][:days * per_day]
+    if not located:
+        return [[places[(number - 1) % len(places)]] if places else [] for number in range(1, days + 1)]
+
+    routes = routing.plan_days([place["lat"] for place in located], [place["lon"] for place in located], days)
+    stops = [[located[index] for index in day_route] for day_route in routes]
+    spare = [place for place in places if "lat" not in place]
+    for day_stops in stops:
+        while spare and len(day_stops) < per_day:
+            day_stops.append(spare.pop(0))
+    for number, day_stops in enumerate(stops):
+        if not day_stops:
+            day_stops.append(places[number % len(places)])
+    return stops
+
+
+def plan_day(number, destination, stops, activities, food_preference, hotel_preference):
+    """One day of the itinerary: morning attractions, afternoon lunch and activities, evening hotel."""
+    if stops:
+        morning = [{"time": "morning", "kind": "attraction", **stop} for stop in stops]
+    else:
+        morning = [{"time": "morning", "kind": "attraction", "name": f"Explore landmarks in {destination or 'your destination'}"}]
+    lunch = f"{destination or 'Local'} Food Plaza" if food_preference else "a local restaurant"
+    hotel = f"{destination or 'Local'} Central Hotel" if hotel_preference else "your chosen hotel"
+    return {
+        "day": number,
+        "slots": morning + [
+            {"time": "afternoon", "kind": "restaurant", "name": lunch, "activities": list(activities)},
+            {"time": "evening", "kind": "hotel", "name": hotel},
+        ],
+    }
+
+
+def day_stops(day, attractions):
+    """The attractions scheduled on an existing day (the placeholder for an empty day is not one)."""
+    names = {attraction["name"] for attraction in attractions}
+    return [{k: v for k, v in slot.items() if k not in ("time", "kind")}
+            for slot in day["slots"] if slot["kind"] == "attraction" and slot["name"] in names]
+
+
+def build_plan(data, weather, attractions, hotels, restaurants, catalog=None):
+    """
+    Assemble a structured plan from normalized trip data and upstream
+    results; `catalog` (bookable options, if any) prices the costs.
+    """
+    plan = {
+        "destination": data["destination"],
+        "days": data["days"],
+        "budget": data["budget"],
+        "transportation": data["transportation"],
+        "hotel_preference": data["hotel_preference"],
+        "food_preference": data["food_preference"],
+        "activities": list(data["activities"]),
+        "weather": weather,
+        "attractions": [as_place(attraction) for attraction in attractions],
+        "hotels": list(hotels),
+        "restaurants": list(restaurants),
+        "costs": cost_breakdown(data["budget"], data["transportation"], data["hotel_preference"],
+                                data["days"], data["activities"], catalog),
+    }
+    plan["itinerary"] = [
+        plan_day(number, plan["destination"], stops, plan["activities"],
+                 plan["food_preference"], plan["hotel_preference"])
+        for number, stops in enumerate(schedule_stops(plan["attractions"], plan["days"]), start=1)
+    ]
+    return plan
+
+
+def render_costs(costs):
+    selection = costs.get("selection") or {}
+    transportation = f" (flight {selection['flight']})" if selection.get("flight") else ""
+    accommodation = f" ({selection['hotel']}, {selection['nights']} nights)" if selection.get("hotel") else ""
+    activities = f" ({', '.join(selection['activities'])})" if selection.get("activities") else ""
+    return (
+        f"Transportation: INR {costs['transportation']:.0f}{transportation}\n"
+        f"Accommodation: INR {costs['accommodation']:.0f}{accommodation}\n"
+        f"Food: INR {costs['food']:.0f}\n"
+        f"Activities: INR {costs['activities']:.0f}{activities}\n"
+        f"Total: INR {costs['total']:.0f}"
+    )
+
+
+def render_day(day):
+    attractions = [slot["name"] for slot in day["slots"] if slot["kind"] == "attraction"]
+    afternoon = next(slot for slot in day["slots"] if slot["kind"] == "restaurant")
+    evening = next(slot for slot in day["slots"] if slot["kind"] == "hotel")
+    if afternoon.get("activities"):
+        afternoon_text = f"Enjoy lunch at {afternoon['name']} and then experience: {', '.join(afternoon['activities'])}."
+    else:
+        afternoon_text = f"Enjoy lunch at {afternoon['name']} and visit local attractions."
+    return "\n".join([
+        f"Day {day['day']}:",
+        f"  Morning: Visit {', then '.join(attractions)}.",
+        f"  Afternoon: {afternoon_text}",
+        f"  Evening: Check in at {evening['name']}, have dinner at a nearby restaurant, and relax.",
+        "",
+    ])
+
+
+def render_itinerary(days):
+    return "\n".join(render_day(day) for day in days)
+
+
+def render_plan(plan):
+    """The chatbot's text rendering of a structured plan."""
+    return (
+        f"Trip Plan for {plan['destination']} (Duration: {plan['days']} days, Budget: INR {plan['budget']:.0f}):\n\n"
+        f"Weather Info: {plan['weather']}\n\n"
+        f"Transportation: {plan['transportation'].capitalize()}\n"
+        f"Estimated Cost Breakdown:\n{render_costs(plan['costs'])}\n\n"
+        f"Detailed Itinerary:\n{render_itinerary(plan['itinerary'])}\n\n"
+        f"Recommended Hotels: {', '.join(plan['hotels'][:3])}\n"
+        f"Recommended Restaurants: {', '.join(plan['restaurants'][:3])}\n\n"
+        "Enjoy your trip!"
+    )
+
+
+def save_trip(plan, user_id=None):
+    """Store a structured plan as a Trip with one TripDay per day."""
+    with transaction.atomic():
+        trip = Trip.objects.create(user_id=user_id, **{field: plan[field] for field in TRIP_FIELDS})
+        TripDay.objects.bulk_create([
+            TripDay(trip=trip, number=day["day"], slots=day["slots"]) for day in plan["itinerary"]
+        ])
+    return trip
+
+
+def plan_from_trip(trip):
+    """Rebuild the structured plan dict from a stored Trip."""
+    plan = {field: getattr(trip, field) for field in TRIP_FIELDS}
+    plan["budget"] = float(plan["budget"])
+    plan["itinerary"] = [{"day": day.number, "slots": day.slots} for day in trip.itinerary.all()]
+    return plan
+
+
+# -------------------------------
+# Incremental re-planning
+# -------------------------------
+# Which parts of a plan each trip detail feeds. Changing a detail recomputes
+# only these parts; a new destination invalidates everything and goes
+# through a full rebuild.
+REPLAN_DEPENDENCIES = {
+    "budget": {"costs"},
+    "transportation": {"costs"},
+    "hotel_preference": {"costs", "hotels", "itinerary"},
+    "food_preference": {"restaurants", "itinerary"},
+    "activities": {"costs", "itinerary"},
+    "days": {"costs", "days"},
+}
+TRIP_DETAILS = ("destination", "days", "budget", "transportation", "hotel_preference", "food_preference", "activities")
+
+
+def replan(plan, trip, fetch_hotels, fetch_restaurants, fetch_catalog=None):
+    """
+    Apply normalized trip details `trip` to an existing structured plan,
+    recomputing only what the changed details feed (REPLAN_DEPENDENCIES).
+    `fetch_hotels` / `fetch_restaurants` are only called when the matching
+    preference changed, and `fetch_catalog` only when costs are recomputed.
+    Returns (new plan, summary of what was recomputed); the destination
+    must be unchanged.
+    """
+    changed = [name for name in TRIP_DETAILS if trip[name] != plan[name]]
+    if "destination" in changed:
+        raise ValueError("A new destination needs a full plan, not a re-plan.")
+    stale = set().union(*(REPLAN_DEPENDENCIES[name] for name in changed))
+
+    new_plan = {**plan, **{name: trip[name] for name in changed}}
+    summary = {"changed": changed, "recomputed": sorted(stale - {"days", "itinerary"}),
+               "days_added": [], "days_removed": [], "days_updated": []}
+
+    if "costs" in stale:
+        catalog = fetch_catalog(new_plan["destination"]) if fetch_catalog else None
+        new_plan["costs"] = cost_breakdown(new_plan["budget"], new_plan["transportation"], new_plan["hotel_preference"],
+                                           new_plan["days"], new_plan["activities"], catalog)
+    if "hotels" in stale:
+        new_plan["hotels"] = list(fetch_hotels(new_plan["destination"], new_plan["hotel_preference"]))
+    if "restaurants" in stale:
+        new_plan["restaurants"] = list(fetch_restaurants(new_plan["destination"], new_plan["food_preference"]))
+
+    attractions = [as_place(attraction) for attraction in new_plan["attractions"]]
+
+    def day(number, stops):
+        return plan_day(number, new_plan["destination"], stops, new_plan["activities"],
+                        new_plan["food_preference"], new_plan["hotel_preference"])
+
+    # Existing days keep their attractions and are only rebuilt when a
+    # detail they depend on changed.
+    kept = [d for d in plan["itinerary"] if d["day"] <= new_plan["days"]]
+    if "itinerary" in stale:
+        regenerated = []
+        for old in kept:
+            new = day(old["day"], day_stops(old, attractions))
+            if new != old:
+                summary["days_updated"].append(old["day"])
+            regenerated.append(new)
+        kept = regenerated
+    summary["days_removed"] = [d["day"] for d in plan["itinerary"] if d["day"] > new_plan["days"]]
+    summary["days_added"] = list(range(len(kept) + 1, new_plan["days"] + 1))
+
+    # Added days are scheduled from the attractions no kept day visits yet.
+    if summary["days_added"]:
+        used = {stop["name"] for d in kept for stop in day_stops(d, attractions)}
+        remaining = [place for place in attractions if place["name"] not in used] or attractions
+        new_stops = schedule_stops(remaining, len(summary["days_added"]))
+        kept += [day(number, stops) for number, stops in zip(summary["days_added"], new_stops)]
+    new_plan["itinerary"] = kept
+    return new_plan, summary
+
+
+def save_replan(trip, new_plan, summary):
+    """Write only the recomputed parts of a re-plan back to the Trip and its days."""
+    fields = list(dict.fromkeys(summary["changed"] + summary["recomputed"]))
+    days = {day["day"]: day for day in new_plan["itinerary"]}
+    with transaction.atomic():
+        for field in fields:
+            setattr(trip, field, new_plan[field])
+        if fields:
+            trip.save(update_fields=fields + ["updated_at"])
+        if summary["days_removed"]:
+            trip.itinerary.filter(number__in=summary["days_removed"]).delete()
+        if summary["days_updated"]:
+            updated = list(trip.itinerary.filter(number__in=summary["days_updated"]))
+            for trip_day in updated:
+                trip_day.slots = days[trip_day.number]["slots"]
+            TripDay.objects.bulk_update(updated, ["slots"])
+        if summary["days_added"]:
+            TripDay.objects.bulk_create([
+                TripDay(trip=trip, number=number, slots=days[number]["slots"]) for number in summary["days_added"]
+            ])
+    return trip
+
+
+def replace_trip(trip, plan):
+    """Overwrite a stored Trip with a completely rebuilt plan."""
+    with transaction.atomic():
+        for field in TRIP_FIELDS:
+            setattr(trip, field, plan[field])
+        trip.save()
+        trip.itinerary.all().delete()
+        TripDay.objects.bulk_create([
+            TripDay(trip=trip, number=day["day"], slots=day["slots"]) for day in plan["itinerary"]
+        ])
+    return trip
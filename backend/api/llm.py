@@ -0,0 +1,233 @@
+"""
+Instrumented LLM calls: token, latency and cost accounting, and per-user
+token budgets.
+
+Every call made through `chat` is timed and logged, and its usage (prompt,
+completion and cached prompt tokens, or an error) is added to in-memory
+counters keyed by hour, user and model. A daemon thread adds those
+counters to LLMUsageRollup every LLM_USAGE_FLUSH_INTERVAL seconds and on
+interpreter exit, one UPDATE per key, so a call never waits on the
+database. Counters that fail to flush are kept for the next attempt;
+those of a process killed before flushing are lost.
+
+Cost is estimated from MODEL_PRICES (USD per million prompt and completion
+tokens; cached prompt tokens at CACHED_PROMPT_DISCOUNT of the prompt
+price, models not listed at 0).
+
+`check_budget` refuses a call once the user has used LLM_USER_DAILY_TOKENS
+tokens over the last 24 hours (whole hours): the flushed rows plus this
+process's unflushed counters. Other processes' unflushed usage and the
+call in flight are not counted, so a user can overshoot by a little.
+The LLMUsageRollup admin changelist reports totals per model and the
+heaviest users for the filtered period.
+"""
+import atexit
+import datetime
+import logging
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from openai import OpenAI
+
+from . import timing
+from .models import LLMUsageRollup
+
+logger = logging.getLogger(__name__)
+
+LLM_USAGE_FLUSH_INTERVAL = getattr(settings, "LLM_USAGE_FLUSH_INTERVAL", 60)
+LLM_USER_DAILY_TOKENS = getattr(settings, "LLM_USER_DAILY_TOKENS", 50000)
+MODEL_PRICES = getattr(settings, "LLM_MODEL_PRICES", {
+    "gpt-4o-2024-05-13": (5.00, 15.00),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+})
+CACHED_PROMPT_DISCOUNT = 0.5
+COUNTERS = ("calls", "errors", "cache_hits", "prompt_tokens", "completion_tokens", "cached_tokens", "latency_ms")
+TOKEN_FIELDS = ("prompt_tokens", "completion_tokens")
+
+
+class TokenBudgetExceeded(Exception):
+    """The user has used their LLM_USER_DAILY_TOKENS."""
+
+
+def cost(model, prompt_tokens, completion_tokens, cached_tokens=0):
+    """Estimated USD cost of one call."""
+    prompt_price, completion_price = MODEL_PRICES.get(model, (0, 0))
+    billed_prompt = prompt_tokens - cached_tokens + cached_tokens * CACHED_PROMPT_DISCOUNT
+    return (billed_prompt * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+class UsageRecorder(threading.Thread):
+    """Daemon thread that adds the in-memory usage counters to LLMUsageRollup."""
+    def __init__(self, interval=LLM_USAGE_FLUSH_INTERVAL):
+        super().__init__(name="llm-usage-flusher", daemon=True)
+        self.interval = interval
+        self.pending = {}  # (period_start, user_id, model) -> {counter: value, "max_latency_ms", "cost"}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def add(self, key, counts, max_latency_ms=0, usd=0.0):
+        with self._lock:
+            totals = self.pending.get(key)
+            if totals is None:
+                totals = self.pending[key] = {**dict.fromkeys(COUNTERS, 0), "max_latency_ms": 0, "cost": 0.0}
+            for name, value in counts.items():
+                totals[name] += value
+            totals["max_latency_ms"] = max(totals["max_latency_ms"], max_latency_ms)
+            totals["cost"] += usd
+
+    def tokens(self, user_id, since):
+        """Unflushed prompt + completion tokens of a user from hours starting at or after `since`."""
+        with self._lock:
+            return sum(
+                totals[name] for (period_start, key_user, _), totals in self.pending.items()
+                if key_user == user_id and period_start >= since for name in TOKEN_FIELDS
+            )
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+    def flush(self):
+        """Add every pending counter to its row. Returns the number of rows written."""
+        written = 0
+        with self._flush_lock:
+            with self._lock:
+                pending, self.pending = self.pending, {}
+            for key, totals in pending.items():
+                try:
+                    self.write(key, totals)
+                    written += 1
+                except Exception as e:
+                    logger.exception("Error writing LLM usage for %s: %s", key, e)
+                    self.add(key, {name: totals[name] for name in COUNTERS}, totals["max_latency_ms"], totals["cost"])
+            if threading.current_thread() is self:
+                close_old_connections()
+        return written
+
+    def write(self, key, totals):
+        period_start, user_id, model = key
+        usd = Decimal(f"{totals['cost']:.6f}")
+        with transaction.atomic():
+            updated = LLMUsageRollup.objects.filter(period_start=period_start, user_id=user_id, model=model).update(
+                **{name: F(name) + totals[name] for name in COUNTERS},
+                max_latency_ms=Greatest("max_latency_ms", totals["max_latency_ms"]),
+                cost=F("cost") + usd,
+            )
+            if not updated:
+                LLMUsageRollup.objects.create(
+                    period_start=period_start, user_id=user_id, model=model,
+                    **{name: totals[name] for name in COUNTERS},
+                    max_latency_ms=totals["max_latency_ms"], cost=usd,
+                )
+
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def get_recorder():
+    """Start the flush thread on first use in each process (after any fork)."""
+    global _recorder
+    if _recorder is None or not _recorder.is_alive():
+        with _recorder_lock:
+            if _recorder is None or not _recorder.is_alive():
+                _recorder = UsageRecorder()
+                _recorder.start()
+    return _recorder
+
+
+def flush():
+    """Synchronously write the pending counters, e.g. before a report in a script."""
+    return _recorder.flush() if _recorder is not None else 0
+
+
+atexit.register(flush)
+
+
+def current_hour():
+    return timezone.now().replace(minute=0, second=0, microsecond=0)
+
+
+def record(user_id, model, latency_ms, usage=None, error=False):
+    """Count one call; `usage` is the response's usage object, if any."""
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    cached_tokens = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", 0) or 0
+    logger.info("LLM call model=%s user=%s prompt_tokens=%s completion_tokens=%s cached_tokens=%s "
+                "latency_ms=%d error=%s", model, user_id, prompt_tokens, completion_tokens, cached_tokens,
+                latency_ms, error)
+    get_recorder().add(
+        (current_hour(), user_id, model),
+        {"calls": 1, "errors": int(error), "cache_hits": int(cached_tokens > 0), "prompt_tokens": prompt_tokens,
+         "completion_tokens": completion_tokens, "cached_tokens": cached_tokens, "latency_ms": round(latency_ms)},
+        round(latency_ms), cost(model, prompt_tokens, completion_tokens, cached_tokens),
+    )
+
+
+def tokens_used(user_id):
+    """Prompt + completion tokens of a user over the last 24 hours, including unflushed calls."""
+    since = current_hour() - datetime.timedelta(hours=23)
+    stored = LLMUsageRollup.objects.filter(user_id=user_id, period_start__gte=since).aggregate(
+        tokens=Sum(F("prompt_tokens") + F("completion_tokens")),
+    )["tokens"] or 0
+    return stored + (_recorder.tokens(user_id, since) if _recorder is not None else 0)
+
+
+def check_budget(user_id):
+    """Raise TokenBudgetExceeded if the user has no tokens left. Anonymous calls are not budgeted."""
+    if user_id is None or not LLM_USER_DAILY_TOKENS:
+        return
+    if tokens_used(user_id) >= LLM_USER_DAILY_TOKENS:
+        raise TokenBudgetExceeded(f"User {user_id} has used their {LLM_USER_DAILY_TOKENS} tokens for today.")
+
+
+_client = None
+
+
+def get_client():
+    """One OpenAI client per process, so calls reuse its HTTP connections."""
+    global _client
+    if _client is None:
+        api_key = getattr(settings, "OPENAI_API_KEY", None)
+        if not api_key:
+            raise Exception("OpenAI API key not configured.")
+        _client = OpenAI(api_key=api_key, base_url=getattr(settings, "OPENAI_BASE_URL", None))
+    return _client
+
+
+def chat(messages, model, user_id=None, **options):
+    """
+    chat.completions.create with budget check and usage accounting; extra
+    keyword arguments are passed through. Raises TokenBudgetExceeded before
+    calling if the user is over budget.
+    """
+    check_budget(user_id)
+    client = get_client()
+    start = time.perf_counter()
+    try:
+        with timing.span("llm"):
+            response = client.chat.completions.create(model=model, messages=messages, **options)
+    except Exception:
+        record(user_id, model, (time.perf_counter() - start) * 1000, error=True)
+        raise
+    record(user_id, model, (time.perf_counter() - start) * 1000, response.usage)
+    return response
+
+
+def usage_report(queryset, group_by):
+    """Totals of LLMUsageRollup rows grouped by a field, most expensive first."""
+    rows = list(queryset.values(group_by).annotate(
+        **{f"total_{name}": Sum(name) for name in COUNTERS}, total_cost=Sum("cost"),
+    ).order_by("-total_cost", "-total_calls"))
+    for row in rows:
+        row["average_latency_ms"] = row["total_latency_ms"] / row["total_calls"] if row["total_calls"] else 0
+        row["tokens"] = row["total_prompt_tokens"] + row["total_completion_tokens"]
+    return rows
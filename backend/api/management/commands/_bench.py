@@ -0,0 +1,34 @@
+"""
+Shared helpers for the bench_* management commands.
+"""
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+@contextmanager
+def benchmark_database(verbosity=0):
+    """
+    Run a benchmark against a throwaway test database so fixtures created by
+    the benchmark never touch real data.
+    """
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity)
+
+
+def measure(fn, iterations):
+    """Call fn() `iterations` times and return (total_seconds, ops_per_second)."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    elapsed = time.perf_counter() - start
+    return elapsed, (iterations / elapsed if elapsed else float("inf"))
+
+
+def format_row(name, *columns, width=28):
+    return f"{name:<{width}}" + "".join(f"{column:>16}" for column in columns)
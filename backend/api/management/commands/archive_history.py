@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from api.history import ARCHIVE_KINDS, HISTORY_ARCHIVE_ROOT, archive_cutoff, archive_kind
+
+
+class Command(BaseCommand):
+    help = ("Move chat messages and bookings older than their retention window to "
+            "compressed monthly archives, keeping the hot tables small.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--kind", choices=sorted(ARCHIVE_KINDS), action="append",
+                            help="Only archive this kind (can be repeated). Default: all.")
+        parser.add_argument("--older-than-days", type=int,
+                            help="Override the configured retention window.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Only report how many rows would be archived.")
+
+    def handle(self, *args, **options):
+        for kind in options["kind"] or sorted(ARCHIVE_KINDS):
+            if options["older_than_days"] is not None:
+                ARCHIVE_KINDS[kind].retention_days = options["older_than_days"]
+            cutoff = archive_cutoff(kind)
+            count = archive_kind(kind, cutoff, batch_size=options["batch_size"], dry_run=options["dry_run"])
+            verb = "Would archive" if options["dry_run"] else "Archived"
+            self.stdout.write(f"{verb} {count} {kind} rows older than {cutoff:%Y-%m-%d} to {HISTORY_ARCHIVE_ROOT}")
@@ -0,0 +1,54 @@
+import itertools
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.batch import TRIP_BATCH_MAX_WORKERS, BatchLookups, generate_plans, read_jsonl
+
+
+class Command(BaseCommand):
+    help = ("Generate trip plans for a JSONL file (or a JSON list) of trip specs and "
+            "write one JSON result per line as plans complete.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("input", nargs="?", default="-",
+                            help="Path to a .jsonl/.json file of trip specs, or '-' for stdin.")
+        parser.add_argument("--output", "-o", default="-",
+                            help="File to write JSONL results to, or '-' for stdout.")
+        parser.add_argument("--workers", type=int, default=TRIP_BATCH_MAX_WORKERS,
+                            help="Plans generated concurrently.")
+
+    def handle(self, *args, **options):
+        source = sys.stdin if options["input"] == "-" else open(options["input"], encoding="utf-8")
+        target = self.stdout if options["output"] == "-" else open(options["output"], "w", encoding="utf-8")
+        try:
+            first = source.readline()
+            if first.lstrip().startswith("["):
+                # A whole JSON list rather than one spec per line.
+                try:
+                    specs = json.loads(first + source.read())
+                except ValueError as e:
+                    raise CommandError(f"Invalid JSON input: {e}")
+            else:
+                specs = read_jsonl(itertools.chain([first], source))
+
+            lookups = BatchLookups()
+            count = errors = 0
+            start = time.perf_counter()
+            for result in generate_plans(specs, max_workers=options["workers"], lookups=lookups):
+                target.write(json.dumps(result) + "\n")
+                count += 1
+                errors += "error" in result
+            elapsed = time.perf_counter() - start
+        finally:
+            if source is not sys.stdin:
+                source.close()
+            if target is not self.stdout:
+                target.close()
+
+        self.stderr.write(
+            f"{count} trips ({errors} failed) in {elapsed:.1f}s; "
+            f"{lookups.upstream_calls} upstream attraction/weather lookups."
+        )
@@ -0,0 +1,103 @@
+import datetime
+import random
+import time
+from decimal import Decimal
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api import inventory
+from api.models import Destination, Hotel, HotelNight
+
+from ._bench import benchmark_database, format_row
+
+
+def brute_force(hotel, nights_by_date, start, end, rooms):
+    """Total price of the stay if every night has `rooms` free, else None."""
+    total = Decimal(0)
+    for date in inventory.stay_dates(start, end):
+        night = nights_by_date.get(date)
+        capacity = night.rooms if night and night.rooms is not None else hotel.available_rooms
+        if capacity - (night.booked if night else 0) < rooms:
+            return None
+        total += night.price if night and night.price is not None else hotel.price_per_night
+    return total
+
+
+class Command(BaseCommand):
+    help = ("Benchmark the hotel range-availability query (api/inventory.py) over a per-night "
+            "inventory covering the full booking horizon.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hotels", type=int, default=2000)
+        parser.add_argument("--destinations", type=int, default=20)
+        parser.add_argument("--queries", type=int, default=100)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            self.run(options)
+
+    def run(self, options):
+        rng = random.Random(0)
+        today = timezone.localdate()
+        horizon = inventory.INVENTORY_HORIZON_DAYS
+        destinations = Destination.objects.bulk_create([
+            Destination(name=f"City {i}", description="", location="", image="d.jpg")
+            for i in range(options["destinations"])
+        ])
+        hotels = Hotel.objects.bulk_create([
+            Hotel(name=f"Hotel {i}", destination=rng.choice(destinations), description="", image="h.jpg",
+                  price_per_night=rng.randint(1500, 20000), rating=Decimal(rng.randint(20, 50)) / 10,
+                  available_rooms=rng.randint(5, 60))
+            for i in range(options["hotels"])
+        ])
+        start = time.perf_counter()
+        for hotel in hotels:
+            HotelNight.objects.bulk_create([
+                HotelNight(
+                    hotel=hotel, date=today + datetime.timedelta(days=offset),
+                    booked=rng.randint(0, hotel.available_rooms),
+                    price=hotel.price_per_night * Decimal("1.5") if offset % 7 in (5, 6) else None,
+                )
+                for offset in range(horizon) if rng.random() < 0.9  # some nights have never been booked
+            ], batch_size=2000)
+        self.stdout.write(f"{len(hotels):,} hotels, {HotelNight.objects.count():,} hotel-nights over "
+                          f"{horizon} days, loaded in {time.perf_counter() - start:.1f} s\n")
+        self.check_correctness(rng, destinations, today, horizon)
+
+        self.stdout.write(format_row("query", "mean ms", "p95 ms", "hotels found"))
+        for label, scope in (("one destination", "destination"), ("all hotels", None)):
+            for nights in (1, 7, 30):
+                times, found = [], 0
+                for _ in range(options["queries"]):
+                    check_in = today + datetime.timedelta(days=rng.randrange(1, horizon - nights))
+                    queryset = Hotel.objects.filter(destination=rng.choice(destinations)) if scope else None
+                    begin = time.perf_counter()
+                    found += len(inventory.available_hotels(
+                        check_in, check_in + datetime.timedelta(days=nights), rng.randint(1, 3), queryset))
+                    times.append(time.perf_counter() - begin)
+                self.stdout.write(format_row(
+                    f"{label}, {nights} nights", f"{np.mean(times) * 1000:.2f}",
+                    f"{np.percentile(times, 95) * 1000:.2f}", f"{found / options['queries']:,.0f}",
+                ))
+
+    def check_correctness(self, rng, destinations, today, horizon, trials=20):
+        for _ in range(trials):
+            destination = rng.choice(destinations)
+            nights, rooms = rng.randint(1, 10), rng.randint(1, 5)
+            check_in = today + datetime.timedelta(days=rng.randrange(1, horizon - nights))
+            check_out = check_in + datetime.timedelta(days=nights)
+            found = {
+                hotel.id: hotel.total_price for hotel in inventory.available_hotels(
+                    check_in, check_out, rooms, Hotel.objects.filter(destination=destination))
+            }
+            expected = {}
+            for hotel in Hotel.objects.filter(destination=destination):
+                nights_by_date = {night.date: night for night in hotel.nights.filter(
+                    date__gte=check_in, date__lt=check_out)}
+                total = brute_force(hotel, nights_by_date, check_in, check_out, rooms)
+                if total is not None:
+                    expected[hotel.id] = total
+            assert found == expected, (destination.name, check_in, nights, rooms)
+        self.stdout.write(f"availability and stay prices match a per-night scan on {trials} random queries\n")
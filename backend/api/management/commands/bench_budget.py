@@ -0,0 +1,116 @@
+import itertools
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api import budget_optimizer
+from api.models import Activity, Destination, Flight, Hotel
+
+from ._bench import benchmark_database, format_row
+
+KEYWORDS = ["beach", "trek", "museum", "temple", "market", "cruise", "spa", "safari"]
+
+
+def seed_catalog(name, hotels, activities, flights, rng):
+    destination = Destination.objects.create(name=name, description="", image="bench.jpg", location=name)
+    Hotel.objects.bulk_create([
+        Hotel(name=f"{name} hotel {i}", destination=destination, description="", image="bench.jpg",
+              price_per_night=rng.randint(800, 20000), rating=round(rng.uniform(2.5, 5.0), 1))
+        for i in range(hotels)
+    ], batch_size=1000)
+    Activity.objects.bulk_create([
+        Activity(name=f"{rng.choice(KEYWORDS)} {i}", destination=destination, description="",
+                 duration=timedelta(hours=2), price=rng.randint(0, 6000), image="bench.jpg",
+                 max_participants=20, available_slots=rng.randint(0, 20))
+        for i in range(activities)
+    ], batch_size=1000)
+    departure = timezone.now() + timedelta(days=7)
+    Flight.objects.bulk_create([
+        Flight(flight_number=f"BX{i}", airline="Bench Air", source="Delhi", destination=name,
+               departure_time=departure, arrival_time=departure + timedelta(hours=2),
+               price=rng.randint(2500, 15000), available_seats=rng.randint(0, 50))
+        for i in range(flights)
+    ], batch_size=1000)
+
+
+def brute_force(catalog, budget, days, activities, hotel_preference):
+    """Best score by enumerating every hotel and activity subset (small catalogs only)."""
+    nights = max(days - 1, 1)
+    values = budget_optimizer.activity_values(catalog, activities)
+    weight = budget_optimizer.HOTEL_RATING_WEIGHTS.get(hotel_preference, 1.0)
+    limit = budget_optimizer.ACTIVITIES_PER_DAY * days
+    best = None
+    for hotel in range(len(catalog.hotel_ids)):
+        left = budget - catalog.hotel_prices[hotel] * nights
+        if left < 0:
+            continue
+        for size in range(min(limit, len(values)) + 1):
+            for subset in itertools.combinations(range(len(values)), size):
+                if sum(catalog.activity_prices[i] for i in subset) <= left:
+                    score = catalog.hotel_ratings[hotel] * weight + sum(values[i] for i in subset)
+                    best = score if best is None else max(best, score)
+    return best
+
+
+class Command(BaseCommand):
+    help = ("Benchmark the budget optimizer (api/budget_optimizer.py): uncached catalogue load, optimization "
+            "and cached per-request time for growing catalogues, and optimality against brute force.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="100,1000,5000", help="Hotels/activities per destination.")
+        parser.add_argument("--requests", type=int, default=50)
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        with benchmark_database():
+            self.check_optimality(rng)
+            self.stdout.write(format_row("options per kind", "cold load ms", "optimize ms", "p95 cached ms", width=20))
+            for size in (int(value) for value in options["sizes"].split(",")):
+                name = f"Bench{size}"
+                seed_catalog(name, size, size, size // 10, rng)
+                loads, optimizes, totals = [], [], []
+                for _ in range(options["requests"]):
+                    budget_optimizer.invalidate_catalogs()
+                    start = time.perf_counter()
+                    budget_optimizer.load_catalog(name, origin="Delhi")
+                    loads.append(time.perf_counter() - start)
+
+                    start = time.perf_counter()
+                    catalog = budget_optimizer.load_catalog(name, origin="Delhi")
+                    loaded = time.perf_counter()
+                    budget_optimizer.optimize(
+                        catalog, rng.choice([15000, 40000, 100000, 300000]), rng.randint(2, 10),
+                        travellers=rng.randint(1, 4), activities=rng.sample(KEYWORDS, 2),
+                        hotel_preference=rng.choice(["any", "luxury", "budget"]),
+                    )
+                    done = time.perf_counter()
+                    optimizes.append(done - loaded)
+                    totals.append(done - start)
+                p95 = statistics.quantiles(totals, n=20)[-1]
+                self.stdout.write(format_row(
+                    f"{size:,}", f"{statistics.mean(loads) * 1000:.1f}",
+                    f"{statistics.mean(optimizes) * 1000:.1f}", f"{p95 * 1000:.1f}", width=20,
+                ))
+
+    def check_optimality(self, rng, trials=200):
+        matches = 0
+        for trial in range(trials):
+            catalog = budget_optimizer.Catalog(
+                "check",
+                [(i, f"h{i}", rng.randint(500, 5000), round(rng.uniform(2, 5), 1)) for i in range(6)],
+                [(i, f"{rng.choice(KEYWORDS)} {i}", "", rng.randint(0, 3000), 5) for i in range(9)],
+            )
+            budget, days = rng.randint(3000, 30000), rng.randint(1, 3)
+            activities, preference = rng.sample(KEYWORDS, 2), rng.choice(["any", "luxury", "budget"])
+            result = budget_optimizer.optimize(catalog, budget, days, activities=activities, hotel_preference=preference)
+            expected = brute_force(catalog, budget, days, activities, preference)
+            assert result["costs"]["total"] <= budget
+            if expected is None:
+                matches += not result["feasible"]
+            else:
+                matches += abs(result["score"] - expected) < 1e-9
+        self.stdout.write(f"optimal on {matches}/{trials} random small catalogues (brute force)\n")
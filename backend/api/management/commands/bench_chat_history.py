@@ -0,0 +1,56 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from api.chat_log import ChatLogWriter
+from api.models import ChatMessage
+
+from ._bench import benchmark_database, format_row
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ("Benchmark chat history inserts: one INSERT per turn (the old inline save) "
+            "against the write-behind writer at several batch sizes.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--turns", type=int, default=5000)
+        parser.add_argument("--batch-sizes", default="1,10,100,500",
+                            help="Comma-separated writer batch sizes to compare.")
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            self.run(options)
+
+    def run(self, options):
+        turns = options["turns"]
+        user = User.objects.create(username="bench")
+
+        def turn(i):
+            return ChatMessage(user=user, message=f"message {i}", response="Trip Plan for Goa ...\n" * 20)
+
+        self.stdout.write(f"{turns} chat turns per path\n")
+        self.stdout.write(format_row("path", "rows/s", "enqueue ms/turn", width=24))
+
+        start = time.perf_counter()
+        for i in range(turns):
+            turn(i).save()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(format_row("inline save()", f"{turns / elapsed:,.0f}", f"{elapsed * 1000 / turns:.3f}", width=24))
+
+        for batch_size in (int(size) for size in options["batch_sizes"].split(",")):
+            ChatMessage.objects.all().delete()
+            writer = ChatLogWriter(batch_size=batch_size, maxsize=turns)
+            start = time.perf_counter()
+            for i in range(turns):
+                writer.put(turn(i))
+            enqueued = time.perf_counter() - start
+            writer.flush()
+            elapsed = time.perf_counter() - start
+            assert ChatMessage.objects.count() == turns
+            self.stdout.write(format_row(
+                f"write-behind batch={batch_size}", f"{turns / elapsed:,.0f}",
+                f"{enqueued * 1000 / turns:.4f}", width=24,
+            ))
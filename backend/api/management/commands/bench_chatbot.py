@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.chatbot import Chatbot
+
+# One full conversation, from greeting to plan request.
+CONVERSATION = ["hi", "yes", "15000", "Goa", "4", "train", "budget", "south indian", "beaches, culture"]
+
+
+class OfflineChatbot(Chatbot):
+    """Skips plan generation so the benchmark measures dialog handling only."""
+    def generate_trip_plan(self, data):
+        return "plan"
+
+
+class Command(BaseCommand):
+    help = "Benchmark chatbot dialog turns per second on one core (plan generation excluded)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--conversations", type=int, default=20000)
+        parser.add_argument("--session-roundtrip", action="store_true",
+                            help="Rebuild the bot from to_dict() on every turn, as the HTTP endpoint does.")
+
+    def handle(self, *args, **options):
+        import logging
+        logging.getLogger("api.chatbot").setLevel(logging.WARNING)
+
+        conversations = options["conversations"]
+        roundtrip = options["session_roundtrip"]
+        start = time.perf_counter()
+        for _ in range(conversations):
+            bot = OfflineChatbot()
+            for message in CONVERSATION:
+                if roundtrip:
+                    bot = OfflineChatbot.from_dict(bot.to_dict())
+                bot.handle_input(message)
+        elapsed = time.perf_counter() - start
+        turns = conversations * len(CONVERSATION)
+        self.stdout.write(
+            f"{turns:,} turns in {elapsed:.2f}s: {turns / elapsed:,.0f} turns/s/core "
+            f"({elapsed * 1e6 / turns:.1f} us/turn)"
+        )
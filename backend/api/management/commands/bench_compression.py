@@ -0,0 +1,111 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+from django.core import signing
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from api import fields
+from api.chatbot import Chatbot
+from api.models import ChatMessage
+
+from ._bench import benchmark_database, format_row
+
+User = get_user_model()
+
+DESTINATIONS = ["Goa", "Jaipur", "Delhi", "Manali", "Kerala", "Agra", "Udaipur", "Rishikesh", "Varanasi", "Mumbai"]
+
+
+class OfflineChatbot(Chatbot):
+    """Generates real plan text from canned upstream data, without network calls or catalogue lookups."""
+    def fetch_attractions(self, destination):
+        return [f"{destination} Fort", f"{destination} Museum", f"{destination} Market", f"{destination} Lake"]
+
+    def fetch_weather(self, destination):
+        return f"Current weather in {destination}: 28°C, Clear sky."
+
+    def fetch_catalog(self, destination):
+        return None
+
+
+def plan_corpus(size, seed=0):
+    rng = random.Random(seed)
+    plans = []
+    for _ in range(size):
+        data = {
+            "destination": rng.choice(DESTINATIONS),
+            "days": rng.randint(2, 10),
+            "budget": rng.choice([8000, 15000, 30000, 60000]),
+            "transportation": rng.choice(["flight", "train", "car", "bus"]),
+            "hotel_preference": rng.choice(["luxury", "budget", "any"]),
+            "food_preference": rng.choice(["south indian", "north indian", "any"]),
+            "activities": rng.sample(["beaches", "culture", "shopping", "adventure", "sightseeing"], 2),
+        }
+        bot = OfflineChatbot(data=data)
+        plans.append(bot.generate_trip_plan(data))
+    return plans
+
+
+class Command(BaseCommand):
+    help = ("Measure storage and I/O for ChatMessage.response with and without compression "
+            "on a corpus of generated trip plans, and the size of chatbot session payloads.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--plans", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        import logging
+        logging.getLogger("api.chatbot").setLevel(logging.WARNING)
+
+        plans = plan_corpus(options["plans"])
+        raw_bytes = sum(len(plan.encode("utf-8")) for plan in plans)
+        self.stdout.write(f"{len(plans)} plans, {raw_bytes / len(plans):,.0f} bytes on average\n")
+
+        configurations = [("plain text", None, 10 ** 9), ("zlib >= 1 KiB", "zlib", 1024), ("zlib >= 256 B", "zlib", 256)]
+        if fields.zstandard is not None:
+            configurations.append(("zstd >= 1 KiB", "zstd", 1024))
+
+        with benchmark_database():
+            user = User.objects.create(username="bench")
+            self.stdout.write(format_row("storage", "stored MiB", "ratio", "write ms", "read ms", "lazy read ms", width=18))
+            for label, algorithm, min_size in configurations:
+                fields.COMPRESSED_TEXT_ALGORITHM = algorithm or "zlib"
+                fields.COMPRESSED_TEXT_MIN_SIZE = min_size
+                ChatMessage.objects.all().delete()
+
+                start = time.perf_counter()
+                ChatMessage.objects.bulk_create(
+                    [ChatMessage(user=user, message="plan", response=plan) for plan in plans], batch_size=500
+                )
+                write = time.perf_counter() - start
+
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT SUM(LENGTH(response)) FROM api_chatmessage")
+                    stored = cursor.fetchone()[0]
+
+                start = time.perf_counter()
+                total = sum(len(message.response) for message in ChatMessage.objects.all())
+                read = time.perf_counter() - start
+                assert total == sum(len(plan) for plan in plans)
+
+                # Listing rows without touching the response never decompresses it.
+                start = time.perf_counter()
+                sum(message.id for message in ChatMessage.objects.all())
+                lazy_read = time.perf_counter() - start
+
+                self.stdout.write(format_row(
+                    label, f"{stored / 2 ** 20:,.2f}", f"{raw_bytes / stored:.1f}x",
+                    f"{write * 1000:,.0f}", f"{read * 1000:,.0f}", f"{lazy_read * 1000:,.0f}", width=18,
+                ))
+
+        # Session payloads: SessionBase.encode already zlib-compresses before signing.
+        state = {"chatbot_state": OfflineChatbot(state="get_activities", data={
+            "budget": 15000.0, "destination": "Goa", "days": 5, "transportation": "train",
+            "hotel_preference": "budget", "food_preference": "south indian",
+        }).to_dict()}
+        session = SessionStore()
+        compressed = len(session.encode(state))
+        uncompressed = len(signing.dumps(state, salt=session.key_salt, serializer=session.serializer))
+        self.stdout.write(f"\nchatbot_state session payload: {uncompressed} bytes signed, {compressed} bytes as stored by Django")
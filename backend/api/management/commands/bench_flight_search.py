@@ -0,0 +1,124 @@
+import datetime
+import random
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from api import flight_search
+
+from ._bench import format_row
+
+START = datetime.datetime(2030, 1, 1, tzinfo=datetime.timezone.utc)
+DAY = 86400
+
+
+def random_flights(count, airports, days, rng):
+    """(id, source, destination, departure, arrival, price, seats) rows over `airports` hubs and spokes."""
+    names = [f"City {i}" for i in range(airports)]
+    hubs = names[: max(2, airports // 10)]
+    rows = []
+    for flight_id in range(1, count + 1):
+        # Most routes touch a hub, as real networks do.
+        source = rng.choice(hubs if rng.random() < 0.5 else names)
+        destination = rng.choice(hubs if source not in hubs or rng.random() < 0.3 else names)
+        while destination == source:
+            destination = rng.choice(names)
+        departure = START + datetime.timedelta(seconds=rng.randrange(days * DAY))
+        duration = datetime.timedelta(minutes=rng.randint(50, 300))
+        rows.append((flight_id, source, destination, departure, departure + duration,
+                     rng.randint(2000, 15000), rng.randint(0, 180)))
+    return names, rows
+
+
+def brute_force(rows, source, destination, earliest, latest, max_stops, min_layover, max_layover):
+    """(earliest arrival, lowest price) over every itinerary, by plain enumeration."""
+    by_source = {}
+    for row in rows:
+        by_source.setdefault(row[1], []).append(row)
+    best_arrival, best_price = None, None
+    stack = [([row], row[5]) for row in by_source.get(source, [])
+             if earliest <= flight_search.epoch(row[3]) <= latest and row[6] >= 1]
+    while stack:
+        legs, price = stack.pop()
+        last = legs[-1]
+        if last[2] == destination:
+            arrival = flight_search.epoch(last[4])
+            best_arrival = arrival if best_arrival is None else min(best_arrival, arrival)
+            best_price = price if best_price is None else min(best_price, price)
+            continue
+        if len(legs) > max_stops or last[2] == source:
+            continue
+        for row in by_source.get(last[2], []):
+            wait = (row[3] - last[4]).total_seconds()
+            if min_layover <= wait <= max_layover and row[6] >= 1 and row[2] != source:
+                stack.append((legs + [row], price + row[5]))
+    return best_arrival, best_price
+
+
+class Command(BaseCommand):
+    help = ("Benchmark multi-leg flight search (api/flight_search.py): index build, earliest/cheapest/"
+            "fewest-stop queries with up to two connections, and incremental updates.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--flights", type=int, default=100_000)
+        parser.add_argument("--airports", type=int, default=200)
+        parser.add_argument("--days", type=int, default=30)
+        parser.add_argument("--queries", type=int, default=200)
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        self.check_correctness(rng)
+
+        names, rows = random_flights(options["flights"], options["airports"], options["days"], rng)
+        start = time.perf_counter()
+        index = flight_search.FlightIndex.from_rows(rows)
+        build = (time.perf_counter() - start) * 1000
+        self.stdout.write(f"{options['flights']:,} flights between {options['airports']} airports, "
+                          f"index built in {build:,.0f} ms\n")
+
+        queries = [(rng.choice(names), rng.choice(names), rng.randrange(options["days"] - 1))
+                   for _ in range(options["queries"])]
+        self.stdout.write(format_row("max stops", "mean ms", "p95 ms", "itineraries", width=12))
+        for max_stops in range(flight_search.MAX_STOPS + 1):
+            times, found = [], 0
+            for source, destination, day in queries:
+                earliest = flight_search.epoch(START) + day * DAY
+                begin = time.perf_counter()
+                found += len(index.search(source, destination, earliest, earliest + DAY - 1, max_stops))
+                times.append(time.perf_counter() - begin)
+            self.stdout.write(format_row(
+                str(max_stops), f"{np.mean(times) * 1000:.2f}", f"{np.percentile(times, 95) * 1000:.2f}",
+                f"{found / len(queries):,.0f}", width=12,
+            ))
+
+        class Changed:
+            pass
+        updates = []
+        for row in rng.sample(rows, 1000):
+            flight = Changed()
+            flight.pk, flight.source, flight.destination = row[0], row[1], row[2]
+            flight.departure_time = row[3] + datetime.timedelta(minutes=30)
+            flight.arrival_time, flight.price, flight.available_seats = row[4], row[5], row[6] - 1
+            updates.append(flight)
+        begin = time.perf_counter()
+        for flight in updates:
+            index.upsert(flight)
+        per_update = (time.perf_counter() - begin) * 1000 / len(updates)
+        self.stdout.write(f"\nincremental update: {per_update:.3f} ms per changed flight "
+                          f"(vs {build:,.0f} ms to rebuild)")
+
+    def check_correctness(self, rng, trials=100):
+        names, rows = random_flights(1500, 12, 3, rng)
+        index = flight_search.FlightIndex.from_rows(rows)
+        min_layover, max_layover = 45 * 60, 8 * 3600
+        for _ in range(trials):
+            source, destination = rng.sample(names, 2)
+            earliest = flight_search.epoch(START)
+            latest = earliest + DAY - 1
+            found = index.search(source, destination, earliest, latest, 2, min_layover, max_layover)
+            expected = brute_force(rows, source, destination, earliest, latest, 2, min_layover, max_layover)
+            arrival = min((int(index.arrival[legs[-1]]) for legs, _ in found), default=None)
+            price = min((total for _, total in found), default=None)
+            assert (arrival, price) == expected, (source, destination, arrival, price, expected)
+        self.stdout.write(f"earliest arrival and lowest price match brute force on {trials} random queries\n")
@@ -0,0 +1,66 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from api import geo
+
+from ._bench import format_row
+
+
+def random_places(n, seed=0):
+    """n places over India (lat 8-35, lon 68-97), half of them clustered around 50 cities."""
+    rng = np.random.default_rng(seed)
+    uniform = n // 2
+    lat = rng.uniform(8, 35, n)
+    lon = rng.uniform(68, 97, n)
+    cities = rng.integers(0, 50, n - uniform)
+    city_lat, city_lon = rng.uniform(8, 35, 50), rng.uniform(68, 97, 50)
+    lat[uniform:] = city_lat[cities] + rng.normal(0, 0.15, n - uniform)
+    lon[uniform:] = city_lon[cities] + rng.normal(0, 0.15, n - uniform)
+    return rng.integers(0, len(geo.KINDS), n), np.arange(n), lat, lon
+
+
+def per_query_ms(queries, fn):
+    start = time.perf_counter()
+    for query in queries:
+        fn(*query)
+    return (time.perf_counter() - start) * 1000 / len(queries)
+
+
+class Command(BaseCommand):
+    help = ("Benchmark the in-memory geospatial grid (api/geo.py): nearest-N, radius and "
+            "bounding-box queries over random places, against a brute-force numpy scan.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--places", type=int, default=1_000_000)
+        parser.add_argument("--queries", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        kinds, ids, lat, lon = random_places(options["places"])
+        start = time.perf_counter()
+        index = geo.GridIndex(kinds, ids, lat, lon)
+        self.stdout.write(f"{len(index):,} places, index built in {(time.perf_counter() - start) * 1000:,.0f} ms\n")
+
+        rng = np.random.default_rng(1)
+        picks = rng.integers(0, len(index), options["queries"])
+        # Query near existing places, as users do, with a little jitter.
+        points = [(float(lat[i] + rng.normal(0, 0.05)), float(lon[i] + rng.normal(0, 0.05))) for i in picks]
+        boxes = [(a - 0.1, b - 0.1, a + 0.1, b + 0.1) for a, b in points]
+
+        # Spot-check nearest-10 against brute force.
+        for a, b in points[:50]:
+            positions, distances = index.nearest(a, b, 10)
+            exact = np.sort(geo.haversine_km(a, b, lat, lon))[:10]
+            assert np.allclose(distances, exact), (a, b)
+
+        self.stdout.write(format_row("query", "grid ms", "brute force ms", width=24))
+        brute = per_query_ms(points[:20], lambda a, b: np.argpartition(geo.haversine_km(a, b, lat, lon), 10)[:10])
+        rows = [
+            ("nearest 10", per_query_ms(points, lambda a, b: index.nearest(a, b, 10)), brute),
+            ("nearest 10 hotels", per_query_ms(points, lambda a, b: index.nearest(a, b, 10, kinds=[1])), None),
+            ("up to 100 within 20 km", per_query_ms(points, lambda a, b: index.nearest(a, b, geo.MAX_RESULTS, 20)), None),
+            ("bbox 0.2 x 0.2 deg", per_query_ms(boxes, index.within_bbox), None),
+        ]
+        for label, grid, scan in rows:
+            self.stdout.write(format_row(label, f"{grid:.3f}", f"{scan:.1f}" if scan else "-", width=24))
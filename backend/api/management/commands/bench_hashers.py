@@ -0,0 +1,73 @@
+import os
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher, PBKDF2PasswordHasher, ScryptPasswordHasher, get_hasher,
+)
+from django.core.management.base import BaseCommand
+
+from ._bench import format_row
+
+# (label, hasher class, attribute overrides)
+SETTINGS_MATRIX = [
+    ("pbkdf2 iterations=260000", PBKDF2PasswordHasher, {"iterations": 260000}),
+    ("pbkdf2 iterations=600000", PBKDF2PasswordHasher, {"iterations": 600000}),
+    ("pbkdf2 iterations=1000000", PBKDF2PasswordHasher, {"iterations": 1000000}),
+    ("scrypt n=2^14 r=8", ScryptPasswordHasher, {"work_factor": 2 ** 14, "block_size": 8}),
+    ("scrypt n=2^15 r=8", ScryptPasswordHasher, {"work_factor": 2 ** 15, "block_size": 8, "maxmem": 64 * 1024 * 1024}),
+    ("scrypt n=2^16 r=8", ScryptPasswordHasher, {"work_factor": 2 ** 16, "block_size": 8, "maxmem": 128 * 1024 * 1024}),
+    ("argon2 t=2 m=19MiB p=1", Argon2PasswordHasher, {"time_cost": 2, "memory_cost": 19456, "parallelism": 1}),
+    ("argon2 t=2 m=100MiB p=8", Argon2PasswordHasher, {"time_cost": 2, "memory_cost": 102400, "parallelism": 8}),
+    ("argon2 t=3 m=64MiB p=4", Argon2PasswordHasher, {"time_cost": 3, "memory_cost": 65536, "parallelism": 4}),
+]
+
+
+def hashes_per_second(hasher, duration, min_hashes=3):
+    """Hash repeatedly on one thread for about `duration` seconds."""
+    salt = hasher.salt()
+    count = 0
+    start = time.perf_counter()
+    while True:
+        hasher.encode("bench-password", salt)
+        count += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= duration and count >= min_hashes:
+            return count / elapsed
+
+
+class Command(BaseCommand):
+    help = ("Report password hashes per second per core for each hashing setting, "
+            "including the currently configured policy.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--duration", type=float, default=2.0,
+                            help="Seconds to spend on each setting.")
+        parser.add_argument("--algorithm", choices=["pbkdf2", "scrypt", "argon2"],
+                            help="Only benchmark one algorithm family.")
+
+    def handle(self, *args, **options):
+        cores = os.cpu_count() or 1
+        self.stdout.write(f"{cores} cores available; rates are measured on a single core.\n")
+        self.stdout.write(format_row("setting", "hashes/s/core", "ms/hash", f"hashes/s x{cores}", width=34))
+
+        current = get_hasher("default")
+        rows = [(f"configured ({settings.PASSWORD_HASH_ALGORITHM})", current)]
+        for label, hasher_class, overrides in SETTINGS_MATRIX:
+            if options["algorithm"] and not label.startswith(options["algorithm"]):
+                continue
+            hasher = hasher_class()
+            for name, value in overrides.items():
+                setattr(hasher, name, value)
+            rows.append((label, hasher))
+
+        for label, hasher in rows:
+            try:
+                rate = hashes_per_second(hasher, options["duration"])
+            except ValueError as e:
+                # Raised by Django when an optional library (argon2-cffi) is missing.
+                self.stdout.write(f"{label:<34}skipped: {e}")
+                continue
+            self.stdout.write(format_row(
+                label, f"{rate:,.1f}", f"{1000 / rate:.1f}", f"{rate * cores:,.0f}", width=34
+            ))
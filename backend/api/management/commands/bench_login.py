@@ -0,0 +1,67 @@
+import random
+
+from django.contrib.auth import authenticate, get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from ._bench import benchmark_database, format_row, measure
+
+User = get_user_model()
+
+
+def legacy_login(email, password):
+    """The login lookup as it used to be done in api.views.login."""
+    users = User.objects.filter(email=email)
+    if not users.exists():
+        return None
+    if users.count() > 1:
+        pass
+    user = users.first()
+    return authenticate(None, username=user.username, password=password)
+
+
+def email_backend_login(email, password):
+    return authenticate(None, email=email, password=password)
+
+
+class Command(BaseCommand):
+    help = "Benchmark login throughput for the legacy lookup and the EmailBackend path."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10000)
+        parser.add_argument("--iterations", type=int, default=2000)
+        parser.add_argument("--real-hasher", action="store_true",
+                            help="Use the configured password hashers instead of MD5, "
+                                 "so the numbers include hashing cost.")
+
+    def handle(self, *args, **options):
+        hashers = None if options["real_hasher"] else ["django.contrib.auth.hashers.MD5PasswordHasher"]
+        with benchmark_database():
+            if hashers:
+                with override_settings(PASSWORD_HASHERS=hashers):
+                    self.run(options)
+            else:
+                self.run(options)
+
+    def run(self, options):
+        password = "bench-password"
+        template = User(username="template")
+        template.set_password(password)
+        User.objects.bulk_create(
+            [User(username=f"user{i}", email=f"user{i}@example.com", password=template.password)
+             for i in range(options["users"])],
+            batch_size=1000,
+        )
+        emails = [f"user{random.randrange(options['users'])}@example.com" for _ in range(options["iterations"])]
+
+        self.stdout.write(f"{options['users']} users, {options['iterations']} logins per path\n")
+        self.stdout.write(format_row("path", "queries/login", "logins/s", "ms/login"))
+        for name, login in (("legacy (exists/count/first)", legacy_login), ("EmailBackend", email_backend_login)):
+            with CaptureQueriesContext(connection) as queries:
+                assert login(emails[0], password) is not None
+            pending = iter(emails)
+            elapsed, rate = measure(lambda: login(next(pending), password), options["iterations"])
+            self.stdout.write(format_row(
+                name, str(len(queries)), f"{rate:,.0f}", f"{elapsed * 1000 / options['iterations']:.3f}"
+            ))
@@ -0,0 +1,50 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from api import routing
+
+from ._bench import format_row
+
+
+def random_pois(n, seed):
+    """n points scattered over a ~40 km city area (Goa)."""
+    rng = np.random.default_rng(seed)
+    return rng.uniform(15.30, 15.65, n), rng.uniform(73.75, 74.10, n)
+
+
+def round_robin_days(n, days):
+    """The old schedule: attractions dealt out in ranking order."""
+    return [list(range(day, n, days)) for day in range(days)]
+
+
+class Command(BaseCommand):
+    help = ("Benchmark the itinerary scheduler (distance matrix, day clustering, "
+            "nearest-neighbour + 2-opt) and compare travel distance with round-robin.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="50,200,500,1000", help="Comma-separated POI counts.")
+        parser.add_argument("--days", type=int, default=5)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        days = options["days"]
+        self.stdout.write(f"{days} days, best of {options['repeat']} runs\n")
+        self.stdout.write(format_row("POIs", "matrix ms", "schedule ms", "km/day", "round-robin km/day", width=8))
+        for n in (int(size) for size in options["sizes"].split(",")):
+            lat, lon = random_pois(n, seed=n)
+            matrix_times, schedule_times = [], []
+            for _ in range(options["repeat"]):
+                start = time.perf_counter()
+                dist = routing.haversine_matrix(lat, lon)
+                matrix_times.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                routes = routing.plan_days(lat, lon, days)
+                schedule_times.append(time.perf_counter() - start)
+            optimized = sum(routing.path_length(dist, day) for day in routes) / days
+            baseline = sum(routing.path_length(dist, day) for day in round_robin_days(n, days)) / days
+            self.stdout.write(format_row(
+                str(n), f"{min(matrix_times) * 1000:.2f}", f"{min(schedule_times) * 1000:.2f}",
+                f"{optimized:,.1f}", f"{baseline:,.1f}", width=8,
+            ))
@@ -0,0 +1,120 @@
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from api import vector_index
+
+from ._bench import format_row
+
+
+def synthetic_texts(count, topics, rng):
+    """Descriptions drawn mostly from one topic's words each, plus common filler. Returns (texts, topic per text)."""
+    filler = [f"common{i}" for i in range(200)]
+    vocabularies = [[f"topic{t}word{i}" for i in range(60)] for t in range(topics)]
+    texts, labels = [], []
+    for _ in range(count):
+        topic = rng.randrange(topics)
+        words = rng.choices(vocabularies[topic], k=rng.randint(8, 20)) + rng.choices(filler, k=rng.randint(10, 30))
+        rng.shuffle(words)
+        texts.append(" ".join(words))
+        labels.append(topic)
+    return texts, np.array(labels)
+
+
+def exact_tfidf(texts):
+    """Unhashed sublinear TF-IDF with unit rows, as a dense matrix (small corpora only)."""
+    vocabulary = {}
+    rows = [[vocabulary.setdefault(token, len(vocabulary)) for token in vector_index.TOKEN.findall(text.lower())]
+            for text in texts]
+    counts = np.zeros((len(texts), len(vocabulary)), dtype=np.float32)
+    for row, tokens in enumerate(rows):
+        np.add.at(counts[row], tokens, 1)
+    idf = np.log((1 + len(texts)) / (1 + np.count_nonzero(counts, axis=0))) + 1
+    vectors = np.log1p(counts) * idf
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class Command(BaseCommand):
+    help = ("Benchmark text similarity search (api/vector_index.py): build time, index size, "
+            "queries per second and recall of the clustered search, and how closely the embedding "
+            "follows exact TF-IDF.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--items", type=int, default=100_000)
+        parser.add_argument("--topics", type=int, default=200)
+        parser.add_argument("--queries", type=int, default=500)
+        parser.add_argument("--limit", type=int, default=10)
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        limit = options["limit"]
+        self.check_recall(rng, options["topics"], limit)
+
+        texts, labels = synthetic_texts(options["items"], options["topics"], rng)
+        kinds = np.array([rng.randrange(len(vector_index.KINDS)) for _ in texts], dtype=np.int8)
+        ids = np.arange(1, len(texts) + 1, dtype=np.int64)
+        with tempfile.TemporaryDirectory() as path:
+            start = time.perf_counter()
+            directory = vector_index.VectorIndex.build(kinds, ids, texts).save(path)
+            build = time.perf_counter() - start
+            size = os.path.getsize(os.path.join(directory, "vectors.npy")) / 2**20
+            start = time.perf_counter()
+            index = vector_index.VectorIndex.load(path)
+            load = (time.perf_counter() - start) * 1000
+            self.stdout.write(f"{len(texts):,} items x {vector_index.VECTOR_DIMENSIONS} dims: built in {build:.1f} s, "
+                              f"{size:,.1f} MiB float32, memory-mapped in {load:.0f} ms\n")
+
+            rows = [rng.randrange(len(texts)) for _ in range(options["queries"])]
+            exact = [index.search(np.asarray(index.vectors[row]), limit, exclude=row, probes=None)[0] for row in rows]
+            self.stdout.write(format_row("like an item", "queries/s", "p95 ms", f"recall@{limit}", "same topic"))
+            for probes in (4, vector_index.PROBES, 64, None):
+                times, recall, same = [], 0, 0
+                for row, expected in zip(rows, exact):
+                    begin = time.perf_counter()
+                    found, _ = index.search(np.asarray(index.vectors[row]), limit, exclude=row, probes=probes)
+                    times.append(time.perf_counter() - begin)
+                    recall += len(set(found.tolist()) & set(expected.tolist())) / max(len(expected), 1)
+                    same += np.count_nonzero(labels[index.ids[found] - 1] == labels[index.ids[row] - 1]) / max(len(found), 1)
+                self.stdout.write(format_row(
+                    f"{probes or 'all'} of {len(index.centroids)} clusters", f"{len(times) / sum(times):,.0f}",
+                    f"{np.percentile(times, 95) * 1000:.2f}", f"{recall / len(rows):.0%}", f"{same / len(rows):.0%}",
+                ))
+
+            self.stdout.write("")
+            for name, codes in (("free text", None), ("free text, hotels only", [1])):
+                times = []
+                for text in rng.sample(texts, options["queries"]):
+                    begin = time.perf_counter()
+                    index.search(index.encode(text), limit, codes)
+                    times.append(time.perf_counter() - begin)
+                self.stdout.write(format_row(name, f"{len(times) / sum(times):,.0f}",
+                                             f"{np.percentile(times, 95) * 1000:.2f}"))
+            del index
+
+    def check_recall(self, rng, topics, limit, count=5000, trials=200):
+        """
+        Overlap of the embedded top-K with exact (unhashed, unprojected)
+        TF-IDF cosine top-K on a small corpus, and how often each finds
+        items of the query's topic.
+        """
+        texts, labels = synthetic_texts(count, topics, rng)
+        index = vector_index.VectorIndex.build(np.zeros(count, dtype=np.int8), np.arange(count), texts)
+        exact = exact_tfidf(texts)
+        overlap = same_embedded = same_exact = 0
+        for place_id in rng.sample(range(count), trials):
+            row = index.rows[(0, place_id)]
+            found, _ = index.search(np.asarray(index.vectors[row]), limit, exclude=row, probes=None)
+            found = index.ids[found]
+            scores = exact @ exact[place_id]
+            scores[place_id] = -np.inf
+            expected = np.argpartition(-scores, limit - 1)[:limit]
+            overlap += len(set(found.tolist()) & set(expected.tolist())) / limit
+            same_embedded += np.count_nonzero(labels[found] == labels[place_id]) / limit
+            same_exact += np.count_nonzero(labels[expected] == labels[place_id]) / limit
+        self.stdout.write(f"{count:,} items, {trials} queries: recall@{limit} against exact TF-IDF cosine "
+                          f"{overlap / trials:.0%}; same topic {same_embedded / trials:.0%} "
+                          f"(exact TF-IDF {same_exact / trials:.0%})\n")
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import vector_index
+
+
+class Command(BaseCommand):
+    help = ("Rebuild the text similarity index over destination, hotel and activity descriptions "
+            "(api/vector_index.py).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", help=f"Output directory (default: {vector_index.VECTOR_INDEX_PATH}).")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        index = vector_index.build_index(options["path"])
+        self.stdout.write(f"Indexed {len(index.ids):,} places ({index.vectors.nbytes / 2**20:,.1f} MiB of vectors) "
+                          f"in {time.perf_counter() - start:.1f} s to {options['path'] or vector_index.VECTOR_INDEX_PATH}")
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.prefetch import (
+    PREFETCH_INTERVAL, PREFETCH_TOP_N,
+    top_destinations, warm_destination, warm_top_destinations,
+)
+
+
+class Command(BaseCommand):
+    help = "Pre-fetch and refresh upstream data for the most requested destinations."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=PREFETCH_TOP_N,
+                            help="Number of most requested destinations to keep warm.")
+        parser.add_argument("--destination", action="append", default=[],
+                            help="Warm a specific destination (can be repeated).")
+        parser.add_argument("--force", action="store_true",
+                            help="Refresh entries even if they are not close to expiry.")
+        parser.add_argument("--loop", action="store_true",
+                            help="Keep running and refresh every --interval seconds.")
+        parser.add_argument("--interval", type=int, default=PREFETCH_INTERVAL)
+
+    def handle(self, *args, **options):
+        while True:
+            if options["destination"]:
+                calls = sum(warm_destination(name, force=options["force"]) for name in options["destination"])
+            else:
+                calls = warm_top_destinations(options["top"], force=options["force"])
+            self.stdout.write(
+                f"Refreshed {calls} upstream entries for: {', '.join(options['destination'] or top_destinations(options['top'])) or 'no destinations yet'}"
+            )
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from api.fares import rebuild
+
+
+class Command(BaseCommand):
+    help = ("Recompute the per-route daily fare and availability aggregates from the Flight table, "
+            "e.g. after bulk imports that bypass model signals.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", help="Only rebuild days from this date (YYYY-MM-DD) on.")
+
+    def handle(self, *args, **options):
+        since = None
+        if options["since"]:
+            since = parse_date(options["since"])
+            if since is None:
+                raise CommandError(f"Invalid --since date: {options['since']}")
+        count = rebuild(since)
+        self.stdout.write(f"Rebuilt {count} route/day fare aggregates" + (f" from {since}" if since else ""))
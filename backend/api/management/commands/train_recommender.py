@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import recommender
+
+
+class Command(BaseCommand):
+    help = ("Train destination recommendations from bookings and reviews and store per-user, "
+            "per-destination and popular top-K lists.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--incremental", action="store_true",
+                            help="Only apply bookings and reviews added since the last run.")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        counts = recommender.update() if options["incremental"] else recommender.train()
+        self.stdout.write(f"Updated recommendations for {counts['users']} users and {counts['destinations']} "
+                          f"destinations in {time.perf_counter() - start:.2f} s ({recommender.RECOMMENDER_STATE_PATH})")
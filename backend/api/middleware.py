@@ -0,0 +1,42 @@
+"""
+Request timing middleware; see api/timing.py for the spans it records.
+"""
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from . import timing
+
+
+class TimingMiddleware:
+    """
+    Times each request and its SQL, outbound HTTP, LLM and serializer spans,
+    adds a Server-Timing header (with SERVER_TIMING, or for staff) and feeds the
+    `/metrics` histograms. List it first in MIDDLEWARE so the total covers
+    the other middleware too. Streaming responses are timed until their
+    body starts, not until it ends.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        timing.install()
+
+    def __call__(self, request):
+        timings = timing.RequestTimings()
+        token = timing.start(timings)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timings.execute_wrapper))
+                response = self.get_response(request)
+        finally:
+            timing.stop(token)
+        total = time.perf_counter() - start
+
+        match = getattr(request, "resolver_match", None)
+        timings.observe(match.view_name if match else "unmatched", request.method, response.status_code, total)
+        user = getattr(request, "user", None)
+        if timing.SERVER_TIMING or (user is not None and user.is_staff):
+            response["Server-Timing"] = timings.header(total)
+        return response
@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    # Runs after every auth migration that alters auth_user, since SQLite
+    # rebuilds the table (dropping extra indexes) on ALTER.
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('api', '0001_initial'),
+    ]
+
+    # Login and registration look users up by email, which Django's auth_user
+    # table does not index. The index is not UNIQUE because existing data may
+    # already contain duplicates; UserRegistrationSerializer keeps new emails unique.
+    operations = [
+        migrations.RunSQL(
+            sql="CREATE INDEX IF NOT EXISTS api_auth_user_email_idx ON auth_user (email);",
+            reverse_sql="DROP INDEX IF EXISTS api_auth_user_email_idx;",
+        ),
+    ]
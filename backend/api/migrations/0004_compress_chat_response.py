@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:23
+
+import api.fields
+from django.db import migrations
+
+
+def compress_existing(apps, schema_editor):
+    # Rows copied over by AlterField are still plain text; rewrite them so
+    # large responses are stored compressed too.
+    ChatMessage = apps.get_model('api', 'ChatMessage')
+    for message in ChatMessage.objects.only('pk', 'response').iterator(chunk_size=1000):
+        if isinstance(message.__dict__['response'], str):
+            ChatMessage.objects.filter(pk=message.pk).update(response=message.response)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_history_retention'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='chatmessage',
+            name='response',
+            field=api.fields.CompressedTextField(),
+        ),
+        migrations.RunPython(compress_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_compress_chat_response'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Trip',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('destination', models.CharField(max_length=100)),
+                ('days', models.PositiveIntegerField()),
+                ('budget', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('transportation', models.CharField(default='any', max_length=20)),
+                ('hotel_preference', models.CharField(default='any', max_length=50)),
+                ('food_preference', models.CharField(default='any', max_length=50)),
+                ('activities', models.JSONField(default=list)),
+                ('weather', models.TextField(blank=True)),
+                ('attractions', models.JSONField(default=list)),
+                ('hotels', models.JSONField(default=list)),
+                ('restaurants', models.JSONField(default=list)),
+                ('costs', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TripDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField()),
+                ('slots', models.JSONField(default=list)),
+                ('trip', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='itinerary', to='api.trip')),
+            ],
+            options={
+                'ordering': ['number'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(fields=['user', '-created_at'], name='api_trip_user_created_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='tripday',
+            constraint=models.UniqueConstraint(fields=('trip', 'number'), name='api_trip_day_unique'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:43
+
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models import Count, Min, Q, Sum
+from django.db.models.functions import Lower, TruncDate
+
+
+def aggregate_existing(apps, schema_editor):
+    Flight = apps.get_model('api', 'Flight')
+    FlightDailyFare = apps.get_model('api', 'FlightDailyFare')
+    rows = Flight.objects.values(
+        route_source=Lower('source'), route_destination=Lower('destination'), day=TruncDate('departure_time'),
+    ).annotate(
+        flights=Count('id'),
+        available_flights=Count('id', filter=Q(available_seats__gt=0)),
+        seats_left=Sum('available_seats', filter=Q(available_seats__gt=0), default=0),
+        min_price=Min('price', filter=Q(available_seats__gt=0)),
+    ).order_by()
+    FlightDailyFare.objects.bulk_create([
+        FlightDailyFare(source=row['route_source'], destination=row['route_destination'], date=row['day'],
+                        flights=row['flights'], available_flights=row['available_flights'],
+                        seats_left=row['seats_left'], min_price=row['min_price'])
+        for row in rows.iterator(chunk_size=2000)
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_coordinates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FlightDailyFare',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=100)),
+                ('destination', models.CharField(max_length=100)),
+                ('date', models.DateField()),
+                ('min_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('flights', models.PositiveIntegerField(default=0)),
+                ('available_flights', models.PositiveIntegerField(default=0)),
+                ('seats_left', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='flight',
+            index=models.Index(django.db.models.functions.text.Lower('source'), django.db.models.functions.text.Lower('destination'), models.F('departure_time'), name='api_flight_route_dep_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='flightdailyfare',
+            constraint=models.UniqueConstraint(fields=('source', 'destination', 'date'), name='api_flight_daily_fare_unique'),
+        ),
+        migrations.RunPython(aggregate_existing, migrations.RunPython.noop),
+    ]
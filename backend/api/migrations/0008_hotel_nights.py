@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:47
+
+import django.core.validators
+import django.db.models.deletion
+from collections import Counter
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def book_existing(apps, schema_editor):
+    # Upcoming hotel bookings already hold rooms on their nights.
+    Booking = apps.get_model('api', 'Booking')
+    HotelNight = apps.get_model('api', 'HotelNight')
+    booked = Counter()
+    bookings = Booking.objects.filter(
+        booking_type='hotel', hotel__isnull=False, end_date__gt=timezone.localdate(),
+    ).exclude(status='cancelled').values_list('hotel_id', 'start_date', 'end_date', 'rooms')
+    for hotel_id, start, end, rooms in bookings.iterator(chunk_size=2000):
+        for offset in range(max((end - start).days, 0)):
+            booked[hotel_id, start + timedelta(days=offset)] += rooms
+    HotelNight.objects.bulk_create(
+        [HotelNight(hotel_id=hotel_id, date=date, booked=count) for (hotel_id, date), count in booked.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_fare_calendar'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='rooms',
+            field=models.PositiveSmallIntegerField(default=1, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.CreateModel(
+            name='HotelNight',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('rooms', models.PositiveIntegerField(blank=True, null=True)),
+                ('booked', models.PositiveIntegerField(default=0)),
+                ('price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('hotel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nights', to='api.hotel')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('hotel', 'date'), name='api_hotel_night_unique')],
+            },
+        ),
+        migrations.RunPython(book_existing, migrations.RunPython.noop),
+    ]
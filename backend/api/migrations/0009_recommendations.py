@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_hotel_nights'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Recommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('user', 'User'), ('destination', 'Destination'), ('popular', 'Popular')], max_length=12)),
+                ('key', models.PositiveIntegerField()),
+                ('destinations', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'key'), name='api_recommendation_unique')],
+            },
+        ),
+    ]
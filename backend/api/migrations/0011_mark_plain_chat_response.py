@@ -0,0 +1,34 @@
+from django.db import migrations
+
+from api.fields import PLAIN_MARKER, ZLIB_MARKER, ZSTD_MARKER, StoredText, compress_text, decompress_text
+
+
+def decode_legacy(value):
+    # Before this migration plain values were stored without a marker, so
+    # plain text starting with a marker byte is told apart by failing to
+    # decompress.
+    value = bytes(value)
+    if value[:1] in (PLAIN_MARKER, ZLIB_MARKER, ZSTD_MARKER):
+        try:
+            return decompress_text(value)
+        except Exception:
+            pass
+    return value.decode('utf-8')
+
+
+def mark_plain(apps, schema_editor):
+    ChatMessage = apps.get_model('api', 'ChatMessage')
+    for pk, response in ChatMessage.objects.values_list('pk', 'response').iterator(chunk_size=1000):
+        if isinstance(response, StoredText):
+            ChatMessage.objects.filter(pk=pk).update(response=StoredText(compress_text(decode_legacy(response))))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_llm_usage'),
+    ]
+
+    operations = [
+        migrations.RunPython(mark_plain, migrations.RunPython.noop),
+    ]
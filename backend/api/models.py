@@ -1,6 +1,9 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.db.models.functions import Lower
+
+from .fields import CompressedTextField
 
 # Create your models here.
 
@@ -18,6 +21,8 @@ class Destination(models.Model):
     description = models.TextField()
     image = models.ImageField(upload_to='destinations/')
     location = models.CharField(max_length=100)
+    latitude = models.FloatField(null=True, blank=True, validators=[MinValueValidator(-90), MaxValueValidator(90)])
+    longitude = models.FloatField(null=True, blank=True, validators=[MinValueValidator(-180), MaxValueValidator(180)])
     is_trending = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -33,10 +38,33 @@ class Hotel(models.Model):
     image = models.ImageField(upload_to='hotels/')
     amenities = models.JSONField(default=list)
     available_rooms = models.IntegerField(default=0)
+    # Hotels and activities without their own coordinates are placed at their destination's.
+    latitude = models.FloatField(null=True, blank=True, validators=[MinValueValidator(-90), MaxValueValidator(90)])
+    longitude = models.FloatField(null=True, blank=True, validators=[MinValueValidator(-180), MaxValueValidator(180)])
 
     def __str__(self):
         return f"{self.name} - {self.destination.name}"
 
+class HotelNight(models.Model):
+    """
+    Per-night inventory and rate (api/inventory.py). A night without a row
+    has the hotel's available_rooms free at price_per_night; rooms and price
+    override those for one night.
+    """
+    hotel = models.ForeignKey(Hotel, on_delete=models.CASCADE, related_name='nights')
+    date = models.DateField()
+    rooms = models.PositiveIntegerField(null=True, blank=True)
+    booked = models.PositiveIntegerField(default=0)
+    price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['hotel', 'date'], name='api_hotel_night_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.hotel.name} on {self.date}"
+
 class Flight(models.Model):
     flight_number = models.CharField(max_length=20)
     airline = models.CharField(max_length=100)
@@ -47,9 +75,37 @@ class Flight(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     available_seats = models.IntegerField(default=0)
 
+    class Meta:
+        indexes = [
+            # Per-route, per-day lookups for the fare calendar (api/fares.py).
+            models.Index(Lower('source'), Lower('destination'), 'departure_time', name='api_flight_route_dep_idx'),
+        ]
+
     def __str__(self):
         return f"{self.flight_number} - {self.source} to {self.destination}"
 
+class FlightDailyFare(models.Model):
+    """
+    Per route and day: cheapest bookable fare and seat availability, kept
+    up to date from Flight changes (api/fares.py). Routes are lowercase.
+    """
+    source = models.CharField(max_length=100)
+    destination = models.CharField(max_length=100)
+    date = models.DateField()
+    min_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)  # among flights with seats
+    flights = models.PositiveIntegerField(default=0)
+    available_flights = models.PositiveIntegerField(default=0)
+    seats_left = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'destination', 'date'], name='api_flight_daily_fare_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.source} to {self.destination} on {self.date}"
+
 class Activity(models.Model):
     name = models.CharField(max_length=100)
     destination = models.ForeignKey(Destination, on_delete=models.CASCADE)
@@ -59,6 +115,8 @@ class Activity(models.Model):
     image = models.ImageField(upload_to='activities/')
     max_participants = models.IntegerField()
     available_slots = models.IntegerField()
+    latitude = models.FloatField(null=True, blank=True, validators=[MinValueValidator(-90), MaxValueValidator(90)])
+    longitude = models.FloatField(null=True, blank=True, validators=[MinValueValidator(-180), MaxValueValidator(180)])
 
     def __str__(self):
         return f"{self.name} - {self.destination.name}"
@@ -80,12 +138,20 @@ class Booking(models.Model):
     hotel = models.ForeignKey(Hotel, on_delete=models.SET_NULL, null=True, blank=True)
     flight = models.ForeignKey(Flight, on_delete=models.SET_NULL, null=True, blank=True)
     activity = models.ForeignKey(Activity, on_delete=models.SET_NULL, null=True, blank=True)
+    rooms = models.PositiveSmallIntegerField(default=1, validators=[MinValueValidator(1)])
     start_date = models.DateField()
     end_date = models.DateField()
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Per-user history, newest first, and the archival scan (api/history.py).
+            models.Index(fields=['user', '-created_at'], name='api_booking_user_created_idx'),
+            models.Index(fields=['end_date'], name='api_booking_end_date_idx'),
+        ]
+
     def __str__(self):
         return f"{self.booking_type} booking by {self.user.username}"
 
@@ -99,11 +165,137 @@ class Review(models.Model):
     def __str__(self):
         return f"Review by {self.user.username} for {self.destination.name}"
 
+class Recommendation(models.Model):
+    """
+    Precomputed top destinations (api/recommender.py) for a user, for a
+    destination ("more like this") or overall (POPULAR, key 0).
+    """
+    USER = 'user'
+    DESTINATION = 'destination'
+    POPULAR = 'popular'
+    KINDS = [(USER, 'User'), (DESTINATION, 'Destination'), (POPULAR, 'Popular')]
+
+    kind = models.CharField(max_length=12, choices=KINDS)
+    key = models.PositiveIntegerField()  # user or destination id
+    destinations = models.JSONField(default=list)  # [{"id": ..., "score": ...}], best first
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'key'], name='api_recommendation_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.key} recommendations"
+
 class ChatMessage(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     message = models.TextField()
-    response = models.TextField()
+    response = CompressedTextField()  # generated trip plans are long and repetitive
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='api_chat_user_created_idx'),
+            models.Index(fields=['created_at'], name='api_chat_created_idx'),
+        ]
+
     def __str__(self):
         return f"Chat with {self.user.username} at {self.created_at}"
+
+class HistoryArchive(models.Model):
+    """
+    Index of archived history: one gzip JSONL file per kind, user and month,
+    holding rows moved out of the hot tables by `manage.py archive_history`.
+    """
+    KINDS = [
+        ('chat', 'Chat messages'),
+        ('booking', 'Bookings'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KINDS)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    month = models.DateField()  # first day of the month the rows were created in
+    path = models.CharField(max_length=255)
+    row_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'user', 'month'], name='api_history_archive_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} archive for {self.user_id} ({self.month:%Y-%m})"
+
+class Trip(models.Model):
+    """
+    A generated trip plan, stored once in structured form (api/itinerary.py).
+    Per-day itineraries live in TripDay so clients can fetch a single day and
+    a day can be regenerated without touching the rest of the plan.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+    destination = models.CharField(max_length=100)
+    days = models.PositiveIntegerField()
+    budget = models.DecimalField(max_digits=12, decimal_places=2)
+    transportation = models.CharField(max_length=20, default='any')
+    hotel_preference = models.CharField(max_length=50, default='any')
+    food_preference = models.CharField(max_length=50, default='any')
+    activities = models.JSONField(default=list)
+    weather = models.TextField(blank=True)
+    attractions = models.JSONField(default=list)
+    hotels = models.JSONField(default=list)
+    restaurants = models.JSONField(default=list)
+    costs = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='api_trip_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.days}-day trip to {self.destination}"
+
+class TripDay(models.Model):
+    trip = models.ForeignKey(Trip, on_delete=models.CASCADE, related_name='itinerary')
+    number = models.PositiveIntegerField()
+    slots = models.JSONField(default=list)  # [{"time", "kind", "name", ...}], see api/itinerary.py
+
+    class Meta:
+        ordering = ['number']
+        constraints = [
+            models.UniqueConstraint(fields=['trip', 'number'], name='api_trip_day_unique'),
+        ]
+
+    def __str__(self):
+        return f"Day {self.number} of {self.trip}"
+
+class LLMUsageRollup(models.Model):
+    """
+    LLM calls per hour, user and model (api/llm.py). Counters are summed in
+    memory and added to the matching row on each flush, so a report or a
+    budget check is a Sum over a handful of rows rather than one per call.
+    """
+    period_start = models.DateTimeField()  # start of the hour
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    model = models.CharField(max_length=100)
+    calls = models.PositiveIntegerField(default=0)
+    errors = models.PositiveIntegerField(default=0)
+    cache_hits = models.PositiveIntegerField(default=0)  # calls with cached prompt tokens
+    prompt_tokens = models.PositiveBigIntegerField(default=0)
+    completion_tokens = models.PositiveBigIntegerField(default=0)
+    cached_tokens = models.PositiveBigIntegerField(default=0)
+    latency_ms = models.PositiveBigIntegerField(default=0)  # total over the calls
+    max_latency_ms = models.PositiveIntegerField(default=0)
+    cost = models.DecimalField(max_digits=12, decimal_places=6, default=0)  # USD
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'period_start'], name='api_llm_usage_user_period_idx'),
+            models.Index(fields=['period_start'], name='api_llm_usage_period_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.model} usage from {self.period_start:%Y-%m-%d %H:00}"
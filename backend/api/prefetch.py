@@ -0,0 +1,184 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Upstream responses are cached for UPSTREAM_CACHE_TTL seconds. The refresher
+# re-fetches entries for the most requested destinations once they are older
+# than UPSTREAM_CACHE_TTL - PREFETCH_REFRESH_AHEAD, so hot destinations never
+# expire and user requests for them never wait on an upstream call.
+UPSTREAM_CACHE_TTL = getattr(settings, "UPSTREAM_CACHE_TTL", 60 * 30)
+PREFETCH_REFRESH_AHEAD = getattr(settings, "PREFETCH_REFRESH_AHEAD", 60 * 5)
+PREFETCH_TOP_N = getattr(settings, "PREFETCH_TOP_N", 20)
+PREFETCH_INTERVAL = getattr(settings, "PREFETCH_INTERVAL", 60)
+
+# Destinations that have not been requested for this long drop out of the
+# popularity ranking.
+POPULARITY_TTL = 60 * 60 * 24 * 7
+
+UPSTREAM_KEY = "upstream:{kind}:{destination}"
+POPULARITY_KEY = "prefetch:hits:{destination}"
+POPULARITY_INDEX_KEY = "prefetch:destinations"
+
+
+def normalize_destination(destination):
+    """Return the cache key form of a destination name."""
+    return " ".join(str(destination or "").lower().split())
+
+
+def record_destination(destination):
+    """
+    Count one request for a destination. Counters live in the shared cache so
+    the request path, the in-process refresher and the management command all
+    see the same ranking.
+    """
+    name = normalize_destination(destination)
+    if not name:
+        return
+    try:
+        key = POPULARITY_KEY.format(destination=name)
+        if cache.add(key, 1, POPULARITY_TTL):
+            known = cache.get(POPULARITY_INDEX_KEY) or []
+            if name not in known:
+                known.append(name)
+                cache.set(POPULARITY_INDEX_KEY, known, POPULARITY_TTL)
+        else:
+            cache.incr(key)
+    except Exception as e:
+        logger.exception("Error recording destination popularity: %s", e)
+
+
+def top_destinations(limit=PREFETCH_TOP_N):
+    """Return the most requested destinations, most popular first."""
+    known = cache.get(POPULARITY_INDEX_KEY) or []
+    if not known:
+        return []
+    hits = cache.get_many([POPULARITY_KEY.format(destination=name) for name in known])
+    ranked = []
+    alive = []
+    for name in known:
+        count = hits.get(POPULARITY_KEY.format(destination=name))
+        if count:
+            ranked.append((count, name))
+            alive.append(name)
+    if len(alive) != len(known):
+        cache.set(POPULARITY_INDEX_KEY, alive, POPULARITY_TTL)
+    ranked.sort(key=lambda item: (-item[0], item[1]))
+    return [name for _, name in ranked[:limit]]
+
+
+def cached_fetch(kind, destination, fetch, *args, cache_if=bool):
+    """
+    Return the cached upstream result for (kind, destination), calling
+    fetch(*args) on a miss. Results rejected by cache_if (by default, empty
+    ones) are not cached so a failing upstream is retried on the next request
+    instead of being pinned for the TTL.
+    """
+    key = UPSTREAM_KEY.format(kind=kind, destination=normalize_destination(destination))
+    entry = cache.get(key)
+    if entry is not None:
+        return entry["value"]
+    value = fetch(*args)
+    if cache_if(value):
+        cache.set(key, {"value": value, "fetched_at": time.time()}, UPSTREAM_CACHE_TTL)
+    return value
+
+
+def refresh_entry(kind, destination, fetch, *args, force=False, cache_if=bool):
+    """
+    Re-fetch an upstream entry if it is missing or close to expiry. The old
+    value keeps being served until the new one is stored. Returns True if an
+    upstream call was made.
+    """
+    key = UPSTREAM_KEY.format(kind=kind, destination=normalize_destination(destination))
+    entry = cache.get(key)
+    if not force and entry is not None:
+        age = time.time() - entry["fetched_at"]
+        if age < UPSTREAM_CACHE_TTL - PREFETCH_REFRESH_AHEAD:
+            return False
+    value = fetch(*args)
+    if cache_if(value):
+        cache.set(key, {"value": value, "fetched_at": time.time()}, UPSTREAM_CACHE_TTL)
+    return True
+
+
+def warm_destination(destination, force=False):
+    """
+    Refresh every upstream lookup the homepage and chatbot paths make for a
+    destination. Returns the number of upstream calls made.
+    """
+    from . import dynamic_homepage
+    from .chatbot import Chatbot, weather_available
+
+    query = normalize_destination(destination)
+    calls = 0
+    calls += refresh_entry("homepage:trending", query, dynamic_homepage.fetch_trending_destinations, query, force=force)
+    calls += refresh_entry("homepage:hotels", query, dynamic_homepage.fetch_hotels, query, force=force)
+    calls += refresh_entry("homepage:restaurants", query, dynamic_homepage.fetch_restaurants, query, force=force)
+
+    trending = cached_fetch("homepage:trending", query, dynamic_homepage.fetch_trending_destinations, query)
+    base_destination = trending[0]["destination"] if trending else query
+    calls += refresh_entry("homepage:weather", base_destination, dynamic_homepage.fetch_weather, base_destination, force=force)
+
+    bot = Chatbot()
+    title = query.title()
+    calls += refresh_entry("chatbot:places", title, bot.fetch_attractions, title, force=force)
+    calls += refresh_entry("chatbot:weather", title, bot.fetch_weather, title, force=force, cache_if=weather_available)
+    return calls
+
+
+def warm_top_destinations(limit=PREFETCH_TOP_N, force=False):
+    """Refresh upstream data for the top-N destinations. Returns the number of upstream calls made."""
+    calls = 0
+    for destination in top_destinations(limit):
+        try:
+            calls += warm_destination(destination, force=force)
+        except Exception as e:
+            logger.exception("Error warming destination %s: %s", destination, e)
+    return calls
+
+
+class PrefetchWorker(threading.Thread):
+    """
+    Daemon thread that periodically refreshes the top-N destinations.
+    Started from ApiConfig.ready() when PREFETCH_IN_PROCESS is enabled;
+    deployments with several workers should run `manage.py prefetch_destinations --loop`
+    once instead.
+    """
+    def __init__(self, interval=PREFETCH_INTERVAL, limit=PREFETCH_TOP_N):
+        super().__init__(name="prefetch-worker", daemon=True)
+        self.interval = interval
+        self.limit = limit
+        self._stop_event = threading.Event()
+
+    def run(self):
+        logger.info("Prefetch worker started (top %s every %ss).", self.limit, self.interval)
+        while not self._stop_event.is_set():
+            try:
+                calls = warm_top_destinations(self.limit)
+                if calls:
+                    logger.info("Prefetch worker refreshed %s upstream entries.", calls)
+            except Exception as e:
+                logger.exception("Prefetch worker iteration failed: %s", e)
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def start_worker():
+    """Start the in-process refresher once per process."""
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = PrefetchWorker()
+            _worker.start()
+    return _worker
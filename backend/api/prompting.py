@@ -0,0 +1,206 @@
+"""
+Retrieval-augmented prompts for the GPT trip-plan fallback.
+
+The fallback used to describe the trip and let the model invent hotels and
+activities in a free-form reply of whatever length it chose. Instead, the
+destination's own hotels and activities are retrieved from the database,
+ranked for the traveller (affordable first, then hotel preference or
+activity interests) and packed one compact line each:
+
+    H12|Sea Breeze|INR 3000/night|4.5|pool,wifi|Beach resort with surf lessons
+    A7|Scuba dive|INR 2500|3h|Two dives off Grande Island
+
+(at most MAX_PROMPT_HOTELS hotels and ACTIVITY_CHOICES_PER_DAY activities
+per day) until the prompt reaches PROMPT_TOKEN_BUDGET tokens (estimated at
+CHARS_PER_TOKEN characters per token, so no tokenizer is needed). The
+fixed instructions come first as the system message, so providers that
+cache prompt prefixes can reuse them across trips.
+
+The model answers with a small JSON object that refers to the listed ids,
+and max_tokens is scaled to the trip length. `parse_plan` keeps only ids
+that were offered, so every hotel and activity in the reply is bookable,
+and `render_plan` turns the result into the chatbot's text.
+"""
+import json
+import math
+
+from django.conf import settings
+
+from .models import Activity, Destination, Hotel
+
+PLAN_MODEL = "gpt-4o-2024-05-13"
+PROMPT_TOKEN_BUDGET = getattr(settings, "PROMPT_TOKEN_BUDGET", 1200)
+CHARS_PER_TOKEN = 4
+DESCRIPTION_CHARS = 80
+MAX_AMENITIES = 4
+MAX_PROMPT_HOTELS = 6
+ACTIVITY_CHOICES_PER_DAY = 4
+MAX_RETRIEVED = 200  # rows of each kind ranked per destination
+PLAN_BASE_TOKENS = 80
+PLAN_TOKENS_PER_DAY = 90
+PLAN_MAX_TOKENS = 1500
+DAY_TEXT_WORDS = 15
+
+SYSTEM_PROMPT = (
+    "You plan trips in India. Use only the hotels (H ids) and activities (A ids) listed by the user; "
+    "never invent others. Reply with JSON only, in this shape:\n"
+    '{"hotel":"H1","days":[{"day":1,"morning":"...","afternoon":"...","evening":"...","activities":["A1"]}],'
+    '"tip":"..."}\n'
+    f"One entry per day, each text under {DAY_TEXT_WORDS} words, at most two activities a day, "
+    "and keep the hotel plus activities within the budget. Use null for the hotel and empty "
+    "activity lists when none are listed."
+)
+
+HOTEL_HEADER = "Hotels (id|name|price|rating|amenities|about):"
+ACTIVITY_HEADER = "Activities (id|name|price|duration|about):"
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def clean(text, limit=None):
+    """One line without the field separator, cut at a word boundary to `limit` characters."""
+    text = " ".join(str(text).replace("|", "/").split())
+    if limit and len(text) > limit:
+        text = text[:limit].rsplit(" ", 1)[0] + "..."
+    return text
+
+
+def format_duration(duration):
+    minutes = round(duration.total_seconds() / 60)
+    return f"{minutes // 60}h" if minutes % 60 == 0 else f"{minutes}m"
+
+
+def find_destination(name):
+    return (Destination.objects.filter(name__iexact=name).first()
+            or Destination.objects.filter(name__icontains=name).order_by("name").first())
+
+
+def rank_hotels(place, trip):
+    """Hotels at `place`: affordable for the whole stay first, then by the traveller's preference."""
+    nights = max(trip["days"], 1)
+    hotels = list(Hotel.objects.filter(destination=place).order_by("price_per_night", "id")[:MAX_RETRIEVED])
+    if trip["hotel_preference"] == "budget":
+        preference = lambda hotel: (float(hotel.price_per_night), -float(hotel.rating))  # noqa: E731
+    else:
+        preference = lambda hotel: (-float(hotel.rating), float(hotel.price_per_night))  # noqa: E731
+    return sorted(hotels, key=lambda hotel: (float(hotel.price_per_night) * nights > trip["budget"], preference(hotel)))
+
+
+def rank_activities(place, trip):
+    """Bookable activities at `place`: most matching interests first, then cheapest."""
+    interests = [interest.lower() for interest in trip["activities"]]
+    activities = list(Activity.objects.filter(destination=place, available_slots__gt=0)
+                      .order_by("price", "id")[:MAX_RETRIEVED])
+
+    def matches(activity):
+        text = f"{activity.name} {activity.description}".lower()
+        return sum(interest in text for interest in interests)
+
+    return sorted(activities, key=lambda activity: (-matches(activity), activity.price > trip["budget"]))
+
+
+def hotel_line(hotel):
+    amenities = ",".join(clean(amenity) for amenity in (hotel.amenities or [])[:MAX_AMENITIES])
+    return (f"H{hotel.id}|{clean(hotel.name)}|INR {hotel.price_per_night:.0f}/night|{hotel.rating:.1f}|"
+            f"{amenities}|{clean(hotel.description, DESCRIPTION_CHARS)}")
+
+
+def activity_line(activity):
+    return (f"A{activity.id}|{clean(activity.name)}|INR {activity.price:.0f}|{format_duration(activity.duration)}|"
+            f"{clean(activity.description, DESCRIPTION_CHARS)}")
+
+
+def pack(sections, budget):
+    """
+    Lines from each (header, [(key, line, item)]) section in order while the
+    estimated total stays within `budget` tokens. Returns (text, {key: item}).
+    """
+    lines, offered, used = [], {}, 0
+    for header, rows in sections:
+        section = []
+        for key, line, item in rows:
+            cost = estimate_tokens(line) + 1
+            if used + cost + estimate_tokens(header) + 1 > budget:
+                break
+            section.append(line)
+            offered[key] = item
+            used += cost
+        if section:
+            lines += [header] + section
+            used += estimate_tokens(header) + 1
+    return "\n".join(lines), offered
+
+
+def build_prompt(trip):
+    """
+    Chat messages for a trip (as from Chatbot.trip_data), the catalogue
+    rows they offer by id, and the max_tokens to allow for the reply.
+    """
+    request = (
+        f"Trip: {clean(trip['destination'])}, {trip['days']} days, budget INR {trip['budget']:.0f}, "
+        f"travel by {clean(trip['transportation'])}, hotel {clean(trip['hotel_preference'])}, "
+        f"food {clean(trip['food_preference'])}, interests {clean(', '.join(trip['activities'])) or 'none'}."
+    )
+    catalog, offered = "", {}
+    place = find_destination(trip["destination"])
+    if place is not None:
+        hotels = [(f"H{hotel.id}", hotel_line(hotel), hotel) for hotel in rank_hotels(place, trip)[:MAX_PROMPT_HOTELS]]
+        activities = [(f"A{activity.id}", activity_line(activity), activity) for activity in rank_activities(place, trip)[:ACTIVITY_CHOICES_PER_DAY * max(trip["days"], 1)]]
+        budget = PROMPT_TOKEN_BUDGET - estimate_tokens(SYSTEM_PROMPT) - estimate_tokens(request)
+        catalog, offered = pack([(HOTEL_HEADER, hotels), (ACTIVITY_HEADER, activities)], budget)
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"{request}\n{catalog or 'No hotels or activities are listed.'}"},
+    ]
+    max_tokens = min(PLAN_BASE_TOKENS + PLAN_TOKENS_PER_DAY * max(trip["days"], 1), PLAN_MAX_TOKENS)
+    return messages, offered, max_tokens
+
+
+def parse_plan(content, offered):
+    """
+    The model's JSON reply as {"hotel", "days", "tip"}, with ids resolved
+    to the rows in `offered`; ids that were not offered are dropped.
+    Raises ValueError if the reply is not a plan.
+    """
+    content = content.strip()
+    if content.startswith("```"):
+        content = content.strip("`").removeprefix("json").strip()
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Reply is not JSON: {e}") from None
+    if not isinstance(data, dict) or not isinstance(data.get("days"), list):
+        raise ValueError("Reply has no list of days.")
+    hotel = offered.get(data.get("hotel")) if isinstance(data.get("hotel"), str) else None
+    days = []
+    for number, day in enumerate(data["days"], start=1):
+        if not isinstance(day, dict):
+            raise ValueError("Each day must be an object.")
+        ids = day.get("activities") if isinstance(day.get("activities"), list) else []
+        days.append({
+            "day": number,
+            **{time: clean(day.get(time) or "") for time in ("morning", "afternoon", "evening")},
+            "activities": [offered[key] for key in ids if isinstance(key, str) and key.startswith("A") and key in offered],
+        })
+    return {"hotel": hotel if isinstance(hotel, Hotel) else None, "days": days, "tip": clean(data.get("tip") or "")}
+
+
+def render_plan(trip, plan):
+    """The chatbot's text rendering of a parsed plan."""
+    lines = [f"Trip Plan for {trip['destination']} (Duration: {trip['days']} days, Budget: INR {trip['budget']:.0f}):", ""]
+    hotel = plan["hotel"]
+    if hotel is not None:
+        lines += [f"Stay: {hotel.name} (INR {hotel.price_per_night:.0f}/night, rating {hotel.rating:.1f})", ""]
+    lines.append("Detailed Itinerary:")
+    for day in plan["days"]:
+        lines.append(f"Day {day['day']}:")
+        lines += [f"  {time.capitalize()}: {day[time]}" for time in ("morning", "afternoon", "evening") if day[time]]
+        if day["activities"]:
+            lines.append("  Book: " + ", ".join(f"{activity.name} (INR {activity.price:.0f})" for activity in day["activities"]))
+        lines.append("")
+    if plan["tip"]:
+        lines += [f"Tip: {plan['tip']}", ""]
+    lines.append("Enjoy your trip!")
+    return "\n".join(lines)
@@ -0,0 +1,305 @@
+"""
+Destination recommendations from booking and review history.
+
+Each user gets a weight per destination from their bookings (hotel,
+activity or flight; cancelled ones don't count) and reviews:
+
+    weight = log1p(BOOKING_WEIGHT x bookings + REVIEW_WEIGHTS[rating] ...)
+
+and destinations are compared by item-item co-occurrence,
+
+    C[a, b] = sum over users of weight[a] x weight[b]
+    similarity(a, b) = C[a, b] / sqrt(C[a, a] x C[b, b])    (cosine)
+
+A destination's list is its most similar destinations; a user's list
+scores every destination by sum(weight[a] x similarity(a, b)) over what the
+user has booked or reviewed, leaving those out. Users with no history get
+the "popular" list. Lists are stored as Recommendation rows, so a request
+is one indexed lookup.
+
+`manage.py train_recommender` builds everything; with --incremental it
+reads only the bookings and reviews added since the last run, re-weights
+those users, applies the change to C and rewrites just their lists and
+the affected destinations' (see `update`). The weights, C and the watermarks live in
+RECOMMENDER_STATE_PATH between runs. Cancellations, edits and archived
+rows are picked up by the next full run.
+"""
+import logging
+import os
+from collections import defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from .models import Booking, Destination, Recommendation, Review
+
+logger = logging.getLogger(__name__)
+
+RECOMMENDER_STATE_PATH = getattr(settings, "RECOMMENDER_STATE_PATH", os.path.join(settings.BASE_DIR, "recommender.npz"))
+RECOMMENDATIONS_TOP_K = getattr(settings, "RECOMMENDATIONS_TOP_K", 10)
+BOOKING_WEIGHT = 1.0
+REVIEW_WEIGHTS = {1: -2.0, 2: -1.0, 3: 0.5, 4: 1.0, 5: 1.5}
+
+PAIR_SHIFT = 32  # C is keyed by (a << PAIR_SHIFT) | b on destination ids
+
+
+class State:
+    """User weights (COO, sorted by user) and co-occurrence counts (sorted pair keys)."""
+
+    def __init__(self, users, destinations, weights, pairs, counts, booking_id=0, review_id=0):
+        self.users, self.destinations, self.weights = users, destinations, weights
+        self.pairs, self.counts = pairs, counts
+        self.booking_id, self.review_id = int(booking_id), int(review_id)
+
+    @classmethod
+    def load(cls, path=None):
+        with np.load(path or RECOMMENDER_STATE_PATH) as data:
+            return cls(**{name: data[name] for name in data.files})
+
+    def save(self, path=None):
+        path = path or RECOMMENDER_STATE_PATH
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        temporary = path + ".tmp.npz"
+        np.savez(temporary, users=self.users, destinations=self.destinations, weights=self.weights,
+                 pairs=self.pairs, counts=self.counts, booking_id=self.booking_id, review_id=self.review_id)
+        os.replace(temporary, path)
+
+    def vectors(self):
+        return by_user(self.users, self.destinations, self.weights)
+
+
+def by_user(users, destinations, weights):
+    """{user id: (destination ids, weights)} from COO arrays sorted by user."""
+    starts = np.flatnonzero(np.r_[True, users[1:] != users[:-1]]) if len(users) else []
+    bounds = list(starts) + [len(users)]
+    return {int(users[lo]): (destinations[lo:hi], weights[lo:hi]) for lo, hi in zip(bounds[:-1], bounds[1:])}
+
+
+def interactions(user_ids=None):
+    """{user id: {destination id: weight}} for the given users (default: all)."""
+    bookings = Booking.objects.exclude(status="cancelled")
+    reviews = Review.objects.all()
+    if user_ids is not None:
+        bookings, reviews = bookings.filter(user_id__in=user_ids), reviews.filter(user_id__in=user_ids)
+    by_name = {}
+    for destination_id, name in Destination.objects.order_by("-id").values_list("id", "name"):
+        by_name[name.lower()] = destination_id  # flights name their destination; the oldest match wins
+    raw = defaultdict(lambda: defaultdict(float))
+    rows = bookings.values_list("user_id", "hotel__destination_id", "activity__destination_id", "flight__destination")
+    for user_id, hotel_destination, activity_destination, flight_destination in rows.iterator(chunk_size=5000):
+        destination_id = hotel_destination or activity_destination or by_name.get((flight_destination or "").lower())
+        if destination_id:
+            raw[user_id][destination_id] += BOOKING_WEIGHT
+    for user_id, destination_id, rating in reviews.values_list("user_id", "destination_id", "rating").iterator(
+            chunk_size=5000):
+        raw[user_id][destination_id] += REVIEW_WEIGHTS.get(rating, 0.0)
+    return {
+        user_id: {destination_id: float(np.log1p(value)) for destination_id, value in scores.items() if value > 0}
+        for user_id, scores in raw.items()
+    }
+
+
+def pair_products(vectors, sign=1.0):
+    """Co-occurrence contributions (pair keys, values) of {user: (destinations, weights)}."""
+    keys, values = [], []
+    for destinations, weights in vectors.values():
+        if not len(destinations):
+            continue
+        destinations = np.asarray(destinations, dtype=np.int64)
+        weights = np.asarray(weights, dtype=np.float64)
+        keys.append(((destinations[:, None] << PAIR_SHIFT) | destinations[None, :]).ravel())
+        values.append(sign * np.outer(weights, weights).ravel())
+    if not keys:
+        return np.zeros(0, dtype=np.int64), np.zeros(0)
+    return np.concatenate(keys), np.concatenate(values)
+
+
+def accumulate(keys, values):
+    """Sum values per key; returns sorted unique keys and their non-zero totals."""
+    unique, inverse = np.unique(keys, return_inverse=True)
+    totals = np.bincount(inverse, weights=values, minlength=len(unique))
+    keep = np.abs(totals) > 1e-9
+    return unique[keep], totals[keep]
+
+
+def as_arrays(weights_by_user):
+    rows = sorted((user_id, destination_id, weight) for user_id, scores in weights_by_user.items()
+                  for destination_id, weight in scores.items())
+    users = np.array([row[0] for row in rows], dtype=np.int64)
+    destinations = np.array([row[1] for row in rows], dtype=np.int64)
+    return users, destinations, np.array([row[2] for row in rows], dtype=np.float64)
+
+
+class Similarity:
+    """Cosine similarities as CSR rows over the destinations in C (diagonal left out)."""
+
+    def __init__(self, pairs, counts):
+        rows = pairs >> PAIR_SHIFT
+        columns = pairs & ((1 << PAIR_SHIFT) - 1)
+        diagonal = rows == columns
+        self.ids = rows[diagonal]  # sorted; every destination in C has C[a, a] > 0
+        norms = np.sqrt(counts[diagonal])
+        self.position = {destination_id: i for i, destination_id in enumerate(self.ids.tolist())}
+        if not len(self.ids):
+            self.columns, self.values, self.indptr = np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(1, dtype=np.int64)
+            return
+        row_positions = np.minimum(np.searchsorted(self.ids, rows), len(self.ids) - 1)
+        column_positions = np.minimum(np.searchsorted(self.ids, columns), len(self.ids) - 1)
+        # Updates are applied as floating-point deltas, so drop pairs that outlived a diagonal.
+        keep = ~diagonal & (self.ids[row_positions] == rows) & (self.ids[column_positions] == columns)
+        row_positions, self.columns = row_positions[keep], column_positions[keep]
+        self.values = counts[keep] / (norms[row_positions] * norms[self.columns])
+        self.indptr = np.searchsorted(row_positions, np.arange(len(self.ids) + 1))
+
+    def row(self, destination_id):
+        """(neighbour positions, similarities) for a destination id."""
+        i = self.position.get(destination_id)
+        if i is None:
+            return self.columns[:0], self.values[:0]
+        lo, hi = self.indptr[i], self.indptr[i + 1]
+        return self.columns[lo:hi], self.values[lo:hi]
+
+    def neighbours(self, destination_ids):
+        found = set()
+        for destination_id in destination_ids:
+            found.update(self.ids[self.row(destination_id)[0]].tolist())
+        return found
+
+    def top(self, positions, scores, k):
+        if not len(positions):
+            return []
+        order = np.lexsort((self.ids[positions], -scores))[:k]
+        return [{"id": int(self.ids[positions[i]]), "score": round(float(scores[i]), 4)}
+                for i in order if scores[i] > 0]
+
+
+def for_destination(similarity, destination_id, k=RECOMMENDATIONS_TOP_K):
+    return similarity.top(*similarity.row(destination_id), k)
+
+
+def for_user(similarity, destinations, weights, k=RECOMMENDATIONS_TOP_K):
+    columns, scores = [], []
+    for destination_id, weight in zip(destinations.tolist(), weights.tolist()):
+        neighbours, similarities = similarity.row(destination_id)
+        columns.append(neighbours)
+        scores.append(weight * similarities)
+    if not columns:
+        return []
+    totals = np.bincount(np.concatenate(columns), weights=np.concatenate(scores), minlength=len(similarity.ids))
+    seen = [similarity.position[d] for d in destinations.tolist() if d in similarity.position]
+    totals[seen] = 0
+    candidates = np.flatnonzero(totals > 0)
+    return similarity.top(candidates, totals[candidates], k)
+
+
+def popular(state, k=RECOMMENDATIONS_TOP_K):
+    if not len(state.destinations):
+        return []
+    ids, totals = accumulate(state.destinations, state.weights)
+    order = np.lexsort((ids, -totals))[:k]
+    return [{"id": int(ids[i]), "score": round(float(totals[i]), 4)} for i in order]
+
+
+def store(kind, lists):
+    """Upsert {key: recommendations} for a kind; empty lists delete the row."""
+    rows = [Recommendation(kind=kind, key=key, destinations=items) for key, items in lists.items() if items]
+    empty = [key for key, items in lists.items() if not items]
+    with transaction.atomic():
+        Recommendation.objects.bulk_create(
+            rows, batch_size=1000, update_conflicts=True,
+            unique_fields=["kind", "key"], update_fields=["destinations", "updated_at"],
+        )
+        if empty:
+            Recommendation.objects.filter(kind=kind, key__in=empty).delete()
+
+
+def watermarks():
+    return (Booking.objects.order_by("-id").values_list("id", flat=True).first() or 0,
+            Review.objects.order_by("-id").values_list("id", flat=True).first() or 0)
+
+
+def train():
+    """Rebuild the state and every stored list from all bookings and reviews."""
+    booking_id, review_id = watermarks()
+    users, destinations, weights = as_arrays(interactions())
+    vectors = by_user(users, destinations, weights)
+    state = State(users, destinations, weights, *accumulate(*pair_products(vectors)), booking_id, review_id)
+    similarity = Similarity(state.pairs, state.counts)
+    with transaction.atomic():
+        Recommendation.objects.all().delete()
+        store(Recommendation.DESTINATION, {
+            destination_id: for_destination(similarity, destination_id) for destination_id in similarity.ids.tolist()
+        })
+        store(Recommendation.USER, {
+            user_id: for_user(similarity, *vector) for user_id, vector in vectors.items()
+        })
+        store(Recommendation.POPULAR, {0: popular(state)})
+    state.save()
+    return {"users": len(vectors), "destinations": len(similarity.ids)}
+
+
+def update():
+    """
+    Apply the bookings and reviews added since the last run. Destination
+    lists are rewritten where similarities can have changed (the
+    destinations the changed users touch, and their neighbours); user
+    lists only for the changed users. Other users keep lists scored with
+    the similarities of their last refresh until the next full run.
+    """
+    try:
+        state = State.load()
+    except FileNotFoundError:
+        logger.info("No recommender state at %s; training from scratch.", RECOMMENDER_STATE_PATH)
+        return train()
+    booking_id, review_id = watermarks()
+    changed = set(Booking.objects.filter(id__gt=state.booking_id, id__lte=booking_id).values_list("user_id", flat=True))
+    changed |= set(Review.objects.filter(id__gt=state.review_id, id__lte=review_id).values_list("user_id", flat=True))
+    if not changed:
+        return {"users": 0, "destinations": 0}
+
+    vectors = state.vectors()
+    before = {user_id: vectors[user_id] for user_id in changed if user_id in vectors}
+    fresh = interactions(changed)
+    after = {user_id: (np.array(list(scores), dtype=np.int64), np.array(list(scores.values())))
+             for user_id, scores in fresh.items()}
+    old_keys, old_values = pair_products(before, sign=-1.0)
+    new_keys, new_values = pair_products(after)
+    pairs, counts = accumulate(np.concatenate([state.pairs, old_keys, new_keys]),
+                               np.concatenate([state.counts, old_values, new_values]))
+
+    vectors = {user_id: vector for user_id, vector in vectors.items() if user_id not in changed}
+    vectors.update(after)
+    users, destinations, weights = as_arrays({
+        user_id: dict(zip(ids.tolist(), values.tolist())) for user_id, (ids, values) in vectors.items()
+    })
+    state = State(users, destinations, weights, pairs, counts, booking_id, review_id)
+    similarity = Similarity(pairs, counts)
+
+    touched = set()
+    for ids, _ in list(before.values()) + list(after.values()):
+        touched.update(ids.tolist())
+    rows = touched | similarity.neighbours(touched)
+    with transaction.atomic():
+        store(Recommendation.DESTINATION, {destination_id: for_destination(similarity, destination_id)
+                                           for destination_id in rows})
+        store(Recommendation.USER, {
+            user_id: for_user(similarity, *vectors[user_id]) if user_id in vectors else []
+            for user_id in changed
+        })
+        store(Recommendation.POPULAR, {0: popular(state)})
+    state.save()
+    return {"users": len(changed), "destinations": len(rows)}
+
+
+def recommendations(user_id=None, destination_id=None):
+    """Stored list for a destination or a user (falling back to popular), as (kind, items)."""
+    if destination_id is not None:
+        lookups = [(Recommendation.DESTINATION, destination_id)]
+    else:
+        lookups = ([(Recommendation.USER, user_id)] if user_id else []) + [(Recommendation.POPULAR, 0)]
+    for kind, key in lookups:
+        items = Recommendation.objects.filter(kind=kind, key=key).values_list("destinations", flat=True).first()
+        if items:
+            return kind, items
+    return lookups[-1][0], []
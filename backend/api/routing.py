@@ -0,0 +1,127 @@
+"""
+Itinerary routing: which attractions to visit on which day, and in what order.
+
+Attractions with coordinates are split into one geographic cluster per day
+with a sweep around their centroid (balanced cluster sizes, split at the
+widest angular gap so a neighbourhood is not cut in two). Each day's visits
+are then ordered with nearest-neighbour and improved with 2-opt. Every
+step works on a haversine distance matrix computed once with numpy, so a
+few hundred candidates are scheduled in milliseconds (see
+`manage.py bench_scheduler`).
+"""
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+TWO_OPT_MAX_PASSES = 1000
+
+
+def haversine_matrix(lat, lon):
+    """Pairwise great-circle distances in km for arrays of latitudes/longitudes in degrees."""
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lon = np.radians(np.asarray(lon, dtype=np.float64))
+    dlat = lat[:, None] - lat[None, :]
+    dlon = lon[:, None] - lon[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def path_length(dist, path):
+    path = np.asarray(path)
+    return float(dist[path[:-1], path[1:]].sum()) if len(path) > 1 else 0.0
+
+
+def sweep_clusters(lat, lon, k):
+    """
+    Split points into k groups of near-equal size by sorting them by angle
+    around their centroid, starting at the widest gap between neighbours.
+    Returns a list of k index arrays.
+    """
+    n = len(lat)
+    k = max(1, min(k, n))
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    clat, clon = lat.mean(), lon.mean()
+    angles = np.arctan2(lat - clat, (lon - clon) * np.cos(np.radians(clat)))
+    order = np.argsort(angles)
+    if n > 1:
+        gaps = np.diff(np.append(angles[order], angles[order[0]] + 2 * np.pi))
+        order = np.roll(order, -(int(np.argmax(gaps)) + 1))
+    return [group for group in np.array_split(order, k)]
+
+
+def nearest_neighbour_path(dist, nodes, start=None):
+    """Greedy open path through `nodes` (indices into dist), starting at `start` or the first node."""
+    nodes = list(nodes)
+    if len(nodes) <= 2:
+        return nodes
+    sub = dist[np.ix_(nodes, nodes)]
+    visited = np.zeros(len(nodes), dtype=bool)
+    current = nodes.index(start) if start is not None else 0
+    path = [current]
+    visited[current] = True
+    for _ in range(len(nodes) - 1):
+        row = np.where(visited, np.inf, sub[current])
+        current = int(np.argmin(row))
+        visited[current] = True
+        path.append(current)
+    return [nodes[i] for i in path]
+
+
+def two_opt(dist, path, max_passes=TWO_OPT_MAX_PASSES):
+    """
+    Improve an open path with 2-opt moves. Each pass evaluates every move at
+    once on the distance matrix and applies the best one.
+    """
+    path = np.asarray(path)
+    m = len(path)
+    if m < 4:
+        return path.tolist()
+    i_idx, j_idx = np.triu_indices(m - 1, k=1)
+    for _ in range(max_passes):
+        a, b = path[:-1], path[1:]
+        # Reverse path[i+1..j]: edges (a_i, b_i), (a_j, b_j) become (a_i, a_j), (b_i, b_j).
+        delta = (dist[a[i_idx], a[j_idx]] + dist[b[i_idx], b[j_idx]]
+                 - dist[a[i_idx], b[i_idx]] - dist[a[j_idx], b[j_idx]])
+        # Reversing a head path[..i] or a tail path[i+1..] only swaps one edge.
+        head = dist[path[0], b] - dist[a, b]
+        tail = dist[a, path[-1]] - dist[a, b]
+        moves = (delta, head, tail)
+        kind = int(np.argmin([move.min() for move in moves]))
+        best = int(np.argmin(moves[kind]))
+        if moves[kind][best] >= -1e-9:
+            break
+        if kind == 0:
+            i, j = i_idx[best], j_idx[best]
+            path[i + 1:j + 1] = path[i + 1:j + 1][::-1]
+        elif kind == 1:
+            path[:best + 1] = path[:best + 1][::-1]
+        else:
+            path[best + 1:] = path[best + 1:][::-1]
+    return path.tolist()
+
+
+def route(dist, nodes):
+    """Short open path visiting every node once."""
+    nodes = list(nodes)
+    if len(nodes) < 3:
+        return nodes
+    sub = dist[np.ix_(nodes, nodes)]
+    # Start from the node farthest from the group's medoid: open paths do best from an end.
+    medoid = int(np.argmin(sub.sum(axis=1)))
+    start = nodes[int(np.argmax(sub[medoid]))]
+    return two_opt(dist, nearest_neighbour_path(dist, nodes, start))
+
+
+def plan_days(lat, lon, days):
+    """
+    Assign every point to one of `days` days and order each day's visits.
+    Returns a list of `days` lists of point indices (some may be empty when
+    there are fewer points than days).
+    """
+    n = len(lat)
+    if n == 0:
+        return [[] for _ in range(days)]
+    dist = haversine_matrix(lat, lon)
+    groups = sweep_clusters(lat, lon, days)
+    routes = [route(dist, group.tolist()) for group in groups]
+    return routes + [[] for _ in range(days - len(routes))]
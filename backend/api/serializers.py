@@ -2,7 +2,7 @@ from rest_framework import serializers
 from django.contrib.auth.models import User
 from .models import (
     UserProfile, Destination, Hotel, Flight, 
-    Activity, Booking, Review, ChatMessage
+    Activity, Booking, Review, ChatMessage, Trip, TripDay
 )
 
 class UserSerializer(serializers.ModelSerializer):
@@ -67,6 +67,19 @@ class ChatMessageSerializer(serializers.ModelSerializer):
         model = ChatMessage
         fields = '__all__'
 
+class TripDaySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TripDay
+        fields = ('number', 'slots')
+
+class TripSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Trip
+        exclude = ('user',)
+
+class TripDetailSerializer(TripSerializer):
+    itinerary = TripDaySerializer(many=True, read_only=True)
+
 # Registration Serializer
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password2 = serializers.CharField(style={'input_type': 'password'}, write_only=True)
@@ -0,0 +1,176 @@
+from types import SimpleNamespace
+
+from django.conf import settings
+from rest_framework.throttling import SimpleRateThrottle
+
+# Units each kind of request consumes from its throttle budget. Rates in
+# REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"] are expressed in these units, so an
+# LLM-backed trip plan uses up a budget much faster than a greeting turn.
+THROTTLE_COSTS = {
+    "chat_turn": 1,
+    "trip_plan": 20,
+    "password_hash": 1,
+}
+THROTTLE_COSTS.update(getattr(settings, "THROTTLE_COSTS", {}))
+
+
+class CostWeightedRateThrottle(SimpleRateThrottle):
+    """
+    Sliding-window throttle stored in the shared cache. The history is a list
+    of [timestamp, cost] pairs, newest first; a request is allowed while the
+    cost of everything in the window plus its own cost fits in the rate.
+    """
+    ident_kind = "user"  # "user" falls back to the client IP for anonymous requests
+    cost_key = "chat_turn"
+
+    def get_cost(self, request, view):
+        return THROTTLE_COSTS.get(self.cost_key, 1)
+
+    def get_ident_value(self, request):
+        if self.ident_kind == "user" and request.user and request.user.is_authenticated:
+            return f"user-{request.user.pk}"
+        return f"ip-{self.get_ident(request)}"
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {"scope": self.scope, "ident": self.get_ident_value(request)}
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return True
+        return self.charge(key, self.get_cost(request, view))
+
+    def charge(self, key, cost):
+        """Add `cost` to the history at cache key `key` if the rate allows it."""
+        self.key = key
+        self.cost = cost
+        self.history = self.cache.get(self.key, [])
+        self.now = self.timer()
+
+        while self.history and self.history[-1][0] <= self.now - self.duration:
+            self.history.pop()
+        self.used = sum(cost for _, cost in self.history)
+        if self.used + self.cost > self.num_requests:
+            return self.throttle_failure()
+        return self.throttle_success()
+
+    def throttle_success(self):
+        self.history.insert(0, [self.now, self.cost])
+        self.cache.set(self.key, self.history, self.duration)
+        return True
+
+    def wait(self):
+        """Seconds until enough of the window has expired to admit this request's cost."""
+        if self.cost > self.num_requests:
+            return None
+        excess = self.used + self.cost - self.num_requests
+        for timestamp, cost in reversed(self.history):
+            excess -= cost
+            if excess <= 0:
+                return max(0, timestamp + self.duration - self.now)
+        return self.duration
+
+
+def chat_turn_cost(session_state, message):
+    """
+    A chat turn answered from the state machine is cheap; a turn that
+    completes the dialog (the last answer, or a free-form request that fills
+    every slot at once) generates a trip plan and possibly an LLM call.
+    """
+    from .chatbot import Chatbot
+    bot = Chatbot.from_dict(session_state or {})
+    if isinstance(message, str) and bot.completes_trip(message):
+        return THROTTLE_COSTS["trip_plan"]
+    return THROTTLE_COSTS["chat_turn"]
+
+
+class ChatbotCostMixin:
+    """Charges each chat turn by `chat_turn_cost`."""
+    def get_cost(self, request, view):
+        return chat_turn_cost(request.session.get("chatbot_state"), request.data.get("message", ""))
+
+
+class ChatbotUserThrottle(ChatbotCostMixin, CostWeightedRateThrottle):
+    scope = "chatbot_user"
+
+
+class ChatbotIPThrottle(ChatbotCostMixin, CostWeightedRateThrottle):
+    scope = "chatbot_ip"
+    ident_kind = "ip"
+
+
+def throttle_chat_turn(user_id, remote_addr, headers, session_state, message):
+    """
+    Charge a chat turn made without a DRF request (the WebSocket) to the
+    chatbot throttles, as the HTTP endpoint would; `headers` are keyed in
+    lower case. Returns None if the turn is allowed, else the throttle that
+    refused it.
+    """
+    cost = chat_turn_cost(session_state, message)
+    client = SimpleNamespace(META={"REMOTE_ADDR": remote_addr}, headers=headers)
+    for throttle in (ChatbotUserThrottle(), ChatbotIPThrottle()):
+        if throttle.rate is None:
+            continue
+        ip = throttle.get_ident(client)
+        ident = f"user-{user_id}" if throttle.ident_kind == "user" and user_id else f"ip-{ip}"
+        if not throttle.charge(throttle.cache_format % {"scope": throttle.scope, "ident": ident}, cost):
+            return throttle
+    return None
+
+
+class TripPlanUserThrottle(CostWeightedRateThrottle):
+    scope = "trip_plan_user"
+    cost_key = "trip_plan"
+
+
+class TripPlanIPThrottle(CostWeightedRateThrottle):
+    scope = "trip_plan_ip"
+    ident_kind = "ip"
+    cost_key = "trip_plan"
+
+
+class LoginIPThrottle(CostWeightedRateThrottle):
+    scope = "login_ip"
+    ident_kind = "ip"
+    cost_key = "password_hash"
+
+
+class LoginAccountThrottle(CostWeightedRateThrottle):
+    """Limits attempts against a single account regardless of the client IP."""
+    scope = "login_account"
+    cost_key = "password_hash"
+
+    def get_cache_key(self, request, view):
+        email = str(request.data.get("email") or "").strip().lower()
+        if not email:
+            return None
+        return self.cache_format % {"scope": self.scope, "ident": email}
+
+
+class RegisterIPThrottle(CostWeightedRateThrottle):
+    scope = "register_ip"
+    ident_kind = "ip"
+    cost_key = "password_hash"
+
+
+class TripBatchCostMixin:
+    """A batch is charged one trip plan per trip it contains."""
+    def get_cost(self, request, view):
+        from .batch import read_batch_request
+        try:
+            return THROTTLE_COSTS["trip_plan"] * len(read_batch_request(request))
+        except ValueError:
+            # Rejected by the view with a 400; charge a single plan.
+            return THROTTLE_COSTS["trip_plan"]
+
+
+class TripBatchUserThrottle(TripBatchCostMixin, CostWeightedRateThrottle):
+    scope = "trip_batch_user"
+
+
+class TripBatchIPThrottle(TripBatchCostMixin, CostWeightedRateThrottle):
+    scope = "trip_batch_ip"
+    ident_kind = "ip"
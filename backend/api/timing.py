@@ -0,0 +1,217 @@
+"""
+Per-request timing spans and Prometheus metrics.
+
+TimingMiddleware (api/middleware.py) opens a RequestTimings for each
+request in a context variable. While it is open, time is added to spans:
+
+    db         SQL statements, through connection.execute_wrapper
+    http       outbound HTTP, per host, through requests.Session.send
+    llm        LLM completions (api/llm.py)
+    serialize  DRF serializers' to_representation and JSON rendering
+
+A span counts the time until its call returns, so queries run lazily
+while serializing count in both db and serialize. Work handed to other
+threads (batch plan workers, the chat history writer) is not attributed
+to the request.
+
+With SERVER_TIMING (default: DEBUG), and for staff users, each response
+gets a Server-Timing header with the spans, which browser dev tools show
+per request; it names upstream hosts, so it is not sent to everyone in
+production. Each request is also added to in-process
+histograms that `/metrics` serves in the Prometheus text format, so no
+client library is needed. Histograms are per process: scrape every
+worker, or run one worker per scrape target.
+"""
+import bisect
+import contextvars
+import functools
+import math
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.serializers import ListSerializer, Serializer
+
+SERVER_TIMING = getattr(settings, "SERVER_TIMING", settings.DEBUG)
+SPANS = ("db", "http", "llm", "serialize")
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_current = contextvars.ContextVar("request_timings", default=None)
+_open = contextvars.ContextVar("open_spans", default=frozenset())
+
+
+class Histogram:
+    """A Prometheus histogram with labels, kept in memory."""
+    registry = []
+
+    def __init__(self, name, documentation, labelnames, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._values = {}  # label values -> [count per bucket..., count above the last bucket, sum]
+        self._lock = threading.Lock()
+        Histogram.registry.append(self)
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(labels)
+            if counts is None:
+                counts = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            values = sorted((labels, list(counts)) for labels, counts in self._values.items())
+        for labels, counts in values:
+            pairs = [f'{name}="{escape(value)}"' for name, value in zip(self.labelnames, labels)]
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else repr(float(bound))
+                bucket = ",".join(pairs + [f'le="{le}"'])
+                lines.append(f"{self.name}_bucket{{{bucket}}} {cumulative}")
+            suffix = f"{{{','.join(pairs)}}}" if pairs else ""
+            lines.append(f"{self.name}_sum{suffix} {counts[-1]!r}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return "\n".join(lines)
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+REQUEST_SECONDS = Histogram("http_request_duration_seconds", "Time to produce each response.",
+                            ("view", "method", "status"), TIME_BUCKETS)
+SPAN_SECONDS = Histogram("http_request_span_seconds", "Time each request spent in each span.",
+                         ("view", "span"), TIME_BUCKETS)
+DB_QUERIES = Histogram("http_request_db_queries", "SQL statements run by each request.", ("view",), QUERY_BUCKETS)
+OUTBOUND_SECONDS = Histogram("outbound_http_duration_seconds", "Outbound HTTP calls by host.", ("host",), TIME_BUCKETS)
+
+
+def expose():
+    """Every histogram in the Prometheus text format."""
+    return "\n".join(histogram.expose() for histogram in Histogram.registry) + "\n"
+
+
+class RequestTimings:
+    """Seconds and calls per span, and per host for outbound HTTP, of one request."""
+
+    def __init__(self):
+        self.seconds = dict.fromkeys(SPANS, 0.0)
+        self.calls = dict.fromkeys(SPANS, 0)
+        self.hosts = {}  # host -> [calls, seconds]
+        self._lock = threading.Lock()
+
+    def add(self, span, seconds, host=None):
+        with self._lock:
+            self.seconds[span] = self.seconds.get(span, 0.0) + seconds
+            self.calls[span] = self.calls.get(span, 0) + 1
+            if host is not None:
+                totals = self.hosts.setdefault(host, [0, 0.0])
+                totals[0] += 1
+                totals[1] += seconds
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.add("db", time.perf_counter() - start)
+
+    def header(self, total):
+        """Server-Timing value: total, then each span that was entered, then each HTTP host."""
+        entries = [f"total;dur={total * 1000:.1f}"]
+        for span in SPANS:
+            if self.calls[span]:
+                entries.append(f'{span};dur={self.seconds[span] * 1000:.1f};desc="{self.calls[span]} calls"')
+        for host, (calls, seconds) in sorted(self.hosts.items()):
+            entries.append(f'http-{host};dur={seconds * 1000:.1f};desc="{calls} calls"')
+        return ", ".join(entries)
+
+    def observe(self, view, method, status, total):
+        REQUEST_SECONDS.observe(total, view, method, str(status))
+        for span in SPANS:
+            SPAN_SECONDS.observe(self.seconds[span], view, span)
+        DB_QUERIES.observe(self.calls["db"], view)
+
+
+def start(timings):
+    """Make `timings` the current request's; returns a token for `stop`."""
+    return _current.set(timings)
+
+
+def stop(token):
+    _current.reset(token)
+
+
+class span:
+    """Add the time of a block to a span of the current request (if any); nested entries count once."""
+
+    def __init__(self, name, host=None):
+        self.name = name
+        self.host = host
+
+    def __enter__(self):
+        self.timings = _current.get()
+        if self.timings is None or self.name in _open.get():
+            self.timings = None
+            return self
+        self.token = _open.set(_open.get() | {self.name})
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.timings is not None:
+            self.timings.add(self.name, time.perf_counter() - self.start, self.host)
+            _open.reset(self.token)
+
+
+def timed(name, function):
+    """`function`, with its calls added to span `name`."""
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if _current.get() is None:
+            return function(*args, **kwargs)
+        with span(name):
+            return function(*args, **kwargs)
+    return wrapper
+
+
+def send(original):
+    """requests.Session.send, timed per host in every process and added to the request's http span."""
+    @functools.wraps(original)
+    def wrapper(session, request, **kwargs):
+        host = urlsplit(request.url).hostname or "unknown"
+        start = time.perf_counter()
+        try:
+            with span("http", host):
+                return original(session, request, **kwargs)
+        finally:
+            OUTBOUND_SECONDS.observe(time.perf_counter() - start, host)
+    return wrapper
+
+
+_installed = False
+_install_lock = threading.Lock()
+
+
+def install():
+    """Wrap outbound HTTP, serializers and JSON rendering once per process."""
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        requests.Session.send = send(requests.Session.send)
+        Serializer.to_representation = timed("serialize", Serializer.to_representation)
+        ListSerializer.to_representation = timed("serialize", ListSerializer.to_representation)
+        JSONRenderer.render = timed("serialize", JSONRenderer.render)
+        _installed = True
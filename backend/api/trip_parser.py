@@ -0,0 +1,183 @@
+"""
+One-shot trip request parsing.
+
+Extracts as many chatbot slots as possible from a single free-form message
+such as "5 days in Goa under 20000 by train, budget hotel, South Indian food,
+beaches", using local rules and a gazetteer built from the Destination table.
+No external calls are made.
+"""
+import re
+import threading
+import time
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Destination
+
+# The gazetteer is compiled once per process and rebuilt when a Destination
+# changes in this process, or at the latest after GAZETTEER_TTL seconds
+# (changes made by other processes).
+GAZETTEER_TTL = 300
+
+WORD_NUMBERS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "fourteen": 14,
+}
+_NUMBER = r"(\d+|" + "|".join(WORD_NUMBERS) + r")"
+
+DAYS_RE = re.compile(_NUMBER + r"\s*-?\s*(days?|nights?)\b", re.I)
+WEEKS_RE = re.compile(r"\b(?:a|one|" + _NUMBER + r")\s*-?\s*weeks?\b", re.I)
+WEEKEND_RE = re.compile(r"\bweekend\b", re.I)
+
+_AMOUNT = r"(\d[\d,]*(?:\.\d+)?)\s*(k|thousand|l|lakh|lakhs|lac)?"
+BUDGET_RE = re.compile(
+    r"(?:under|below|within|less than|up ?to|max(?:imum)?|budget(?: of| is)?|around|about|rs\.?|inr|₹)\s*" + _AMOUNT + r"\b",
+    re.I,
+)
+BUDGET_SUFFIX_RE = re.compile(_AMOUNT + r"\s*(?:rs\.?|inr|rupees)\b", re.I)
+BUDGET_UNIT_RE = re.compile(r"\b(\d[\d,]*(?:\.\d+)?)\s*(k|thousand|lakh|lakhs|lac)\b", re.I)
+BUDGET_CATEGORY_RE = re.compile(r"\b(low|medium|high)\s+budget\b", re.I)
+MULTIPLIERS = {"k": 1000, "thousand": 1000, "l": 100000, "lakh": 100000, "lakhs": 100000, "lac": 100000}
+
+TRANSPORT_RE = re.compile(r"\b(?:by|via|take a|taking a?)\s+(flight|air|plane|train|rail|car|road|bus)\b", re.I)
+TRANSPORT_WORD_RE = re.compile(r"\b(flight|flights|fly|train|bus)\b", re.I)
+TRANSPORT_ALIASES = {
+    "air": "flight", "plane": "flight", "fly": "flight", "flights": "flight",
+    "rail": "train", "road": "car",
+}
+
+HOTEL_RE = re.compile(r"\b(luxury|budget|boutique|cheap|5[- ]star|five[- ]star)\s+(?:hotels?|stays?|accommodation|resorts?|rooms?)\b", re.I)
+HOTEL_WORD_RE = re.compile(r"\b(hostels?|resorts?)\b", re.I)
+HOTEL_ALIASES = {"cheap": "budget", "5-star": "luxury", "5 star": "luxury", "five-star": "luxury",
+                 "five star": "luxury", "hostel": "budget", "hostels": "budget", "resort": "luxury", "resorts": "luxury"}
+
+FOOD_RE = re.compile(r"\b(north indian|south indian|continental|chinese|italian|seafood|street|vegetarian|vegan|veg|non[- ]veg|local)\s*(?:food|cuisine|dishes|meals)?\b", re.I)
+FOOD_HINT_RE = re.compile(r"\b(food|cuisine|dishes|meals|vegetarian|vegan)\b", re.I)
+
+ACTIVITY_KEYWORDS = {
+    "beach": "beaches", "beaches": "beaches",
+    "adventure": "adventure", "trek": "trekking", "trekking": "trekking", "hiking": "trekking",
+    "sightseeing": "sightseeing", "culture": "culture", "cultural": "culture", "heritage": "culture",
+    "history": "culture", "shopping": "shopping", "nightlife": "nightlife", "party": "nightlife",
+    "wildlife": "wildlife", "safari": "wildlife", "temple": "temples", "temples": "temples",
+    "museum": "museums", "museums": "museums", "water sports": "water sports", "scuba": "water sports",
+    "diving": "water sports", "yoga": "wellness", "spa": "wellness", "photography": "photography",
+}
+ACTIVITY_RE = re.compile(r"\b(" + "|".join(sorted(map(re.escape, ACTIVITY_KEYWORDS), key=len, reverse=True)) + r")\b", re.I)
+
+# Fallback when the destination is not in the gazetteer: "in Goa", "to New Delhi".
+DESTINATION_HINT_RE = re.compile(r"\b(?:in|to|visit|visiting|at|around)\s+([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+){0,2})")
+NOT_DESTINATIONS = frozenset({"South", "North", "Indian", "India", "The", "A", "My"})
+
+_gazetteer = None
+_gazetteer_built_at = 0.0
+_gazetteer_lock = threading.Lock()
+
+
+def _build_gazetteer():
+    names = {name.strip() for name in Destination.objects.values_list("name", flat=True) if name and name.strip()}
+    if not names:
+        return None, {}
+    canonical = {name.lower(): name for name in names}
+    pattern = r"\b(" + "|".join(re.escape(name) for name in sorted(canonical, key=len, reverse=True)) + r")\b"
+    return re.compile(pattern, re.I), canonical
+
+
+def get_gazetteer():
+    """Return (compiled regex, {lowercase name: canonical name}) for known destinations."""
+    global _gazetteer, _gazetteer_built_at
+    if _gazetteer is None or time.monotonic() - _gazetteer_built_at > GAZETTEER_TTL:
+        with _gazetteer_lock:
+            if _gazetteer is None or time.monotonic() - _gazetteer_built_at > GAZETTEER_TTL:
+                _gazetteer = _build_gazetteer()
+                _gazetteer_built_at = time.monotonic()
+    return _gazetteer
+
+
+@receiver([post_save, post_delete], sender=Destination)
+def invalidate_gazetteer(**kwargs):
+    global _gazetteer
+    _gazetteer = None
+
+
+def _to_number(token):
+    token = token.lower()
+    return WORD_NUMBERS[token] if token in WORD_NUMBERS else int(token)
+
+
+def _amount(number, unit):
+    value = float(number.replace(",", ""))
+    return value * MULTIPLIERS.get((unit or "").lower(), 1)
+
+
+def parse_destination(text):
+    pattern, canonical = get_gazetteer()
+    if pattern is not None:
+        match = pattern.search(text)
+        if match:
+            return canonical[match.group(1).lower()]
+    for match in DESTINATION_HINT_RE.finditer(text):
+        words = [word for word in match.group(1).split() if word not in NOT_DESTINATIONS]
+        if words:
+            return " ".join(words)
+    return None
+
+
+def parse_trip_request(text):
+    """
+    Return a dict with every chatbot slot found in `text`: budget, destination,
+    days, transportation, hotel_preference, food_preference and activities.
+    Slots that are not mentioned are left out.
+    """
+    slots = {}
+
+    match = DAYS_RE.search(text)
+    if match:
+        slots["days"] = _to_number(match.group(1))
+    else:
+        match = WEEKS_RE.search(text)
+        if match:
+            slots["days"] = 7 * (_to_number(match.group(1)) if match.group(1) else 1)
+        elif WEEKEND_RE.search(text):
+            slots["days"] = 2
+
+    # Day counts ("5 days") must not be read as an amount.
+    without_days = DAYS_RE.sub(" ", text)
+    match = (BUDGET_RE.search(without_days) or BUDGET_SUFFIX_RE.search(without_days)
+             or BUDGET_UNIT_RE.search(without_days))
+    if match:
+        slots["budget"] = _amount(match.group(1), match.group(2))
+    else:
+        match = BUDGET_CATEGORY_RE.search(text)
+        if match:
+            slots["budget"] = match.group(1).lower()
+
+    destination = parse_destination(text)
+    if destination:
+        slots["destination"] = destination
+
+    match = TRANSPORT_RE.search(text) or TRANSPORT_WORD_RE.search(text)
+    if match:
+        option = match.group(1).lower()
+        slots["transportation"] = TRANSPORT_ALIASES.get(option, option)
+
+    match = HOTEL_RE.search(text) or HOTEL_WORD_RE.search(text)
+    if match:
+        option = match.group(1).lower()
+        slots["hotel_preference"] = HOTEL_ALIASES.get(option, option)
+
+    if FOOD_HINT_RE.search(text) or re.search(r"\b(north|south) indian\b", text, re.I):
+        match = FOOD_RE.search(text)
+        if match:
+            slots["food_preference"] = match.group(1).lower()
+
+    activities = []
+    for match in ACTIVITY_RE.finditer(text):
+        activity = ACTIVITY_KEYWORDS[match.group(1).lower()]
+        if activity not in activities:
+            activities.append(activity)
+    if activities:
+        slots["activities"] = activities
+
+    return slots
@@ -17,6 +17,7 @@ router.register(r'activities', views.ActivityViewSet)
 router.register(r'bookings', views.BookingViewSet, basename='booking')
 router.register(r'reviews', views.ReviewViewSet)
 router.register(r'chat', views.ChatMessageViewSet, basename='chat')
+router.register(r'trips', views.TripViewSet, basename='trip')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -26,6 +27,7 @@ urlpatterns = [
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('register/', views.register_user, name='register'),
     path('login/', views.login, name='login'),
+    path('logout/', views.logout, name='logout'),
     
     # Custom endpoints
     path('trending-destinations/', views.DestinationViewSet.trending_destinations, name='trending-destinations'),
@@ -35,8 +37,13 @@ urlpatterns = [
     # Chatbot and Real-Time Data Endpoints
     path('chatbot/', views.chatbot_api, name='chatbot_api'),  # Session-based chatbot endpoint
     path('recommend_trip/', views.advanced_recommend_trip, name='advanced_recommend_trip'),
+    path('recommend_trip/batch/', views.batch_recommend_trip, name='batch_recommend_trip'),
+    path('optimize_trip/', views.optimize_trip, name='optimize_trip'),
     path('get_weather/', views.get_weather, name='get_weather'),
     path('generate_itinerary/', views.generate_itinerary, name='generate_itinerary'),
+    path('nearby/', views.nearby_places, name='nearby_places'),
+    path('recommendations/', views.recommendations, name='recommendations'),
+    path('similar/', views.similar_places, name='similar_places'),
 
     #path('', include(dynamic_homepage.urlpatterns)),
     path('fetch_homepage_data/', dynamic_homepage.fetch_homepage_data, name='fetch_homepage_data'),
@@ -0,0 +1,369 @@
+"""
+Text similarity search over destinations, hotels and activities.
+
+Each place's name and description (plus its destination, and a hotel's
+amenities) becomes a sparse TF-IDF vector over HASH_BUCKETS hashed tokens
+(crc32, so stable across processes). A randomized SVD of a sample of those
+vectors gives a VECTOR_DIMENSIONS projection (latent semantic analysis),
+so every place ends up as one dense float32 unit vector, and places that
+share related vocabulary end up close even when their exact words differ.
+
+Search is an inverted-file index over those vectors: spherical k-means
+splits them into about sqrt(N) clusters and rows are stored grouped by
+cluster, so a query scores the centroids, then only the rows of the
+PROBES nearest clusters (contiguous slices) with one matrix-vector product
+each. `manage.py bench_vector_search` reports queries per second and
+recall against an exhaustive scan.
+
+`manage.py build_vector_index` writes each build to its own directory
+under VECTOR_INDEX_PATH/builds (the vectors and projection as .npy files,
+which each process memory-maps, so workers share one copy through the
+page cache) and then replaces the CURRENT file naming the live build, so
+a reader sees either the old build or the new one, never a mix. Processes
+re-open the index when CURRENT changes (checked at most every
+VECTOR_INDEX_TTL seconds); the build before the current one is kept for
+readers still opening it, older ones are removed. Places added since the
+last build are not searchable until the next one.
+"""
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import zlib
+
+import numpy as np
+from django.conf import settings
+
+from .geo import KINDS, PLACE_MODELS, kind_codes
+
+logger = logging.getLogger(__name__)
+
+VECTOR_INDEX_PATH = getattr(settings, "VECTOR_INDEX_PATH", os.path.join(settings.BASE_DIR, "vector_index"))
+VECTOR_INDEX_TTL = 60
+KEEP_BUILDS = 2
+HASH_BUCKETS = 1 << 16
+VECTOR_DIMENSIONS = 256
+SVD_SAMPLE = 20000
+SVD_OVERSAMPLING = 16
+SVD_POWER_ITERATIONS = 2
+KMEANS_ITERATIONS = 10
+PROBES = 16
+MAX_RESULTS = 100
+
+TOKEN = re.compile(r"[a-z0-9]+")
+
+
+class SparseRows:
+    """Row-major sparse matrix (the TF-IDF vectors): row, column and value per entry."""
+
+    def __init__(self, rows, columns, values, shape):
+        self.rows, self.columns, self.values, self.shape = rows, columns, values, shape
+
+    def take(self, selected):
+        """The given rows (sorted positions), renumbered from 0."""
+        mask = np.zeros(self.shape[0], dtype=bool)
+        mask[selected] = True
+        keep = mask[self.rows]
+        renumber = np.cumsum(mask) - 1
+        return SparseRows(renumber[self.rows[keep]], self.columns[keep], self.values[keep],
+                          (len(selected), self.shape[1]))
+
+    def dot(self, dense, chunk=4096):
+        """self @ dense: each row's entries padded to the chunk's widest row, then one batched matmul."""
+        out = np.zeros((self.shape[0], dense.shape[1]), dtype=np.float32)
+        indptr = np.r_[0, np.cumsum(np.bincount(self.rows, minlength=self.shape[0]))]
+        for lo in range(0, self.shape[0], chunk):
+            hi = min(lo + chunk, self.shape[0])
+            start, end = indptr[lo], indptr[hi]
+            if start == end:
+                continue
+            rows = self.rows[start:end] - lo
+            slots = np.arange(start, end) - indptr[self.rows[start:end]]
+            width = int(slots.max()) + 1
+            columns = np.zeros((hi - lo, width), dtype=np.int64)
+            values = np.zeros((hi - lo, 1, width), dtype=np.float32)
+            columns[rows, slots] = self.columns[start:end]
+            values[rows, 0, slots] = self.values[start:end]
+            out[lo:hi] = np.matmul(values, dense[columns])[:, 0]
+        return out
+
+    def tdot(self, dense):
+        """self.T @ dense, one bincount per output column."""
+        return np.stack([
+            np.bincount(self.columns, weights=self.values * dense[self.rows, j], minlength=self.shape[1])
+            for j in range(dense.shape[1])
+        ], axis=1).astype(np.float32)
+
+
+def term_counts(texts):
+    """Hashed term counts as SparseRows, one row per text."""
+    rows, columns, values = [], [], []
+    for row, text in enumerate(texts):
+        hashes = [zlib.crc32(token.encode()) % HASH_BUCKETS for token in TOKEN.findall(text.lower()) if len(token) > 1]
+        buckets, counts = np.unique(np.array(hashes, dtype=np.int64), return_counts=True)
+        rows.append(np.full(len(buckets), row, dtype=np.int64))
+        columns.append(buckets)
+        values.append(counts.astype(np.float32))
+    if not rows:
+        return SparseRows(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32),
+                          (0, HASH_BUCKETS))
+    return SparseRows(np.concatenate(rows), np.concatenate(columns), np.concatenate(values),
+                      (len(texts), HASH_BUCKETS))
+
+
+def tfidf(counts, idf):
+    """Sublinear TF x IDF with unit-length rows."""
+    values = (np.log1p(counts.values) * idf[counts.columns]).astype(np.float32)
+    norms = np.sqrt(np.bincount(counts.rows, weights=values ** 2, minlength=counts.shape[0]))
+    values /= np.maximum(norms[counts.rows], 1e-12)
+    return SparseRows(counts.rows, counts.columns, values, counts.shape)
+
+
+def normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0).astype(np.float32, copy=False)
+
+
+def orthonormal(matrix):
+    return np.linalg.qr(matrix)[0].astype(np.float32)
+
+
+def fit_projection(matrix, dimensions, rng):
+    """Top right singular vectors (columns x dimensions) of a sparse matrix, by randomized SVD."""
+    width = min(dimensions + SVD_OVERSAMPLING, *matrix.shape)
+    basis = orthonormal(matrix.dot(rng.standard_normal((matrix.shape[1], width)).astype(np.float32)))
+    for _ in range(SVD_POWER_ITERATIONS):
+        basis = orthonormal(matrix.dot(matrix.tdot(basis)))
+    # B = basis.T @ matrix is width x columns; its right singular vectors come from the
+    # eigenvectors of the small B @ B.T, which avoids an SVD of the wide B itself.
+    transposed = matrix.tdot(basis)
+    eigenvalues, eigenvectors = np.linalg.eigh((transposed.T @ transposed).astype(np.float64))
+    order = np.argsort(eigenvalues)[::-1][:dimensions]
+    scale = np.sqrt(np.maximum(eigenvalues[order], 1e-12))
+    projection = np.zeros((matrix.shape[1], dimensions), dtype=np.float32)
+    projection[:, :len(order)] = (transposed @ eigenvectors[:, order].astype(np.float32)) / scale.astype(np.float32)
+    return projection
+
+
+def kmeans(vectors, clusters, rng, iterations=KMEANS_ITERATIONS, sample=50_000):
+    """Unit centroids from spherical k-means on (a sample of) unit vectors."""
+    if len(vectors) > sample:
+        vectors = vectors[np.sort(rng.choice(len(vectors), sample, replace=False))]
+    centroids = vectors[rng.choice(len(vectors), clusters, replace=False)].copy()
+    for _ in range(iterations):
+        labels = assign(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        empty = ~sums.any(axis=1)
+        sums[empty] = centroids[empty]
+        centroids = normalize(sums)
+    return centroids
+
+
+def assign(vectors, centroids, chunk=20_000):
+    return np.concatenate([np.argmax(vectors[lo:lo + chunk] @ centroids.T, axis=1)
+                           for lo in range(0, len(vectors), chunk)] or [np.zeros(0, dtype=np.int64)])
+
+
+def place_texts():
+    """(kind codes, ids, texts) for every place in the catalogue."""
+    kinds, ids, texts = [], [], []
+    rows = {
+        "destination": PLACE_MODELS["destination"].objects.values_list("id", "name", "description", "location"),
+        "hotel": PLACE_MODELS["hotel"].objects.values_list(
+            "id", "name", "description", "destination__name", "amenities"),
+        "activity": PLACE_MODELS["activity"].objects.values_list(
+            "id", "name", "description", "destination__name"),
+    }
+    for code, kind in enumerate(KINDS):
+        for place_id, *fields in rows[kind].iterator(chunk_size=5000):
+            kinds.append(code)
+            ids.append(place_id)
+            texts.append(" ".join(" ".join(map(str, field)) if isinstance(field, list) else str(field or "")
+                                  for field in fields))
+    return np.array(kinds, dtype=np.int8), np.array(ids, dtype=np.int64), texts
+
+
+class VectorIndex:
+    """
+    Unit vectors grouped by cluster (rows offsets[c]:offsets[c + 1] belong
+    to centroid c), each row's kind code and id, and what `encode` needs to
+    embed new text (idf and projection).
+    """
+
+    FILES = ("vectors", "projection")
+
+    def __init__(self, kinds, ids, idf, projection, vectors, centroids, offsets):
+        self.kinds, self.ids, self.idf, self.projection = kinds, ids, idf, projection
+        self.vectors, self.centroids, self.offsets = vectors, centroids, offsets
+        self.rows = {(int(kind), int(place_id)): row
+                     for row, (kind, place_id) in enumerate(zip(kinds.tolist(), ids.tolist()))}
+
+    @classmethod
+    def build(cls, kinds, ids, texts, seed=0):
+        if not len(texts):
+            empty = np.zeros((0, VECTOR_DIMENSIONS), dtype=np.float32)
+            return cls(kinds, ids, np.ones(HASH_BUCKETS, dtype=np.float32),
+                       np.zeros((HASH_BUCKETS, VECTOR_DIMENSIONS), dtype=np.float32), empty, empty, np.zeros(1, dtype=np.int64))
+        rng = np.random.default_rng(seed)
+        counts = term_counts(texts)
+        frequency = np.bincount(counts.columns, minlength=HASH_BUCKETS)
+        idf = (np.log((1 + len(texts)) / (1 + frequency)) + 1).astype(np.float32)
+        matrix = tfidf(counts, idf)
+        sample = np.sort(rng.choice(len(texts), min(SVD_SAMPLE, len(texts)), replace=False))
+        projection = fit_projection(matrix.take(sample), VECTOR_DIMENSIONS, rng)
+        vectors = normalize(matrix.dot(projection))
+        centroids = kmeans(vectors, max(1, min(int(np.sqrt(len(texts))), len(texts))), rng)
+        labels = assign(vectors, centroids)
+        order = np.argsort(labels, kind="stable")
+        offsets = np.searchsorted(labels[order], np.arange(len(centroids) + 1))
+        return cls(kinds[order], ids[order], idf, projection, vectors[order], centroids, offsets)
+
+    def save(self, path=None):
+        """Write a new build under `path` and make it the current one. Returns the build's directory."""
+        path = path or VECTOR_INDEX_PATH
+        build_id = str(time.time_ns())
+        directory = os.path.join(path, "builds", build_id)
+        os.makedirs(directory)
+        np.savez(os.path.join(directory, "items.npz"), kinds=self.kinds, ids=self.ids, idf=self.idf,
+                 centroids=self.centroids, offsets=self.offsets)
+        for name in self.FILES:
+            np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(getattr(self, name)))
+        with open(os.path.join(path, "CURRENT.tmp"), "w") as pointer:
+            pointer.write(build_id)
+        os.replace(os.path.join(path, "CURRENT.tmp"), os.path.join(path, "CURRENT"))
+        for old in sorted(os.listdir(os.path.join(path, "builds")), key=int)[:-KEEP_BUILDS]:
+            shutil.rmtree(os.path.join(path, "builds", old), ignore_errors=True)
+        return directory
+
+    @staticmethod
+    def current_build(path=None):
+        """Id of the live build under `path`; raises FileNotFoundError if there is none."""
+        with open(os.path.join(path or VECTOR_INDEX_PATH, "CURRENT")) as pointer:
+            return pointer.read().strip()
+
+    @classmethod
+    def load(cls, path=None, build_id=None):
+        path = path or VECTOR_INDEX_PATH
+        directory = os.path.join(path, "builds", build_id or cls.current_build(path))
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in cls.FILES}
+        with np.load(os.path.join(directory, "items.npz")) as items:
+            if len(items["ids"]) != len(arrays["vectors"]) or items["offsets"][-1] != len(items["ids"]):
+                raise ValueError(f"The similarity index build {directory} is incomplete.")
+            return cls(items["kinds"], items["ids"], items["idf"], arrays["projection"], arrays["vectors"],
+                       items["centroids"], items["offsets"])
+
+    def encode(self, text):
+        return normalize(tfidf(term_counts([text]), self.idf).dot(self.projection))[0]
+
+    def vector(self, kind, place_id):
+        row = self.rows.get((KINDS.index(kind), place_id))
+        return None if row is None else np.asarray(self.vectors[row])
+
+    def search(self, query, limit=10, codes=None, exclude=None, probes=PROBES):
+        """
+        (rows, cosine scores) of up to `limit` most similar rows, best first,
+        scanning the `probes` clusters nearest the query (all of them when
+        probes is None, or when the nearest ones hold too few matches).
+        """
+        clusters = np.argsort(-(self.centroids @ query))
+        if probes is not None and probes < len(clusters):
+            found = self.scan(query, clusters[:probes], limit, codes, exclude)
+            if len(found[0]) == limit:
+                return found
+        return self.scan(query, clusters, limit, codes, exclude)
+
+    def scan(self, query, clusters, limit, codes, exclude):
+        if len(clusters) == len(self.centroids):
+            rows = np.arange(len(self.ids))
+            scores = np.asarray(self.vectors @ query)
+        else:
+            # Each cluster is a contiguous slice of the memory-mapped file.
+            bounds = [(self.offsets[c], self.offsets[c + 1]) for c in clusters.tolist()]
+            rows = np.concatenate([np.arange(lo, hi) for lo, hi in bounds])
+            scores = np.concatenate([np.asarray(self.vectors[lo:hi]) @ query for lo, hi in bounds])
+        keep = np.ones(len(rows), dtype=bool)
+        if codes is not None:
+            keep &= np.isin(self.kinds[rows], codes)
+        if exclude is not None:
+            keep &= rows != exclude
+        rows, scores = rows[keep], scores[keep]
+        limit = min(limit, len(scores))
+        if limit <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        best = np.argpartition(-scores, limit - 1)[:limit]
+        best = best[np.lexsort((rows[best], -scores[best]))]
+        best = best[scores[best] > 0]
+        return rows[best], scores[best]
+
+
+def build_index(path=None):
+    index = VectorIndex.build(*place_texts())
+    index.save(path)
+    return index
+
+
+_index = None
+_index_build = None
+_index_checked_at = 0.0
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """The memory-mapped index, re-opened when build_vector_index has replaced it. None if never built."""
+    global _index, _index_build, _index_checked_at
+    if _index is not None and time.monotonic() - _index_checked_at < VECTOR_INDEX_TTL:
+        return _index
+    with _index_lock:
+        try:
+            build_id = VectorIndex.current_build()
+        except FileNotFoundError:
+            return _index
+        if _index is None or build_id != _index_build:
+            try:
+                _index, _index_build = VectorIndex.load(build_id=build_id), build_id
+            except (FileNotFoundError, ValueError) as e:
+                logger.warning("Could not open similarity index build %s: %s", build_id, e)
+                return _index  # e.g. removed by two rebuilds in a row; retry on the next call
+        _index_checked_at = time.monotonic()
+    return _index
+
+
+def similar(kind=None, place_id=None, text=None, limit=10, kinds=None):
+    """
+    Places most similar to a place (kind, place_id) or to free text, best
+    first, as dicts with kind, id, name and score. Raises ValueError for
+    bad input and LookupError when the index or the place is missing.
+    """
+    codes = kind_codes(kinds)
+    if not 1 <= limit <= MAX_RESULTS:
+        raise ValueError(f"limit must be between 1 and {MAX_RESULTS}.")
+    index = get_index()
+    if index is None:
+        raise LookupError("The similarity index has not been built yet (manage.py build_vector_index).")
+    exclude = None
+    if text:
+        query = index.encode(text)
+    else:
+        if kind not in KINDS:
+            raise ValueError(f"kind must be one of {', '.join(KINDS)}.")
+        query = index.vector(kind, place_id)
+        if query is None:
+            raise LookupError(f"{kind} {place_id} is not in the similarity index.")
+        exclude = index.rows[(KINDS.index(kind), place_id)]
+    rows, scores = index.search(query, limit, codes, exclude)
+
+    names = {}
+    for code, name in enumerate(KINDS):
+        ids = index.ids[rows][index.kinds[rows] == code].tolist()
+        if ids:
+            names[name] = dict(PLACE_MODELS[name].objects.filter(pk__in=ids).values_list("id", "name"))
+    results = []
+    for row, score in zip(rows.tolist(), scores.tolist()):
+        name, result_id = KINDS[index.kinds[row]], int(index.ids[row])
+        if result_id in names.get(name, {}):  # skip places deleted since the build
+            results.append({"kind": name, "id": result_id, "name": names[name][result_id],
+                            "score": round(float(score), 4)})
+    return results
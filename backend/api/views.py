@@ -1,29 +1,44 @@
 # api/views.py
 
 from django.shortcuts import render
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from rest_framework import viewsets, status, filters
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes, throttle_classes
 from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
+from django.db import transaction
 from django.db.models import Q
-from datetime import datetime
+from datetime import datetime, timedelta
+from django.utils import timezone
 from forex_python.converter import CurrencyRates
 import requests
+import json
 import logging
-#import openai
-from openai import OpenAI # Use OpenAI class from the new SDK
 from .models import (
     UserProfile, Destination, Hotel, Flight,
-    Activity, Booking, Review, ChatMessage
+    Activity, Booking, Review, ChatMessage, Trip, TripDay
 )
 from .serializers import (
     UserSerializer, UserProfileSerializer, DestinationSerializer,
     HotelSerializer, FlightSerializer, ActivitySerializer,
     BookingSerializer, ReviewSerializer, ChatMessageSerializer,
+    TripSerializer, TripDetailSerializer, TripDaySerializer,
     UserRegistrationSerializer
 )
+from . import budget_optimizer, fares, flight_search, geo, inventory, itinerary, recommender, timing, vector_index
+from .chatbot import Chatbot, activity_list
+from .trip_parser import parse_trip_request
+from .batch import generate_plans, read_batch_request
+from .chat_log import record_turn
+from .history import history_bounds, merged_history
+from .throttling import (
+    ChatbotUserThrottle, ChatbotIPThrottle, TripPlanUserThrottle, TripPlanIPThrottle,
+    TripBatchUserThrottle, TripBatchIPThrottle,
+    LoginIPThrottle, LoginAccountThrottle, RegisterIPThrottle
+)
 
 # -------------------------------
 # Production-Level Logging Setup
@@ -51,335 +66,58 @@ HEADERS = {
     "X-RapidAPI-Host": RAPIDAPI_HOST
 }
 
+
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
-# -------------------------------
-# Advanced Chatbot Class & Functions
-# -------------------------------
-class Chatbot:
-    """
-    Advanced stateful chatbot that collects user inputs step-by-step,
-    integrates with external APIs in real time, and generates a personalized trip plan.
-    Falls back to OpenAI if primary sources fail.
-    """
-    def __init__(self, state="greeting", data=None):
-        self.state = state
-        self.data = data or {}
-
-    def to_dict(self):
-        """Serialize chatbot state for session storage."""
-        return {"state": self.state, "data": self.data}
-
-    @classmethod
-    def from_dict(cls, data_dict):
-        """Reconstruct Chatbot instance from session data."""
-        return cls(state=data_dict.get("state", "greeting"), data=data_dict.get("data", {}))
-
-    def reset(self):
-        self.state = "greeting"
-        self.data = {}
-
-    def handle_input(self, user_input):
-        logger.info("Handling input. Current state: %s, User input: %s", self.state, user_input)
-        user_input = user_input.strip()
-        response = ""
-        try:
-            if self.state == "greeting":
-                response = "Hello! I'm your AI-powered tour planner. Would you like to plan a trip? (Yes/No)"
-                self.state = "confirm_trip"
-
-            elif self.state == "confirm_trip":
-                if user_input.lower() in ["yes", "y"]:
-                    response = ("Great! Please tell me your budget. Enter a numeric value (in INR) or type a category (low/medium/high).")
-                    self.state = "get_budget"
-                else:
-                    response = "Alright, feel free to ask me anytime when you want to plan a trip!"
-                    self.reset()
-
-            elif self.state == "get_budget":
-                try:
-                    budget = float(user_input)
-                    self.data["budget"] = budget
-                except ValueError:
-                    budget_categories = {"low": 5000, "medium": 15000, "high": 30000}
-                    self.data["budget"] = budget_categories.get(user_input.lower(), 10000)
-                response = "Which destination (city/place) in India would you like to visit? (e.g., Goa, Delhi, Jaipur)"
-                self.state = "get_destination"
-
-            elif self.state == "get_destination":
-                self.data["destination"] = user_input
-                response = "For how many days would you like the trip? (Enter a number)"
-                self.state = "get_days"
-
-            elif self.state == "get_days":
-                if user_input.isdigit():
-                    self.data["days"] = int(user_input)
-                    response = ("What mode of transportation do you prefer? Options: flight, train, car, bus or type 'any'.")
-                    self.state = "get_transportation"
-                else:
-                    response = "Please enter a valid number for the trip duration."
-
-            elif self.state == "get_transportation":
-                valid_options = ["flight", "train", "car", "bus", "any"]
-                if user_input.lower() in valid_options:
-                    self.data["transportation"] = user_input.lower()
-                    response = "Do you have any hotel preferences? (e.g., luxury, budget, boutique, any)"
-                    self.state = "get_hotel_preference"
-                else:
-                    response = "Please choose a valid transportation option: flight, train, car, bus, or 'any'."
-
-            elif self.state == "get_hotel_preference":
-                self.data["hotel_preference"] = user_input.lower()
-                response = "Any particular food preference or cuisine? (e.g., North Indian, South Indian, continental, any)"
-                self.state = "get_food_preference"
-
-            elif self.state == "get_food_preference":
-                self.data["food_preference"] = user_input.lower()
-                response = ("Lastly, do you have any specific activity interests? For example: adventure, sightseeing, culture, shopping, or type 'none'.")
-                self.state = "get_activities"
-
-            elif self.state == "get_activities":
-                if user_input.lower() == "none":
-                    self.data["activities"] = []
-                else:
-                    activities = [act.strip() for act in user_input.split(",") if act.strip()]
-                    self.data["activities"] = activities
-                response = "Thanks! Generating your personalized trip plan..."
-                self.state = "generating_plan"
-                trip_plan = self.generate_trip_plan(self.data)
-                response += "\n\n" + trip_plan
-                self.reset()
-
-            else:
-                response = "I'm sorry, I didn't understand that. Could you please repeat?"
-        except Exception as e:
-            logger.exception("Error in handle_input: %s", e)
-            response = "An error occurred while processing your input. Please try again later."
-        return response
-
-    def generate_trip_plan(self, data):
-        """
-        Production-level trip plan generation using real-time API data.
-        Falls back to GPT-4 if external API calls fail or return insufficient data.
-        """
-        try:
-            destination = data.get("destination", "Unknown").title()
-            # Convert budget to a numeric value
-            try:
-                budget = float(data.get("budget"))
-            except (ValueError, TypeError):
-                budget_categories = {"low": 5000, "medium": 15000, "high": 30000}
-                budget = budget_categories.get(data.get("budget", "").lower(), 10000)
-            days = int(data.get("days", 3))
-            transportation = data.get("transportation", "any")
-            hotel_pref = data.get("hotel_preference", "any")
-            food_pref = data.get("food_preference", "any")
-            activities = data.get("activities", [])
-
-            # Call external API methods
-            attractions = self.fetch_attractions(destination)
-            weather_info = self.fetch_weather(destination)
-            hotels = self.fetch_hotels(destination, hotel_pref)
-            restaurants = self.fetch_restaurants(destination, food_pref)
-            cost_breakdown = self.calculate_costs(budget, days, transportation, hotel_pref)
-            itinerary = self.create_itinerary(days, attractions, activities)
-
-            # If critical data is missing, trigger fallback
-            if not attractions or not hotels or not restaurants:
-                raise Exception("Insufficient data from external APIs.")
-
-            trip_plan = (
-                f"Trip Plan for {destination} (Duration: {days} days, Budget: INR {budget:.0f}):\n\n"
-                f"Weather Info: {weather_info}\n\n"
-                f"Transportation: {transportation.capitalize()}\n"
-                f"Estimated Cost Breakdown:\n{cost_breakdown}\n\n"
-                f"Detailed Itinerary:\n{itinerary}\n\n"
-                f"Recommended Hotels: {', '.join(hotels[:3])}\n"
-                f"Recommended Restaurants: {', '.join(restaurants[:3])}\n\n"
-                "Enjoy your trip!"
-            )
-            return trip_plan
-        except Exception as e:
-            logger.exception("Error generating trip plan using external APIs: %s", e)
-            return self.fallback_generate_trip_plan(data)
-
-
-    def fallback_generate_trip_plan(self, data):
-        """
-        Fallback mechanism using OpenAI's GPT-4 to generate a detailed day-wise itinerary.
-        This method is used if external API calls fail or return insufficient data.
-        """
-        try:
-            api_key = getattr(settings, "OPENAI_API_KEY", None)
-            if not api_key:
-                raise Exception("OpenAI API key not configured.")
-
-            client = OpenAI(api_key=api_key)  # Create a client instance
-
-            prompt = (
-                f"Generate a detailed day-wise itinerary for a trip with these details:\n"
-                f"- Destination: {data.get('destination', 'Unknown')}\n"
-                f"- Duration: {data.get('days', 3)} days\n"
-                f"- Budget: {data.get('budget', 'N/A')} INR\n"
-                f"- Transportation: {data.get('transportation', 'any')}\n"
-                f"- Hotel Preference: {data.get('hotel_preference', 'any')}\n"
-                f"- Food Preference: {data.get('food_preference', 'any')}\n"
-                f"- Specific Activities/Interests: {', '.join(data.get('activities', [])) or 'None'}\n\n"
-                "Provide a detailed, numbered, day-wise itinerary including suggestions for morning, afternoon, "
-                "and evening (attractions, dining, hotel check-ins, and leisure activities)."
-            )
-
-            response = client.chat.completions.create(
-                model="gpt-4o-2024-05-13",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.7,
-
-            )
-
-            trip_plan = response.choices[0].message.content.strip()
-            return trip_plan
-
-        except Exception as fallback_exception:
-            logger.exception("Fallback generate trip plan error: %s", fallback_exception)
-            return "An error occurred while generating the trip plan."
-
-
-    def fetch_attractions(self, destination):
-        """
-        Fetch attractions using the Mapples API. Falls back to a default if the call fails.
-        """
-        try:
-            MAPPLES_API_KEY = getattr(settings, "MAPPLES_API_KEY", None)
-            if not MAPPLES_API_KEY:
-                raise Exception("Mapples API key not configured.")
-            url = f"https://api.mapples.com/v1/places/search?query={destination}&apikey={MAPPLES_API_KEY}"
-            response = requests.get(url, timeout=5)
-            response.raise_for_status()
-            data = response.json()
-            attractions = [place.get("name") for place in data.get("results", []) if place.get("name")]
-            if not attractions:
-                attractions = [f"Famous landmark in {destination}"]
-            return attractions
-        except Exception as e:
-            logger.exception("Error fetching attractions: %s", e)
-            return []
-
-    def fetch_weather(self, destination):
-        """
-        Fetch current weather information for the destination from OpenWeather.
-        """
-        try:
-            WEATHER_API_KEY = getattr(settings, "WEATHER_API_KEY", None)
-            if not WEATHER_API_KEY:
-                raise Exception("Weather API key not configured.")
-            url = f"http://api.openweathermap.org/data/2.5/weather?q={destination}&appid={WEATHER_API_KEY}&units=metric"
-            response = requests.get(url, timeout=5)
-            response.raise_for_status()
-            data = response.json()
-            if "main" in data:
-                temp = data["main"]["temp"]
-                description = data["weather"][0]["description"].capitalize()
-                return f"Current weather in {destination}: {temp}°C, {description}."
-            else:
-                return "Weather information is unavailable."
-        except Exception as e:
-            logger.exception("Error fetching weather: %s", e)
-            return "Weather information is unavailable."
-
-    def fetch_hotels(self, destination, hotel_pref):
-        """
-        Fetch hotel recommendations based on destination and preference.
-        In production, replace simulated data with a real API call.
-        """
-        try:
-            if hotel_pref.lower() in ["luxury", "boutique"]:
-                return [f"{destination} Grand Palace", f"{destination} Royal Residency", f"{destination} Elite Suites"]
-            elif hotel_pref.lower() == "budget":
-                return [f"{destination} Comfort Inn", f"{destination} Budget Stay", f"{destination} City Lodge"]
-            else:
-                return [f"{destination} Central Hotel", f"{destination} Heritage Inn", f"{destination} Traveller's Rest"]
-        except Exception as e:
-            logger.exception("Error fetching hotels: %s", e)
-            return []
-
-    def fetch_restaurants(self, destination, food_pref):
-        """
-        Fetch restaurant recommendations based on destination and cuisine preference.
-        In production, replace simulated data with a real API call.
-        """
-        try:
-            if food_pref.lower() in ["north indian", "south indian", "continental"]:
-                return [f"{destination} {food_pref.title()} Delight", f"{destination} {food_pref.title()} Bistro", f"{destination} {food_pref.title()} Corner"]
-            else:
-                return [f"{destination} Food Plaza", f"{destination} Diner", f"{destination} Culinary Hub"]
-        except Exception as e:
-            logger.exception("Error fetching restaurants: %s", e)
-            return []
-
-    def calculate_costs(self, budget, days, transportation, hotel_pref):
-        """
-        Calculate a cost breakdown based on budget, days, transportation, and hotel preference.
-        """
-        try:
-            trans_cost = 0.2 * budget if transportation.lower() != "any" else 0.15 * budget
-            hotel_cost = 0.5 * budget if hotel_pref.lower() in ["luxury", "boutique"] else 0.3 * budget
-            food_cost = 0.1 * budget
-            activity_cost = 0.1 * budget
-            total = trans_cost + hotel_cost + food_cost + activity_cost
-            breakdown = (
-                f"Transportation: INR {trans_cost:.0f}\n"
-                f"Accommodation: INR {hotel_cost:.0f}\n"
-                f"Food: INR {food_cost:.0f}\n"
-                f"Activities: INR {activity_cost:.0f}\n"
-                f"Total: INR {total:.0f}"
-            )
-            return breakdown
-        except Exception as e:
-            logger.exception("Error calculating costs: %s", e)
-            return "Cost breakdown unavailable."
-
-    def create_itinerary(self, days, attractions, activities):
-        """
-        Create a detailed day-wise itinerary including morning, afternoon, and evening plans.
-        """
-        itinerary_lines = []
-        for day in range(1, days + 1):
-            itinerary_lines.append(f"Day {day}:")
-            # Morning plan: rotate through attractions or use default text
-            morning = attractions[(day - 1) % len(attractions)] if attractions else f"Explore landmarks in {self.data.get('destination', 'your destination')}"
-            itinerary_lines.append(f"  Morning: Visit {morning}.")
-            # Afternoon plan: suggest a lunch spot and include user activities if provided
-            lunch = f"{self.data.get('destination', 'Local')} Food Plaza" if self.data.get("food_preference") else "a local restaurant"
-            if activities:
-                extra = ", ".join(activities)
-                afternoon = f"Enjoy lunch at {lunch} and then experience: {extra}."
-            else:
-                afternoon = f"Enjoy lunch at {lunch} and visit local attractions."
-            itinerary_lines.append(f"  Afternoon: {afternoon}")
-            # Evening plan: suggest hotel check-in and dinner
-            hotel = f"{self.data.get('destination', 'Local')} Central Hotel" if self.data.get("hotel_preference") else "your chosen hotel"
-            itinerary_lines.append(f"  Evening: Check in at {hotel}, have dinner at a nearby restaurant, and relax.")
-            itinerary_lines.append("")  # Blank line for spacing
-        return "\n".join(itinerary_lines)
 
 
 # -------------------------------
-# End of Chatbot class and helper functions
+# Chatbot Endpoints (the Chatbot itself lives in api/chatbot.py)
 # -------------------------------
 
 @api_view(["POST"])
+@throttle_classes([TripPlanUserThrottle, TripPlanIPThrottle])
 def advanced_recommend_trip(request):
     try:
         data = request.data
-        bot = Chatbot()
+        if isinstance(data.get("message"), str):
+            # Free-form request; explicit fields take precedence over parsed ones.
+            data = {**parse_trip_request(data["message"]), **{k: v for k, v in data.items() if k != "message"}}
+        bot = Chatbot(user_id=request.user.id)
+        try:
+            bot.trip_data(data)
+        except (TypeError, ValueError) as e:
+            return Response({"error": f"Invalid trip details: {e}"}, status=status.HTTP_400_BAD_REQUEST)
         trip_plan = bot.generate_trip_plan(data)
         return Response({"recommendation": trip_plan})
     except Exception:
         logger.exception("Error in advanced_recommend_trip endpoint")
         return Response({"error": "An error occurred while generating the trip plan."}, status=500)
 
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+@throttle_classes([TripBatchUserThrottle, TripBatchIPThrottle])
+def batch_recommend_trip(request):
+    """
+    Generate plans for a list (JSON) or stream (JSONL) of trip specs. Results
+    are streamed back as JSON lines in completion order, each carrying the
+    spec's index and optional "id".
+    """
+    try:
+        specs = read_batch_request(request)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+
+    def lines():
+        for result in generate_plans(specs, user_id=request.user.id):
+            yield json.dumps(result) + "\n"
+
+    return StreamingHttpResponse(lines(), content_type="application/x-ndjson")
+
+
 @api_view(["GET"])
 def get_weather(request):
     city = request.GET.get("city", "Delhi")
@@ -392,6 +130,7 @@ def get_weather(request):
         logger.exception("Error in get_weather: %s", e)
         return Response({"error": "Unable to fetch weather information."}, status=500)
 
+
 @api_view(["POST"])
 def generate_itinerary(request):
     try:
@@ -403,273 +142,178 @@ def generate_itinerary(request):
     
     bot = Chatbot()
     attractions = bot.fetch_attractions(destination)
-    itinerary = {}
-    for day in range(1, days + 1):
-        attraction = attractions[(day - 1) % len(attractions)]
-        itinerary[f"Day {day}"] = [
-            f"Morning: Visit {attraction}",
+    schedule = {}
+    for day, stops in enumerate(itinerary.schedule_stops(attractions, days), start=1):
+        names = ", then ".join(stop["name"] for stop in stops) or f"landmarks in {destination}"
+        schedule[f"Day {day}"] = [
+            f"Morning: Visit {names}",
             "Afternoon: Enjoy local cuisine",
             "Evening: Explore local markets and culture"
         ]
-    return Response({"itinerary": itinerary})
+    return Response({"itinerary": schedule})
+
+
+@api_view(["GET"])
+def nearby_places(request):
+    """
+    Destinations, hotels and activities near a point
+    (?lat=&lon=&radius_km=&limit=, nearest first) or inside a bounding box
+    (?bbox=min_lat,min_lon,max_lat,max_lon), from the local geospatial index.
+    ?kind=hotel,activity restricts the kinds of place returned.
+    """
+    params = request.query_params
+    try:
+        kinds = [kind.strip() for kind in params.get("kind", "").split(",") if kind.strip()]
+        limit = int(params.get("limit", 20))
+        if params.get("bbox"):
+            box = [float(value) for value in params["bbox"].split(",")]
+            if len(box) != 4:
+                raise ValueError("bbox must be min_lat,min_lon,max_lat,max_lon.")
+            count, places = geo.in_bbox(*box, limit=limit, kinds=kinds)
+            return Response({"count": count, "results": places})
+        lat, lon = float(params["lat"]), float(params["lon"])
+        radius_km = float(params.get("radius_km", geo.MAX_RADIUS_KM))
+        places = geo.nearby(lat, lon, radius_km=radius_km, limit=limit, kinds=kinds)
+    except KeyError:
+        return Response({"error": "Provide lat and lon, or bbox."}, status=400)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    return Response({"count": len(places), "results": places})
+
+
+@api_view(["GET"])
+def similar_places(request):
+    """
+    Places whose descriptions read most like a place (?kind=&id=) or like
+    free text (?q=), best first; ?type=hotel,activity restricts the kinds
+    returned and ?limit= the count. See api/vector_index.py.
+    """
+    params = request.query_params
+    try:
+        kinds = [kind.strip() for kind in params.get("type", "").split(",") if kind.strip()]
+        limit = int(params.get("limit", 10))
+        if params.get("q"):
+            places = vector_index.similar(text=params["q"], limit=limit, kinds=kinds)
+        else:
+            places = vector_index.similar(kind=params["kind"], place_id=int(params["id"]), limit=limit, kinds=kinds)
+    except KeyError:
+        return Response({"error": "Provide kind and id, or q."}, status=400)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    except LookupError as e:
+        return Response({"error": str(e)}, status=404)
+    return Response({"count": len(places), "results": places})
+
+
+@api_view(["GET"])
+def recommendations(request):
+    """
+    Precomputed destination recommendations (api/recommender.py): like
+    ?destination=<id or name>, else for the signed-in user, else popular.
+    ?limit= caps the list.
+    """
+    params = request.query_params
+    try:
+        limit = int(params.get("limit", recommender.RECOMMENDATIONS_TOP_K))
+        destination_id = None
+        if params.get("destination"):
+            destination = params["destination"].strip()
+            destination_id = (int(destination) if destination.isdigit() else Destination.objects.filter(
+                name__iexact=destination).values_list("id", flat=True).first())
+            if destination_id is None:
+                return Response({"error": "Unknown destination."}, status=404)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    kind, items = recommender.recommendations(
+        user_id=request.user.id if request.user.is_authenticated else None, destination_id=destination_id,
+    )
+    destinations = Destination.objects.in_bulk([item["id"] for item in items[:max(limit, 0)]])
+    results = [{
+        "id": destination.id,
+        "name": destination.name,
+        "location": destination.location,
+        "image": destination.image.url if destination.image else "",
+        "score": item["score"],
+    } for item in items[:max(limit, 0)] if (destination := destinations.get(item["id"]))]
+    return Response({"kind": kind, "count": len(results), "results": results})
+
 
 @api_view(["POST"])
+def optimize_trip(request):
+    """
+    Best-rated hotel, activities and (given an origin) flight from our
+    catalogue that fit an INR budget; see api/budget_optimizer.py.
+    Body: destination, budget, days, optional travellers, origin,
+    activities (list or comma-separated) and hotel_preference.
+    """
+    data = request.data
+    try:
+        destination = str(data["destination"]).strip()
+        budget = float(data["budget"])
+        days = int(data.get("days", 3))
+        travellers = int(data.get("travellers", 1))
+        if not destination or not 0 < budget < float("inf") or not 1 <= days <= MAX_TRIP_DAYS or travellers < 1:
+            raise ValueError
+    except (KeyError, TypeError, ValueError):
+        return Response({"error": "Provide a destination, a positive budget, days and travellers."}, status=400)
+    try:
+        activities = activity_list(data.get("activities"))
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+
+    catalog = budget_optimizer.load_catalog(destination, origin=data.get("origin"))
+    if not catalog:
+        return Response({"error": f"No bookable options found for {destination}."}, status=404)
+    selection = budget_optimizer.optimize(catalog, budget, days, travellers, activities,
+                                          str(data.get("hotel_preference", "any")))
+    return Response({"destination": destination, "budget": budget, "days": days, **selection,
+                     "remaining": budget - selection["costs"]["total"]})
+
+
+@api_view(["POST"])
+@throttle_classes([ChatbotUserThrottle, ChatbotIPThrottle])
 def chatbot_api(request):
     try:
         user_message = request.data.get("message", "")
-        session_data = request.session.get("chatbot_state")
-        logger.info("Session data before processing: %s", session_data)
-        if session_data:
-            bot = Chatbot.from_dict(session_data)
-        else:
-            bot = Chatbot()
-        response_text = bot.handle_input(user_message)
-        request.session["chatbot_state"] = bot.to_dict()
-        logger.info("Session data after processing: %s", bot.to_dict())
+        response_text = chat_turn(request, user_message)
         return Response({"message": response_text, "type": "text"})
     except Exception as e:
         logger.exception("Error in chatbot_api: %s", e)
         return Response({"error": "An error occurred while processing your request."}, status=500)
 
-# # api/views.py
-# from django.shortcuts import render
-# from rest_framework import viewsets, status, filters
-# from rest_framework.decorators import api_view, permission_classes
-# from rest_framework.response import Response
-# from rest_framework.permissions import IsAuthenticated, AllowAny
-# from django.contrib.auth.models import User
-# from django.contrib.auth import authenticate
-# from django.db.models import Q
-# from datetime import datetime
-# from forex_python.converter import CurrencyRates
-# import requests
-# import logging
-
-# from .models import (
-#     UserProfile, Destination, Hotel, Flight,
-#     Activity, Booking, Review, ChatMessage
-# )
-# from .serializers import (
-#     UserSerializer, UserProfileSerializer, DestinationSerializer,
-#     HotelSerializer, FlightSerializer, ActivitySerializer,
-#     BookingSerializer, ReviewSerializer, ChatMessageSerializer,
-#     UserRegistrationSerializer
-# )
 
-# # -------------------------------
-# # Production-Level Logging Setup
-# # -------------------------------
-# logger = logging.getLogger('chatbot')
-# logger.setLevel(logging.INFO)
-# if not logger.handlers:
-#     handler = logging.StreamHandler()
-#     formatter = logging.Formatter(
-#         '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-#     )
-#     handler.setFormatter(formatter)
-#     logger.addHandler(handler)
+def chat_turn(request, user_message):
+    """
+    Run one turn of the session-based chatbot and queue it for the user's
+    chat history (authenticated users only; see api/chat_log.py).
+    """
+    session_data = request.session.get("chatbot_state")
+    logger.info("Session data before processing: %s", session_data)
+    if session_data:
+        bot = Chatbot.from_dict(session_data)
+    else:
+        bot = Chatbot()
+    bot.user_id = request.user.id
+    response_text = bot.handle_input(user_message)
+    request.session["chatbot_state"] = bot.to_dict()
+    logger.info("Session data after processing: %s", bot.to_dict())
+    if request.user and request.user.is_authenticated:
+        record_turn(request.user.id, user_message, response_text)
+    return response_text
 
-# # -------------------------------
-# # API Keys and Global Variables
-# # -------------------------------
-# from django.conf import settings
-# #MAPPLES_API_KEY = getattr(settings, "MAPPLES_API_KEY", "YOUR_MAPPLES_API_KEY")
-# WEATHER_API_KEY = getattr(settings, "WEATHER_API_KEY", "YOUR_WEATHER_API_KEY")
-# RAPIDAPI_KEY = getattr(settings, "RAPIDAPI_KEY", "YOUR_RAPIDAPI_KEY")
-# RAPIDAPI_HOST = "tripadvisor-scraper.p.rapidapi.com"
-# #HOTEL_API_KEY = getattr(settings, "HOTEL_API_KEY", "YOUR_HOTEL_API_KEY")
-# CURRENCY_CONVERTER = CurrencyRates()
-
-# # Common headers for RapidAPI calls
-# HEADERS = {
-#     "X-RapidAPI-Key": RAPIDAPI_KEY,
-#     "X-RapidAPI-Host": RAPIDAPI_HOST
-# }
-# # -------------------------------
-# # Advanced Chatbot Class & Functions
-# # -------------------------------
-# class Chatbot:
-#     """
-#     Advanced stateful chatbot that collects user inputs step-by-step,
-#     integrates with external APIs in real time, and generates a personalized trip plan.
-#     """
-#     def __init__(self, state="greeting", data=None):
-#         self.state = state
-#         self.data = data or {}
-
-#     def to_dict(self):
-#         """Serialize chatbot state for session storage."""
-#         return {"state": self.state, "data": self.data}
-
-#     @classmethod
-#     def from_dict(cls, data_dict):
-#         """Reconstruct Chatbot instance from session data."""
-#         return cls(state=data_dict.get("state", "greeting"), data=data_dict.get("data", {}))
-
-#     def reset(self):
-#         self.state = "greeting"
-#         self.data = {}
-
-#     def handle_input(self, user_input):
-#         logger.info("Handling input. Current state: %s, User input: %s", self.state, user_input)
-#         user_input = user_input.strip()
-#         response = ""
-#         try:
-#             if self.state == "greeting":
-#                 response = "Hello! I'm your AI-powered tour planner. Would you like to plan a trip? (Yes/No)"
-#                 self.state = "confirm_trip"
-
-#             elif self.state == "confirm_trip":
-#                 if user_input.lower() in ["yes", "y"]:
-#                     response = ("Great! Please tell me your budget. "
-#                                 "Enter a numeric value (in INR) or type a category (low/medium/high).")
-#                     self.state = "get_budget"
-#                 else:
-#                     response = "Alright, feel free to ask me anytime when you want to plan a trip!"
-#                     self.reset()
-
-#             elif self.state == "get_budget":
-#                 try:
-#                     budget = float(user_input)
-#                     self.data["budget"] = budget
-#                 except ValueError:
-#                     budget_categories = {"low": 5000, "medium": 15000, "high": 30000}
-#                     self.data["budget"] = budget_categories.get(user_input.lower(), 10000)
-#                 response = "Which destination (city/place) in India would you like to visit? (e.g., Goa, Delhi, Jaipur)"
-#                 self.state = "get_destination"
-
-#             elif self.state == "get_destination":
-#                 self.data["destination"] = user_input
-#                 response = "For how many days would you like the trip? (Enter a number)"
-#                 self.state = "get_days"
-
-#             elif self.state == "get_days":
-#                 if user_input.isdigit():
-#                     self.data["days"] = int(user_input)
-#                     response = ("What mode of transportation do you prefer? "
-#                                 "Options: flight, train, car, bus or type 'any'.")
-#                     self.state = "get_transportation"
-#                 else:
-#                     response = "Please enter a valid number for the trip duration."
-
-#             elif self.state == "get_transportation":
-#                 valid_options = ["flight", "train", "car", "bus", "any"]
-#                 if user_input.lower() in valid_options:
-#                     self.data["transportation"] = user_input.lower()
-#                     response = "Do you have any hotel preferences? (e.g., luxury, budget, boutique, any)"
-#                     self.state = "get_hotel_preference"
-#                 else:
-#                     response = "Please choose a valid transportation option: flight, train, car, bus, or 'any'."
-
-#             elif self.state == "get_hotel_preference":
-#                 self.data["hotel_preference"] = user_input.lower()
-#                 response = "Any particular food preference or cuisine? (e.g., North Indian, South Indian, continental, any)"
-#                 self.state = "get_food_preference"
-
-#             elif self.state == "get_food_preference":
-#                 self.data["food_preference"] = user_input.lower()
-#                 response = ("Lastly, do you have any specific activity interests? "
-#                             "For example: adventure, sightseeing, culture, shopping, or type 'none'.")
-#                 self.state = "get_activities"
-
-#             elif self.state == "get_activities":
-#                 if user_input.lower() == "none":
-#                     self.data["activities"] = []
-#                 else:
-#                     activities = [act.strip() for act in user_input.split(",") if act.strip()]
-#                     self.data["activities"] = activities
-#                 response = "Thanks! Generating your personalized trip plan..."
-#                 self.state = "generating_plan"
-#                 trip_plan = self.generate_trip_plan(self.data)
-#                 response += "\n\n" + trip_plan
-#                 self.reset()
-
-#             else:
-#                 response = "I'm sorry, I didn't understand that. Could you please repeat?"
-#         except Exception as e:
-#             logger.exception("Exception in handle_input: %s", e)
-#             response = "An error occurred while processing your input. Please try again later."
-#         return response
-
-#     def generate_trip_plan(self, data):
-#         try:
-#             destination = data.get("destination", "Unknown")
-#             budget = data.get("budget", 10000)
-#             days = data.get("days", 3)
-#             transportation = data.get("transportation", "any")
-#             hotel_pref = data.get("hotel_preference", "any")
-#             food_pref = data.get("food_preference", "any")
-#             activities = data.get("activities", [])
-
-#             attractions = self.fetch_attractions(destination)
-#             weather_info = self.fetch_weather(destination)
-#             hotels = self.fetch_hotels(destination, hotel_pref)
-#             restaurants = self.fetch_restaurants(destination, food_pref)
-#             cost_breakdown = self.calculate_costs(budget, days, transportation, hotel_pref)
-#             itinerary = self.create_itinerary(days, attractions, activities)
-
-#             trip_plan = (
-#                 f"Trip Plan for {destination} (Duration: {days} days, Budget: INR {budget}):\n\n"
-#                 f"{weather_info}\n\n"
-#                 f"Transportation: {transportation.capitalize()}\n"
-#                 f"Estimated Cost Breakdown:\n{cost_breakdown}\n\n"
-#                 f"Itinerary:\n{itinerary}\n\n"
-#                 f"Recommended Hotels: {', '.join(hotels[:3])}\n\n"
-#                 f"Recommended Restaurants: {', '.join(restaurants[:3])}\n\n"
-#                 "Enjoy your trip!"
-#             )
-#             return trip_plan
-#         except Exception as e:
-#             logger.exception("Exception in generate_trip_plan: %s", e)
-#             return "An error occurred while generating the trip plan."
-
-#     def fetch_attractions(self, destination):
-#         try:
-#             url = f"https://api.mapples.com/v1/places/search?query={destination}&apikey={MAPPLES_API_KEY}"
-#             response = requests.get(url, timeout=5)
-#             response.raise_for_status()
-#             data = response.json()
-#             attractions = [place.get("name") for place in data.get("results", []) if place.get("name")]
-#             if not attractions:
-#                 attractions = [f"Popular attraction in {destination}"]
-#         except Exception as e:
-#             logger.exception("Error fetching attractions: %s", e)
-#             attractions = [f"Famous landmark in {destination}"]
-#         return attractions
-
-   
-
-#     def calculate_costs(self, budget, days, transportation, hotel_pref):
-#         try:
-#             trans_cost = 0.2 * budget if transportation != "any" else 0.15 * budget
-#             hotel_cost = 0.5 * budget if hotel_pref in ["luxury", "boutique"] else 0.3 * budget
-#             food_cost = 0.1 * budget
-#             activity_cost = 0.1 * budget
-#             breakdown = (
-#                 f"Transportation: INR {trans_cost:.0f}\n"
-#                 f"Accommodation: INR {hotel_cost:.0f}\n"
-#                 f"Food: INR {food_cost:.0f}\n"
-#                 f"Activities: INR {activity_cost:.0f}\n"
-#                 f"Total: INR {trans_cost + hotel_cost + food_cost + activity_cost:.0f}"
-#             )
-#         except Exception as e:
-#             logger.exception("Error calculating costs: %s", e)
-#             breakdown = "Cost breakdown unavailable."
-#         return breakdown
-
-#     def create_itinerary(self, days, attractions, activities):
-#         itinerary_lines = []
-#         for day in range(1, days + 1):
-#             attraction = attractions[(day - 1) % len(attractions)]
-#             day_activities = f"Explore {attraction}"
-#             if activities:
-#                 day_activities += f"; also enjoy: {', '.join(activities)}"
-#             itinerary_lines.append(f"Day {day}: {day_activities}.")
-#         return "\n".join(itinerary_lines)
 
-# # -------------------------------
-# # Existing Endpoints (Users, Destinations, etc.)
-# # -------------------------------
+def metrics(request):
+    """
+    Prometheus histograms of this process (api/timing.py). A plain Django
+    view, so scrapes skip DRF authentication and throttling; only
+    METRICS_ALLOWED_IPS may read it. That is checked against REMOTE_ADDR,
+    which behind a reverse proxy is the proxy's address (see settings).
+    """
+    allowed = getattr(settings, "METRICS_ALLOWED_IPS", ["127.0.0.1", "::1"])
+    if "*" not in allowed and request.META.get("REMOTE_ADDR") not in allowed:
+        raise Http404
+    return HttpResponse(timing.expose(), content_type=timing.CONTENT_TYPE)
+
 
 @api_view(['GET'])
 def api_overview(request):
@@ -681,18 +325,21 @@ def api_overview(request):
     }
     return Response(api_urls)
 
+
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
 
+
 class UserProfileViewSet(viewsets.ModelViewSet):
     queryset = UserProfile.objects.all()
     serializer_class = UserProfileSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return UserProfile.objects.filter(user=self.request.user)
+        return UserProfile.objects.filter(user_id=self.request.user.id)
+
 
 class DestinationViewSet(viewsets.ModelViewSet):
     queryset = Destination.objects.all()
@@ -706,6 +353,7 @@ class DestinationViewSet(viewsets.ModelViewSet):
         serializer = DestinationSerializer(destinations, many=True)
         return Response(serializer.data)
 
+
 class HotelViewSet(viewsets.ModelViewSet):
     queryset = Hotel.objects.all()
     serializer_class = HotelSerializer
@@ -719,6 +367,34 @@ class HotelViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(destination__name__icontains=destination)
         return queryset
 
+    @action(detail=False, methods=['get'])
+    def availability(self, request):
+        """
+        Hotels with enough rooms free on every night of a stay, cheapest first:
+        ?start=YYYY-MM-DD&end=YYYY-MM-DD (check-out)&rooms=&destination=
+        """
+        params = request.query_params
+        try:
+            start = datetime.strptime(params['start'], '%Y-%m-%d').date()
+            end = datetime.strptime(params['end'], '%Y-%m-%d').date()
+            rooms = int(params.get('rooms', 1))
+            hotels = inventory.available_hotels(start, end, rooms, self.get_queryset().select_related('destination'))
+        except KeyError:
+            return Response({"error": "start and end are required."}, status=400)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+        nights = (end - start).days
+        results = [{
+            "id": hotel.id,
+            "name": hotel.name,
+            "destination": hotel.destination.name,
+            "rating": float(hotel.rating),
+            "rooms_left": inventory.rooms_left(hotel, nights),
+            "total_price": float(hotel.total_price * rooms),
+        } for hotel in hotels]
+        return Response({"nights": nights, "rooms": rooms, "count": len(results), "results": results})
+
+
 class FlightViewSet(viewsets.ModelViewSet):
     queryset = Flight.objects.all()
     serializer_class = FlightSerializer
@@ -740,6 +416,52 @@ class FlightViewSet(viewsets.ModelViewSet):
                 pass
         return queryset
 
+    @action(detail=False, methods=['get'])
+    def routes(self, request):
+        """
+        Direct and connecting itineraries (up to two stops) leaving on a date:
+        ?source=&destination=&date=YYYY-MM-DD&sort=earliest|cheapest|fewest_stops
+        &max_stops=&min_layover=&max_layover= (minutes)&passengers=&limit=
+        """
+        params = request.query_params
+        try:
+            options = flight_search.search_routes(
+                params['source'], params['destination'],
+                datetime.strptime(params['date'], '%Y-%m-%d').date(),
+                sort=params.get('sort', 'earliest'),
+                max_stops=int(params.get('max_stops', flight_search.MAX_STOPS)),
+                passengers=max(1, int(params.get('passengers', 1))),
+                min_layover=int(params.get('min_layover', flight_search.MIN_LAYOVER_MINUTES)),
+                max_layover=int(params.get('max_layover', flight_search.MAX_LAYOVER_MINUTES)),
+                limit=int(params.get('limit', 10)),
+            )
+        except KeyError:
+            return Response({"error": "source, destination and date are required."}, status=400)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+        return Response({"count": len(options), "results": options})
+
+    @action(detail=False, methods=['get'])
+    def calendar(self, request):
+        """
+        Cheapest fare and seat availability per day for a route:
+        ?source=&destination=&start=YYYY-MM-DD&end=YYYY-MM-DD (inclusive;
+        defaults to today and the following 30 days).
+        """
+        params = request.query_params
+        try:
+            source, destination = params['source'], params['destination']
+            start = datetime.strptime(params['start'], '%Y-%m-%d').date() if 'start' in params else timezone.localdate()
+            end = (datetime.strptime(params['end'], '%Y-%m-%d').date() if 'end' in params
+                   else start + timedelta(days=fares.CALENDAR_DEFAULT_DAYS - 1))
+            days = fares.calendar(source, destination, start, end)
+        except KeyError:
+            return Response({"error": "source and destination are required."}, status=400)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+        return Response({"source": source, "destination": destination, "days": days})
+
+
 class ActivityViewSet(viewsets.ModelViewSet):
     queryset = Activity.objects.all()
     serializer_class = ActivitySerializer
@@ -753,22 +475,64 @@ class ActivityViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(destination__name__icontains=destination)
         return queryset
 
-class BookingViewSet(viewsets.ModelViewSet):
+
+def history_response(request, kind, queryset, serializer_class):
+    """
+    List a user's history, newest first, optionally bounded by ?since= and
+    ?until=. Archived rows (api/history.py) are merged in only when a range
+    is given or with ?archived=true, so a plain list reads the hot table
+    alone instead of decompressing every archive month of the user.
+    """
+    try:
+        since, until = history_bounds(request.query_params)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    if since:
+        queryset = queryset.filter(created_at__gte=since)
+    if until:
+        queryset = queryset.filter(created_at__lte=until)
+    hot_rows = serializer_class(queryset.order_by('-created_at'), many=True).data
+    archived = request.query_params.get('archived', '').lower() in ('1', 'true', 'yes')
+    if not (since or until or archived):
+        return Response(hot_rows)
+    rows = merged_history(kind, request.user.id, hot_rows, since, until)
+    if len(rows) > len(hot_rows):
+        user = UserSerializer(getattr(request.user, 'user', request.user)).data
+        for row in rows:
+            row.setdefault('user', user)
+    return Response(rows)
+
+
+class ArchivedHistoryMixin:
+    history_kind = None
+
+    def list(self, request, *args, **kwargs):
+        return history_response(request, self.history_kind, self.get_queryset(), self.get_serializer_class())
+
+
+class BookingViewSet(ArchivedHistoryMixin, viewsets.ModelViewSet):
     serializer_class = BookingSerializer
     permission_classes = [IsAuthenticated]
+    history_kind = 'booking'
 
     def get_queryset(self):
-        return Booking.objects.filter(user=self.request.user)
+        return Booking.objects.filter(user_id=self.request.user.id)
 
     def perform_create(self, serializer):
         booking_type = self.request.data.get('booking_type')
         if booking_type == 'hotel':
-            hotel_id = self.request.data.get('hotel')
-            hotel = Hotel.objects.get(id=hotel_id)
-            total_price = hotel.price_per_night * (
-                datetime.strptime(self.request.data.get('end_date'), '%Y-%m-%d').date() -
-                datetime.strptime(self.request.data.get('start_date'), '%Y-%m-%d').date()
-            ).days
+            # Rooms are taken per night (api/inventory.py) in the booking's transaction.
+            data = serializer.validated_data
+            if not data.get('hotel'):
+                raise ValidationError({"hotel": ["This field is required."]})
+            with transaction.atomic():
+                try:
+                    total_price = inventory.reserve(data['hotel'], data['start_date'], data['end_date'],
+                                                    data.get('rooms', 1))
+                except ValueError as e:
+                    raise ValidationError({"error": str(e)})
+                serializer.save(user_id=self.request.user.id, total_price=total_price)
+            return
         elif booking_type == 'flight':
             flight_id = self.request.data.get('flight')
             flight = Flight.objects.get(id=flight_id)
@@ -778,7 +542,32 @@ class BookingViewSet(viewsets.ModelViewSet):
             activity = Activity.objects.get(id=activity_id)
             total_price = activity.price
 
-        serializer.save(user=self.request.user, total_price=total_price)
+        serializer.save(user_id=self.request.user.id, total_price=total_price)
+
+    def perform_update(self, serializer):
+        data = serializer.validated_data
+        with transaction.atomic():
+            # The rooms held under the old details are given back and taken again under the new ones.
+            booking = Booking.objects.select_for_update().get(pk=serializer.instance.pk)
+            inventory.release(booking)
+            if data.get('booking_type', booking.booking_type) != 'hotel' or booking.status == 'cancelled':
+                serializer.save()
+                return
+            hotel = data.get('hotel', booking.hotel)
+            if not hotel:
+                raise ValidationError({"hotel": ["This field is required."]})
+            try:
+                total_price = inventory.reserve(hotel, data.get('start_date', booking.start_date),
+                                                data.get('end_date', booking.end_date), data.get('rooms', booking.rooms))
+            except ValueError as e:
+                raise ValidationError({"error": str(e)})
+            serializer.save(total_price=total_price)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            inventory.release(instance)
+            instance.delete()
+
 
 class ReviewViewSet(viewsets.ModelViewSet):
     queryset = Review.objects.all()
@@ -786,34 +575,131 @@ class ReviewViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        serializer.save(user_id=self.request.user.id)
+
+
+MAX_TRIP_DAYS = itinerary.MAX_TRIP_DAYS
+
+
+class TripViewSet(viewsets.ModelViewSet):
+    """
+    Structured trip plans. POST takes the chatbot slots (or a free-form
+    "message") and stores the generated plan; a single day is served from
+    /trips/<id>/days/<n>/ and the chatbot's text rendering from /trips/<id>/text/.
+    """
+    permission_classes = [IsAuthenticated]
+    http_method_names = ['get', 'post', 'delete', 'head', 'options']
+
+    def get_queryset(self):
+        queryset = Trip.objects.filter(user_id=self.request.user.id).order_by('-created_at')
+        if self.action in ('retrieve', 'text', 'replan'):
+            queryset = queryset.prefetch_related('itinerary')
+        return queryset
+
+    def get_serializer_class(self):
+        return TripSerializer if self.action == 'list' else TripDetailSerializer
+
+    def get_throttles(self):
+        if self.action in ('create', 'replan'):
+            return [TripPlanUserThrottle(), TripPlanIPThrottle()]
+        return super().get_throttles()
+
+    def create(self, request, *args, **kwargs):
+        data = request.data
+        if isinstance(data.get("message"), str):
+            data = {**parse_trip_request(data["message"]), **{k: v for k, v in data.items() if k != "message"}}
+        if not data.get("destination"):
+            return Response({"destination": ["This field is required."]}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            plan = Chatbot().build_trip_plan(data)
+        except (TypeError, ValueError) as e:
+            return Response({"error": f"Invalid trip details: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+        trip = itinerary.save_trip(plan, user_id=request.user.id)
+        trip = self.get_queryset().get(pk=trip.pk)
+        return Response(TripDetailSerializer(trip).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['get'], url_path=r'days/(?P<number>\d+)')
+    def day(self, request, pk=None, number=None):
+        day = TripDay.objects.filter(trip__user_id=request.user.id, trip_id=pk, number=number).first()
+        if day is None:
+            return Response({"error": "Day not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(TripDaySerializer(day).data)
+
+    @action(detail=True, methods=['post'])
+    def replan(self, request, pk=None):
+        """
+        Change some trip details, e.g. {"days": 5} or {"hotel_preference": "luxury"}
+        (or a free-form "message"), recomputing only what depends on them.
+        """
+        trip = self.get_object()
+        changes = {k: v for k, v in request.data.items() if k in itinerary.TRIP_DETAILS}
+        if isinstance(request.data.get("message"), str):
+            changes = {**parse_trip_request(request.data["message"]), **changes}
+        if not changes:
+            return Response({"error": "No trip details to change."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            plan, summary = Chatbot().replan_trip(itinerary.plan_from_trip(trip), changes)
+        except (TypeError, ValueError) as e:
+            return Response({"error": f"Invalid trip details: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+        if summary.get("full"):
+            itinerary.replace_trip(trip, plan)
+        else:
+            itinerary.save_replan(trip, plan, summary)
+        trip = self.get_queryset().get(pk=trip.pk)
+        return Response({**TripDetailSerializer(trip).data, "replan": summary})
+
+    @action(detail=True, methods=['get'])
+    def text(self, request, pk=None):
+        trip = self.get_object()
+        return Response({"recommendation": itinerary.render_plan(itinerary.plan_from_trip(trip))})
 
-class ChatMessageViewSet(viewsets.ModelViewSet):
+
+class ChatMessageViewSet(ArchivedHistoryMixin, viewsets.ModelViewSet):
     serializer_class = ChatMessageSerializer
     permission_classes = [IsAuthenticated]
+    history_kind = 'chat'
 
     def get_queryset(self):
-        return ChatMessage.objects.filter(user=self.request.user)
+        return ChatMessage.objects.filter(user_id=self.request.user.id)
+
+    def get_throttles(self):
+        # Posting a message runs a chat turn, so it shares chatbot_api's limits.
+        if self.action == 'create':
+            return [ChatbotUserThrottle(), ChatbotIPThrottle()]
+        return super().get_throttles()
+
+    def create(self, request, *args, **kwargs):
+        # Reply through the session-based chatbot; the turn is written to
+        # history in the background, so it has no id yet (202 Accepted).
+        message = request.data.get("message")
+        if not isinstance(message, str) or not message.strip():
+            return Response({"message": ["This field is required."]}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            ai_response = chat_turn(request, message)
+        except Exception as e:
+            logger.exception("Error in chat message create: %s", e)
+            return Response({"error": "An error occurred while processing your request."}, status=500)
+        return Response({"message": message, "response": ai_response}, status=status.HTTP_202_ACCEPTED)
 
-    def perform_create(self, serializer):
-        # For each chat message, use the session-based chatbot endpoint to generate a reply.
-        ai_response = chatbot_api(self.request).data.get("message", "")
-        serializer.save(user=self.request.user, response=ai_response)
 
 # # -------------------------------
 # # Authentication & Registration Endpoints
 # # -------------------------------
 from django.contrib.auth import get_user_model
 from django.views.decorators.csrf import csrf_exempt
-from rest_framework_simplejwt.tokens import RefreshToken
+from .authentication import ClaimsRefreshToken, revoke_token
+from rest_framework_simplejwt.exceptions import TokenError
 
 User = get_user_model()
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
+
+
 @api_view(['POST'])
 @csrf_exempt
 @permission_classes([AllowAny])
+@throttle_classes([RegisterIPThrottle])
 def register_user(request):
     """
     Endpoint to register a new user.
@@ -836,7 +722,7 @@ def register_user(request):
             user = serializer.save()
             # Optionally, if you want to create a UserProfile here,
             # you can do so after saving the user.
-            refresh = RefreshToken.for_user(user)
+            refresh = ClaimsRefreshToken.for_user(user)
             response_data = {
                 'user': UserSerializer(user).data,
                 'access': str(refresh.access_token),
@@ -855,24 +741,28 @@ def register_user(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def user_bookings(request):
-    bookings = Booking.objects.filter(user=request.user)
-    serializer = BookingSerializer(bookings, many=True)
-    return Response(serializer.data)
+    bookings = Booking.objects.filter(user_id=request.user.id)
+    return history_response(request, 'booking', bookings, BookingSerializer)
+
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def cancel_booking(request, booking_id):
     try:
-        booking = Booking.objects.get(id=booking_id, user=request.user)
-        booking.status = 'cancelled'
-        booking.save()
+        with transaction.atomic():
+            booking = Booking.objects.select_for_update().get(id=booking_id, user_id=request.user.id)
+            inventory.release(booking)
+            booking.status = 'cancelled'
+            booking.save()
         return Response({"message": "Booking cancelled successfully"})
     except Booking.DoesNotExist:
         return Response({"error": "Booking not found"}, status=status.HTTP_404_NOT_FOUND)
 
+
 @api_view(['POST'])
 @csrf_exempt
 @permission_classes([AllowAny])
+@throttle_classes([LoginIPThrottle, LoginAccountThrottle])
 def login(request):
     """
     Custom login endpoint.
@@ -894,22 +784,15 @@ def login(request):
         return Response({"detail": "Email and password are required."}, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        # Use filter to get all users with this email.
-        users = User.objects.filter(email=email)
-        if not users.exists():
-            logger.warning("Login attempt with non-existent email: %s", email)
-            return Response({"detail": "User not found."}, status=status.HTTP_404_NOT_FOUND)
-        if users.count() > 1:
-            logger.warning("Multiple users found with email: %s. Using the first one.", email)
-        user = users.first()
-        
-        # Now, authenticate using username (since Django's default backend uses username)
-        user = authenticate(request, username=user.username, password=password)
+        # EmailBackend resolves the user by email in a single indexed query and
+        # checks the password; unknown emails and wrong passwords are reported
+        # the same way so the endpoint does not reveal which accounts exist.
+        user = authenticate(request, email=email, password=password)
         if user is None:
             logger.warning("Invalid credentials for user: %s", email)
             return Response({"detail": "Invalid credentials."}, status=status.HTTP_401_UNAUTHORIZED)
         
-        refresh = RefreshToken.for_user(user)
+        refresh = ClaimsRefreshToken.for_user(user)
         response_data = {
             'user': UserSerializer(user).data,
             'access': str(refresh.access_token),
@@ -921,70 +804,24 @@ def login(request):
     except Exception as e:
         logger.exception("Exception during login: %s", e)
         return Response({"detail": "An error occurred during login."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-# # -------------------------------
-# # Advanced Chatbot Endpoints
-# # -------------------------------
 
-# @api_view(["POST"])
-# def chatbot_api(request):
-#     """
-#     Session-based dynamic chatbot endpoint.
-#     """
-#     try:
-#         user_message = request.data.get("message", "")
-#         session_data = request.session.get("chatbot_state")
-#         logger.info("Session data before processing: %s", session_data)
-#         if session_data:
-#             bot = Chatbot.from_dict(session_data)
-#         else:
-#             bot = Chatbot()
-#         response_text = bot.handle_input(user_message)
-#         request.session["chatbot_state"] = bot.to_dict()
-#         logger.info("Session data after processing: %s", bot.to_dict())
-#         return Response({"message": response_text, "type": "text"})
-#     except Exception as e:
-#         logger.exception("Error in chatbot_api: %s", e)
-#         return Response({"error": "An error occurred while processing your request."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-# @api_view(["POST"])
-# def advanced_recommend_trip(request):
-#     return chatbot_api(request)
-
-# @api_view(["GET"])
-# def get_weather(request):
-#     city = request.GET.get("city", "Delhi")
-#     try:
-#         url = f"http://api.openweathermap.org/data/2.5/weather?q={city}&appid={WEATHER_API_KEY}&units=metric"
-#         response = requests.get(url, timeout=5)
-#         response.raise_for_status()
-#         return Response(response.json())
-#     except Exception as e:
-#         logger.exception("Error in get_weather: %s", e)
-#         return Response({"error": "Unable to fetch weather information."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-# @api_view(["POST"])
-# def generate_itinerary(request):
-#     try:
-#         destination = request.data.get("destination", "Goa")
-#         days = int(request.data.get("days", 3))
-#     except Exception as e:
-#         logger.exception("Error parsing itinerary data: %s", e)
-#         return Response({"error": "Invalid input for itinerary."}, status=status.HTTP_400_BAD_REQUEST)
-    
-#     bot = Chatbot()
-#     attractions = bot.fetch_attractions(destination)
-#     itinerary = {}
-#     for day in range(1, days + 1):
-#         attraction = attractions[(day - 1) % len(attractions)]
-#         itinerary[f"Day {day}"] = [
-#             f"Morning: Visit {attraction}",
-#             "Afternoon: Enjoy local cuisine",
-#             "Evening: Explore local markets and culture"
-#         ]
-#     return Response({"itinerary": itinerary})
-
-
-# #*****************************************************************************************************************************
-
-# #*************************************************************************************************************************************
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def logout(request):
+    """
+    Revoke the access token used for this request and, if given, the refresh token.
+    Expected JSON payload (optional):
+      {
+         "refresh": "<refresh_token>"
+      }
+    """
+    revoke_token(request.auth)
+    raw_refresh = request.data.get('refresh')
+    if raw_refresh:
+        try:
+            revoke_token(ClaimsRefreshToken(raw_refresh))
+        except TokenError:
+            return Response({"detail": "Invalid refresh token."}, status=status.HTTP_400_BAD_REQUEST)
+    logger.info("User '%s' logged out.", request.user.username)
+    return Response({"detail": "Logged out."}, status=status.HTTP_200_OK)
@@ -0,0 +1,208 @@
+"""
+WebSocket transport for the trip-planner chatbot.
+
+A connection keeps its Chatbot state machine in memory, so a chat turn costs
+one frame round trip instead of a full HTTP request with CSRF, session load
+and session save. State is read from the Django session once on connect and
+written back only when the socket closes or has been idle for
+CHATBOT_WS_IDLE_TIMEOUT seconds, so the HTTP endpoint and the socket share
+one conversation. Without a session cookie the conversation lives only as
+long as the socket, and no session is created.
+
+The first frame must carry a JWT access token, checked like an API
+request (StatelessJWTAuthentication, including revocation); without one
+within CHATBOT_WS_AUTH_TIMEOUT seconds the socket is closed with code
+4401, as it is once the token expires or is revoked. Each turn is charged
+to the chatbot throttles as on the HTTP endpoint, LLM calls count against
+the user's token budget, and turns are recorded in the chat history.
+
+Protocol (JSON text frames):
+  client -> {"type": "auth", "token": "<access token>"}   (first frame)
+            {"message": "<text>"}
+  server -> {"type": "typing"}
+            {"type": "chunk", "message": "<part of the reply>"}   (one or more)
+            {"type": "done"}
+            {"type": "error", "message": "<reason>"}
+"""
+import asyncio
+import json
+import logging
+import math
+import time
+from http.cookies import SimpleCookie
+from importlib import import_module
+from urllib.parse import urlparse
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+from .authentication import StatelessJWTAuthentication, is_revoked
+from .chat_log import record_turn
+from .chatbot import Chatbot
+from .throttling import throttle_chat_turn
+
+logger = logging.getLogger(__name__)
+
+CHATBOT_WS_PATH = "/ws/chatbot/"
+CHATBOT_WS_IDLE_TIMEOUT = getattr(settings, "CHATBOT_WS_IDLE_TIMEOUT", 60)
+CHATBOT_WS_MAX_MESSAGE = 4096
+CHATBOT_WS_AUTH_TIMEOUT = 10
+AUTH_REQUIRED = 'Send {"type": "auth", "token": "<access token>"} first.'
+
+SessionStore = import_module(settings.SESSION_ENGINE).SessionStore
+
+
+def _headers(scope):
+    return {name.decode("latin1").lower(): value.decode("latin1") for name, value in scope.get("headers", [])}
+
+
+def _origin_allowed(origin):
+    """Reject cross-site sockets: the session cookie would otherwise be usable from any page."""
+    if not origin:
+        return True
+    host = urlparse(origin).hostname
+    return origin in getattr(settings, "CORS_ALLOWED_ORIGINS", []) or host in settings.ALLOWED_HOSTS
+
+
+def chunk_response(text):
+    """Split a reply into paragraphs so long trip plans render progressively."""
+    return [part for part in text.split("\n\n") if part.strip()] or [text]
+
+
+class ChatbotSocket:
+    """Raw ASGI application for CHATBOT_WS_PATH; daphne serves it next to the Django HTTP app."""
+
+    async def __call__(self, scope, receive, send):
+        if scope["path"] != CHATBOT_WS_PATH:
+            await receive()
+            await send({"type": "websocket.close", "code": 4404})
+            return
+
+        event = await receive()
+        if event["type"] != "websocket.connect":
+            return
+        headers = _headers(scope)
+        if not _origin_allowed(headers.get("origin")):
+            await send({"type": "websocket.close", "code": 4403})
+            return
+
+        await send({"type": "websocket.accept"})
+        try:
+            event = await asyncio.wait_for(receive(), timeout=CHATBOT_WS_AUTH_TIMEOUT)
+        except asyncio.TimeoutError:
+            event = None
+        if event is not None and event["type"] == "websocket.disconnect":
+            return
+        token = await self.authenticate(event)
+        if token is None:
+            await self.send_json(send, {"type": "error", "message": AUTH_REQUIRED})
+            await send({"type": "websocket.close", "code": 4401})
+            return
+        user = StatelessJWTAuthentication().get_user(token)
+
+        cookies = SimpleCookie(headers.get("cookie", ""))
+        morsel = cookies.get(settings.SESSION_COOKIE_NAME)
+        session = SessionStore(morsel.value if morsel else None)
+        session_data = await sync_to_async(session.get)("chatbot_state")
+        bot = Chatbot.from_dict(session_data) if session_data else Chatbot()
+        bot.user_id = user.id
+        remote_addr = (scope.get("client") or (None,))[0]
+
+        dirty = False
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(receive(), timeout=CHATBOT_WS_IDLE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    if dirty:
+                        await self.checkpoint(session, bot)
+                        dirty = False
+                    continue
+
+                if event["type"] == "websocket.disconnect":
+                    break
+                if event["type"] != "websocket.receive":
+                    continue
+
+                if token["exp"] <= time.time() or await sync_to_async(is_revoked)(token):
+                    await self.send_json(send, {"type": "error", "message": "Token has expired or been revoked."})
+                    await send({"type": "websocket.close", "code": 4401})
+                    break
+
+                message = self.parse_message(event)
+                if message is None:
+                    await self.send_json(send, {"type": "error", "message": "Expected {\"message\": \"<text>\"}."})
+                    continue
+
+                throttle = await sync_to_async(throttle_chat_turn)(user.id, remote_addr, headers, bot.to_dict(), message)
+                if throttle is not None:
+                    wait = throttle.wait()
+                    reason = "Request was throttled."
+                    if wait is not None:
+                        reason += f" Expected available in {math.ceil(wait)} seconds."
+                    await self.send_json(send, {"type": "error", "message": reason})
+                    continue
+
+                await self.send_json(send, {"type": "typing"})
+                try:
+                    # handle_input may block on upstream APIs; keep it off the event loop.
+                    response_text = await sync_to_async(bot.handle_input, thread_sensitive=False)(message)
+                except Exception as e:
+                    logger.exception("Error in chatbot socket: %s", e)
+                    await self.send_json(send, {"type": "error", "message": "An error occurred while processing your request."})
+                    continue
+                dirty = True
+                record_turn(user.id, message, response_text)
+                for part in chunk_response(response_text):
+                    await self.send_json(send, {"type": "chunk", "message": part})
+                await self.send_json(send, {"type": "done"})
+        finally:
+            if dirty:
+                await self.checkpoint(session, bot)
+
+    async def authenticate(self, event):
+        """The validated access token of an auth frame, or None."""
+        if event is None or event["type"] != "websocket.receive" or not event.get("text"):
+            return None
+        try:
+            payload = json.loads(event["text"])
+        except ValueError:
+            return None
+        if not isinstance(payload, dict) or payload.get("type") != "auth" or not isinstance(payload.get("token"), str):
+            return None
+        try:
+            return await sync_to_async(StatelessJWTAuthentication().get_validated_token)(payload["token"].encode())
+        except InvalidToken:
+            return None
+
+    def parse_message(self, event):
+        text = event.get("text")
+        if text is None and event.get("bytes") is not None:
+            text = event["bytes"].decode("utf-8", "replace")
+        if not text or len(text) > CHATBOT_WS_MAX_MESSAGE:
+            return None
+        try:
+            payload = json.loads(text)
+        except ValueError:
+            return text
+        if isinstance(payload, dict) and isinstance(payload.get("message"), str):
+            return payload["message"]
+        return None
+
+    async def send_json(self, send, payload):
+        await send({"type": "websocket.send", "text": json.dumps(payload)})
+
+    async def checkpoint(self, session, bot):
+        """Persist the in-memory conversation to the session, if the client has one."""
+        if session.session_key is None:
+            # No (or an expired) cookie: saving would create a session nobody can reach.
+            return
+
+        def save():
+            session["chatbot_state"] = bot.to_dict()
+            session.save()
+        try:
+            await sync_to_async(save)()
+        except Exception as e:
+            logger.exception("Error checkpointing chatbot state: %s", e)
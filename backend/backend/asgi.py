@@ -2,6 +2,8 @@
 ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP requests go to Django; WebSocket connections go to the chatbot socket
+(see api/websocket.py). Serve it with daphne: ``daphne backend.asgi:application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
@@ -13,4 +15,16 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up, since it loads models.
+from api.websocket import ChatbotSocket  # noqa: E402
+
+chatbot_socket = ChatbotSocket()
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "websocket":
+        await chatbot_socket(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -43,6 +43,7 @@ ALLOWED_HOSTS = ['localhost', '127.0.0.1']
 # Application definition
 
 INSTALLED_APPS = [
+    'daphne',  # ASGI runserver, needed for the chatbot WebSocket
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -56,6 +57,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.TimingMiddleware',  # first, so its timings cover the other middleware
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -86,6 +88,66 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'backend.wsgi.application'
+ASGI_APPLICATION = 'backend.asgi.application'
+
+# Seconds of inactivity after which a chatbot WebSocket writes its in-memory
+# conversation back to the session.
+CHATBOT_WS_IDLE_TIMEOUT = env.int("CHATBOT_WS_IDLE_TIMEOUT", default=60)
+
+# Chat history is written behind the response (api/chat_log.py): queued turns
+# are inserted in batches of CHAT_HISTORY_BATCH_SIZE at least every
+# CHAT_HISTORY_FLUSH_INTERVAL seconds.
+CHAT_HISTORY_BATCH_SIZE = env.int("CHAT_HISTORY_BATCH_SIZE", default=100)
+CHAT_HISTORY_FLUSH_INTERVAL = env.float("CHAT_HISTORY_FLUSH_INTERVAL", default=1.0)
+CHAT_HISTORY_QUEUE_SIZE = env.int("CHAT_HISTORY_QUEUE_SIZE", default=10000)
+
+# History retention (api/history.py, `manage.py archive_history`): rows older
+# than these windows move to gzip JSONL archives under HISTORY_ARCHIVE_ROOT.
+HISTORY_ARCHIVE_ROOT = env("HISTORY_ARCHIVE_ROOT", default=os.path.join(BASE_DIR, "archive"))
+CHAT_HISTORY_RETENTION_DAYS = env.int("CHAT_HISTORY_RETENTION_DAYS", default=90)
+BOOKING_HISTORY_RETENTION_DAYS = env.int("BOOKING_HISTORY_RETENTION_DAYS", default=365)
+
+# CompressedTextField (api/fields.py): text of at least COMPRESSED_TEXT_MIN_SIZE
+# bytes is stored compressed. "zstd" requires the zstandard package.
+COMPRESSED_TEXT_MIN_SIZE = env.int("COMPRESSED_TEXT_MIN_SIZE", default=1024)
+COMPRESSED_TEXT_ALGORITHM = env("COMPRESSED_TEXT_ALGORITHM", default="zlib")
+
+# Batch trip plans (api/batch.py): plans generated concurrently per batch and
+# the largest batch accepted over HTTP.
+TRIP_BATCH_MAX_WORKERS = env.int("TRIP_BATCH_MAX_WORKERS", default=8)
+TRIP_BATCH_MAX_SIZE = env.int("TRIP_BATCH_MAX_SIZE", default=500)
+
+# Itinerary scheduling (api/routing.py): attractions with coordinates are
+# grouped into up to this many nearby stops per day, in travel order.
+ITINERARY_STOPS_PER_DAY = env.int("ITINERARY_STOPS_PER_DAY", default=3)
+
+# Destination recommendations (api/recommender.py, `manage.py train_recommender`):
+# lists of RECOMMENDATIONS_TOP_K; training state is kept between incremental runs.
+RECOMMENDATIONS_TOP_K = env.int("RECOMMENDATIONS_TOP_K", default=10)
+RECOMMENDER_STATE_PATH = env("RECOMMENDER_STATE_PATH", default=os.path.join(BASE_DIR, "recommender.npz"))
+
+# Text similarity search (api/vector_index.py): `manage.py build_vector_index`
+# writes the memory-mapped vectors here.
+VECTOR_INDEX_PATH = env("VECTOR_INDEX_PATH", default=os.path.join(BASE_DIR, "vector_index"))
+
+# GPT trip-plan fallback (api/prompting.py): estimated token budget for the
+# prompt, including the catalogue hotels and activities packed into it.
+PROMPT_TOKEN_BUDGET = env.int("PROMPT_TOKEN_BUDGET", default=1200)
+
+# LLM usage accounting (api/llm.py): per-process counters are added to
+# LLMUsageRollup every LLM_USAGE_FLUSH_INTERVAL seconds. A signed-in user's
+# LLM calls are refused after LLM_USER_DAILY_TOKENS tokens in 24 hours (0: no limit).
+LLM_USAGE_FLUSH_INTERVAL = env.int("LLM_USAGE_FLUSH_INTERVAL", default=60)
+LLM_USER_DAILY_TOKENS = env.int("LLM_USER_DAILY_TOKENS", default=50000)
+
+# Request timing (api/timing.py): Server-Timing headers (they show upstream hosts
+# and timings, so only with DEBUG by default; staff users always get them), and
+# Prometheus histograms at /metrics for scrapers from METRICS_ALLOWED_IPS ("*": any).
+# The allowlist is matched against REMOTE_ADDR, not X-Forwarded-For: behind a
+# reverse proxy every request comes from the proxy's address, so scrape the
+# workers directly or block /metrics at the proxy.
+SERVER_TIMING = env.bool("SERVER_TIMING", default=DEBUG)
+METRICS_ALLOWED_IPS = env.list("METRICS_ALLOWED_IPS", default=["127.0.0.1", "::1"])
 
 
 # Database
@@ -99,6 +161,59 @@ DATABASES = {
 }
 
 
+# Cache
+# Shared cache for upstream API responses and popularity counters. Point
+# CACHE_URL at redis/memcached in production so every worker shares it.
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+# Upstream prefetch / warm-up (see api/prefetch.py)
+UPSTREAM_CACHE_TTL = env.int("UPSTREAM_CACHE_TTL", default=60 * 30)
+PREFETCH_REFRESH_AHEAD = env.int("PREFETCH_REFRESH_AHEAD", default=60 * 5)
+PREFETCH_TOP_N = env.int("PREFETCH_TOP_N", default=20)
+PREFETCH_INTERVAL = env.int("PREFETCH_INTERVAL", default=60)
+PREFETCH_IN_PROCESS = env.bool("PREFETCH_IN_PROCESS", default=False)
+
+
+# Authentication backends
+# EmailBackend resolves the user for the email-based login endpoint in one
+# indexed query; ModelBackend keeps username logins (admin) working.
+AUTHENTICATION_BACKENDS = [
+    'api.backends.EmailBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+
+# Password hashing policy (see api/hashers.py)
+# PASSWORD_HASH_ALGORITHM picks the hasher used for new hashes: pbkdf2_sha256,
+# scrypt or argon2 (argon2 needs the argon2-cffi package). Cost settings left
+# unset use Django's defaults. Existing hashes are upgraded transparently on
+# the next successful login whenever the algorithm or cost changes. Use
+# `manage.py bench_hashers` to size auth capacity for a given setting.
+PASSWORD_HASH_ALGORITHM = env("PASSWORD_HASH_ALGORITHM", default="pbkdf2_sha256")
+PASSWORD_HASHING = {
+    'PBKDF2_ITERATIONS': env.int("PBKDF2_ITERATIONS", default=None),
+    'SCRYPT_WORK_FACTOR': env.int("SCRYPT_WORK_FACTOR", default=None),
+    'SCRYPT_BLOCK_SIZE': env.int("SCRYPT_BLOCK_SIZE", default=None),
+    'ARGON2_TIME_COST': env.int("ARGON2_TIME_COST", default=None),
+    'ARGON2_MEMORY_COST': env.int("ARGON2_MEMORY_COST", default=None),
+    'ARGON2_PARALLELISM': env.int("ARGON2_PARALLELISM", default=None),
+}
+_POLICY_HASHERS = {
+    'pbkdf2_sha256': 'api.hashers.PolicyPBKDF2PasswordHasher',
+    'scrypt': 'api.hashers.PolicyScryptPasswordHasher',
+    'argon2': 'api.hashers.PolicyArgon2PasswordHasher',
+}
+PASSWORD_HASHERS = [_POLICY_HASHERS[PASSWORD_HASH_ALGORITHM]] + [
+    path for algorithm, path in _POLICY_HASHERS.items() if algorithm != PASSWORD_HASH_ALGORITHM
+] + [
+    # Verify-only fallbacks for hashes created with older Django defaults.
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -154,10 +269,37 @@ SESSION_COOKIE_SECURE = False  # In production with HTTPS, set to True
 
 
 # REST Framework settings
+# JWT_STATELESS_USERS resolves request.user from token claims (no User query
+# per request, revocation through the cached denylist); disable it to load the
+# User row on every request as simplejwt does by default.
+JWT_STATELESS_USERS = env.bool('JWT_STATELESS_USERS', default=True)
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
+        'api.authentication.StatelessJWTAuthentication'
+        if JWT_STATELESS_USERS else
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    # Rates are in cost units per period (see THROTTLE_COSTS and api/throttling.py).
+    'DEFAULT_THROTTLE_RATES': {
+        'chatbot_user': env('THROTTLE_CHATBOT_USER', default='300/hour'),
+        'chatbot_ip': env('THROTTLE_CHATBOT_IP', default='600/hour'),
+        'trip_plan_user': env('THROTTLE_TRIP_PLAN_USER', default='200/hour'),
+        'trip_plan_ip': env('THROTTLE_TRIP_PLAN_IP', default='400/hour'),
+        'trip_batch_user': env('THROTTLE_TRIP_BATCH_USER', default='20000/day'),
+        'trip_batch_ip': env('THROTTLE_TRIP_BATCH_IP', default='20000/day'),
+        'login_ip': env('THROTTLE_LOGIN_IP', default='20/min'),
+        'login_account': env('THROTTLE_LOGIN_ACCOUNT', default='10/min'),
+        'register_ip': env('THROTTLE_REGISTER_IP', default='10/hour'),
+    },
+}
+
+# Cost of each request kind in throttle units: a trip plan (external APIs and
+# possibly an LLM completion) weighs as much as 20 ordinary chat turns.
+THROTTLE_COSTS = {
+    'chat_turn': 1,
+    'trip_plan': env.int('THROTTLE_COST_TRIP_PLAN', default=20),
+    'password_hash': 1,
 }
 
 # JWT settings
@@ -167,6 +309,9 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
     'ROTATE_REFRESH_TOKENS': False,
     'BLACKLIST_AFTER_ROTATION': True,
+    'TOKEN_USER_CLASS': 'api.authentication.ClaimsUser',
+    'TOKEN_OBTAIN_SERIALIZER': 'api.authentication.ClaimsTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'api.authentication.DenylistTokenRefreshSerializer',
 }
 
 # Default primary key field type
@@ -19,11 +19,15 @@ export const AuthProvider = ({ children }) => {
         }
     }, []);
 
-    const login = (user) => {
+    const login = (user, access) => {
         setIsLoggedIn(true);
         setUsername(user);
         localStorage.setItem('isLoggedIn', 'true');
         localStorage.setItem('username', user);
+        // The chatbot WebSocket authenticates with the access token.
+        if (access) {
+            localStorage.setItem('accessToken', access);
+        }
     };
 
     const logout = () => {
@@ -31,6 +35,7 @@ export const AuthProvider = ({ children }) => {
         setUsername('');
         localStorage.removeItem('isLoggedIn');
         localStorage.removeItem('username');
+        localStorage.removeItem('accessToken');
     };
 
     return (
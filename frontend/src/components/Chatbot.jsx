@@ -37,21 +37,65 @@ function Chatbot() {
         messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
       }, [messages]);
     
-      const handleSendMessage = async (e) => {
-        e.preventDefault();
-        if (!inputValue.trim() || isLoading) return;
-    
-        const userMessage = {
-          id: getNextId(),
-          type: 'user',
-          content: inputValue,
-          timestamp: new Date(),
+      // Persistent WebSocket for chat turns; falls back to HTTP when it is not open.
+      const socketRef = useRef(null);
+      const replyIdRef = useRef(null);
+
+      useEffect(() => {
+        // The socket needs an access token; without one every turn goes over HTTP.
+        const token = localStorage.getItem('accessToken');
+        if (!token) {
+          return undefined;
+        }
+        const protocol = window.location.protocol === 'https:' ? 'wss' : 'ws';
+        const socket = new WebSocket(`${protocol}://${window.location.host}/ws/chatbot/`);
+        socket.onopen = () => {
+          socket.send(JSON.stringify({ type: 'auth', token }));
         };
-        setMessages((prev) => [...prev, userMessage]);
-        const currentInput = inputValue;
-        setInputValue('');
-        setIsLoading(true);
-    
+        socket.onmessage = (event) => {
+          const data = JSON.parse(event.data);
+          if (data.type === 'chunk') {
+            // Stream the reply into a single bot message as parts arrive.
+            if (replyIdRef.current === null) {
+              const id = getNextId();
+              replyIdRef.current = id;
+              setMessages((prev) => [
+                ...prev,
+                { id, type: 'bot', content: data.message, timestamp: new Date() },
+              ]);
+            } else {
+              const id = replyIdRef.current;
+              setMessages((prev) =>
+                prev.map((message) =>
+                  message.id === id
+                    ? { ...message, content: `${message.content}\n\n${data.message}` }
+                    : message
+                )
+              );
+            }
+          } else if (data.type === 'done' || data.type === 'error') {
+            if (data.type === 'error') {
+              setMessages((prev) => [
+                ...prev,
+                { id: getNextId(), type: 'bot', content: data.message, timestamp: new Date() },
+              ]);
+            }
+            replyIdRef.current = null;
+            setIsLoading(false);
+          }
+        };
+        socket.onclose = () => {
+          if (socketRef.current === socket) {
+            socketRef.current = null;
+          }
+          replyIdRef.current = null;
+          setIsLoading(false);
+        };
+        socketRef.current = socket;
+        return () => socket.close();
+      }, []);
+
+      const sendOverHttp = async (currentInput) => {
         try {
           console.log("Sending message to backend:", currentInput);
           const response = await axios.post(
@@ -80,6 +124,29 @@ function Chatbot() {
           setIsLoading(false);
         }
       };
+    
+      const handleSendMessage = async (e) => {
+        e.preventDefault();
+        if (!inputValue.trim() || isLoading) return;
+    
+        const userMessage = {
+          id: getNextId(),
+          type: 'user',
+          content: inputValue,
+          timestamp: new Date(),
+        };
+        setMessages((prev) => [...prev, userMessage]);
+        const currentInput = inputValue;
+        setInputValue('');
+        setIsLoading(true);
+
+        const socket = socketRef.current;
+        if (socket && socket.readyState === WebSocket.OPEN) {
+          socket.send(JSON.stringify({ message: currentInput }));
+        } else {
+          await sendOverHttp(currentInput);
+        }
+      };
 
     return (
         <>